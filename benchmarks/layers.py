@@ -0,0 +1,70 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file generates synthetic polygon layers in EPSG:31287: irregular polygons of a
+given area, scattered around a center, overlapping now and then like catchments of
+different scales do.
+"""
+# qgis modules
+from qgis.core import QgsVectorLayer, QgsFeature, QgsGeometry, QgsPointXY
+
+# standard python modules
+import numpy as np
+
+# custom modules
+from gpsinfo4zemokost.src.function_module import TD
+
+
+# the center of the default region, the middle of tile (200, 100), which is well inside Austria
+CENTER = (TD['XLL'] + 200.5 * TD['NCOLS'] * TD['CELLSIZE'], TD['YLL'] + 100.5 * TD['NROWS'] * TD['CELLSIZE'])
+
+# the outline of an irregular polygon of area "area" (m²) around (cx, cy), with "vertices" vertices
+def outline(rng, cx, cy, area, vertices = 48):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = 1 + 0.35 * rng.uniform(-1, 1, vertices)
+    x, y = radii * np.cos(angles), radii * np.sin(angles)
+    # scale to the requested area (shoelace formula)
+    a = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    s = np.sqrt(area / a)
+    return [QgsPointXY(cx + s * xi, cy + s * yi) for (xi, yi) in zip(x, y)]
+
+# A memory layer with "count" polygons of "area_km2" square km each. The polygons are
+# scattered over a square covering about four times their total area.
+def polygon_layer(count, area_km2, seed = 0, center = CENTER):
+    rng = np.random.RandomState(seed)
+    area = area_km2 * 1e6
+    half = np.sqrt(4 * count * area) / 2
+
+    layer = QgsVectorLayer('Polygon?crs=epsg:31287&field=id:integer', 'benchmark', 'memory')
+    feats = []
+    for i in range(count):
+        cx, cy = center[0] + rng.uniform(-half, half), center[1] + rng.uniform(-half, half)
+        f = QgsFeature(layer.fields())
+        f.setAttributes([i + 1])
+        f.setGeometry(QgsGeometry.fromPolygonXY([outline(rng, cx, cy, area)]))
+        feats.append(f)
+    layer.dataProvider().addFeatures(feats)
+    layer.updateExtents()
+    return layer
@@ -0,0 +1,318 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file runs the benchmarks: the computation end to end (fm.compute, in both
+engine modes and with both downloaders) over synthetic polygon layers, and some of
+its building blocks on their own. The tiles are generated once (see tiles.py) and
+served by a local stand-in of the data server (see server.py), so no request goes
+to the live server. The settings of the plugin are kept in a temporary directory,
+the ones of the QGIS installation are not touched.
+
+Run it from the root of the repository with the python interpreter of QGIS:
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --latency 0.05 --bandwidth 2000000 --json after.json --compare before.json
+
+With --compare, it exits with status 1 if a run got slower or needed more memory than
+the baseline by more than --tolerance.
+"""
+# standard python modules
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+
+# name, number of polygons, area of each polygon in square km
+SCENARIOS = [
+    ('few-small', 10, 0.5),
+    ('many-small', 300, 0.2),
+    ('few-large', 4, 25.0),
+    ('one-huge', 1, 300.0),
+]
+QUICK_SCENARIOS = ('few-small', 'few-large')
+
+
+def start_qgis(settings_dir):
+    # keep the settings of the plugin out of the user's QGIS settings
+    from PyQt5.QtCore import QSettings
+    QSettings.setDefaultFormat(QSettings.IniFormat)
+    QSettings.setPath(QSettings.IniFormat, QSettings.UserScope, settings_dir)
+
+    from qgis.core import QgsApplication
+    app = QgsApplication([], False)
+    app.initQgis()
+    return app
+
+def maxrss_mb():
+    # the peak resident memory of this process so far, None where it is not available
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+def clear_gdal_cache():
+    # gdal keeps the files it downloaded with /vsicurl/ in memory
+    from osgeo import gdal
+    if hasattr(gdal, 'VSICurlClearCache'):
+        gdal.VSICurlClearCache()
+
+def needed_tiles(fm, feats):
+    # the tiles of the bounding boxes of the features
+    tiles = set()
+    for f in feats:
+        bb = f.geometry().boundingBox()
+        TN_l, TN_r, TN_b, TN_t = fm.compute_tile_bb(bb.xMinimum(), bb.xMaximum(), bb.yMinimum(), bb.yMaximum())
+        tiles.update((x, y) for x in range(TN_l, TN_r + 1) for y in range(TN_b, TN_t + 1))
+    return sorted(tiles)
+
+
+def run_compute(fm, feats, server, args):
+    # Times fm.compute: the best of args.repeat runs, then one more run with tracemalloc
+    # for the peak of the memory allocated during the run.
+    from gpsinfo4zemokost.src.feedback import Feedback
+    from gpsinfo4zemokost.src.tile_cache import tile_cache
+
+    class BenchmarkFeedback(Feedback):
+        def __init__(self):
+            self.results = 0
+            self.warnings = 0
+        def warn(self, text):
+            self.warnings += 1
+        def result(self, feature, vals_sum, vals_count, zonal = None):
+            self.results += 1
+
+    def once(traced):
+        cache = tile_cache()
+        if cache is not None and args.cache == 'cold':
+            cache.clear()
+        clear_gdal_cache()
+        server.reset_counters()
+        feedback = BenchmarkFeedback()
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        stats = fm.compute(feats, '', feedback)
+        seconds = time.perf_counter() - started
+        peak = None
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+        return {'seconds': seconds, 'peak_mb': peak, 'requests': server.requests,
+                'mbytes': server.bytes_sent / 1024 ** 2, 'results': feedback.results,
+                'warnings': feedback.warnings, 'stages': stats.report()['stages']}
+
+    if args.cache == 'warm':
+        once(False)
+    runs = [once(False) for i in range(args.repeat)]
+    best = min(runs, key = lambda r: r['seconds'])
+    if not args.no_memory:
+        best['peak_mb'] = once(True)['peak_mb']
+    best['maxrss_mb'] = maxrss_mb()
+    return best
+
+def run_parts(fm, feats, repeat):
+    # Seconds per call of some building blocks, on tiles held in memory, so without I/O.
+    # The tiles are generated here rather than read, see tiles.py.
+    from gpsinfo4zemokost.src.feedback import Feedback
+    from .tiles import tile_asc
+
+    geoms = [fm.ogr_geometry(f) for f in feats]
+    feat_tiles = [fm.feature_tiles(g) for g in geoms]
+    sample = min(len(feats), 20)
+    data = dict()
+    for tiles in feat_tiles[:sample]:
+        for tile in tiles:
+            if tile not in data:
+                data[tile] = tile_asc(*tile)
+    loaded = {tile: fm.parse_asc(data[tile]) for tile in data}
+    # clipped_raster may change the tiles it gets
+    get_tile = lambda x, y: (loaded[(x, y)][0], loaded[(x, y)][1].copy())
+
+    def best(fn, number):
+        return min(timeit.repeat(fn, number = number, repeat = repeat)) / number
+
+    any_tile = next(iter(data))
+    return {
+        'compute_tile_bb': best(lambda: fm.compute_tile_bb(400000.0, 410000.0, 420000.0, 430000.0), 10000),
+        'parse_asc': best(lambda: fm.parse_asc(data[any_tile]), 10),
+        'feature_tiles': best(lambda: [fm.feature_tiles(g) for g in geoms], 1) / len(geoms),
+        'clipped_raster': best(lambda: [fm.clipped_raster(Feedback(), feats[i], feat_tiles[i], None, get_tile)
+                                        for i in range(sample)], 1) / sample,
+    }
+
+def run_downloads(fm, server, tiles, repeat):
+    # seconds per tile of the downloaders, from the local server, bypassing the tile cache
+    from gpsinfo4zemokost.src import settings
+    sample = tiles[:20]
+    cache_enabled = settings.value('cache/enabled')
+    settings.set_value('cache/enabled', False)
+    try:
+        timings = dict()
+        for downloader in (fm.gdal_downloader, fm.alt_downloader):
+            def fetch_all():
+                clear_gdal_cache()
+                for tile in sample:
+                    downloader(*tile)
+            timings[downloader.__name__] = min(timeit.repeat(fetch_all, number = 1, repeat = repeat)) / len(sample)
+        return timings
+    finally:
+        settings.set_value('cache/enabled', cache_enabled)
+
+
+def compare(results, baseline, tolerance):
+    # Prints the runs which got slower or needed more memory than in the baseline
+    # by more than "tolerance" (relative). Returns their number.
+    old = {(r['scenario'], r['mode'], r['downloader']): r for r in baseline['runs']}
+    regressions = 0
+    for r in results['runs']:
+        b = old.get((r['scenario'], r['mode'], r['downloader']))
+        if b is None:
+            continue
+        for key in ('seconds', 'peak_mb'):
+            if r[key] is not None and b[key] and r[key] > b[key] * (1 + tolerance):
+                print('REGRESSION {} {} {}: {} {:.3f} -> {:.3f}'.format(r['scenario'], r['mode'], r['downloader'],
+                                                                       key, b[key], r[key]))
+                regressions += 1
+    for (name, seconds) in results['parts'].items():
+        b = baseline.get('parts', dict()).get(name)
+        if b and seconds > b * (1 + tolerance):
+            print('REGRESSION {}: seconds per call {:.6f} -> {:.6f}'.format(name, b, seconds))
+            regressions += 1
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog = 'python -m benchmarks.run', description = __doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action = 'store_true', help = 'run the small scenarios only')
+    parser.add_argument('--scenarios', default = '', help = 'comma separated names of the scenarios to run')
+    parser.add_argument('--modes', default = 'tile,feature', help = 'engine modes, see engine/mode')
+    parser.add_argument('--downloaders', default = 'gdal,alt', help = 'gdal and/or alt')
+    parser.add_argument('--source', choices = ('http', 'directory'), default = 'http',
+                        help = 'read the tiles from the local server or directly from their directory')
+    parser.add_argument('--processes', type = int, default = 0, help = 'engine/processes')
+    parser.add_argument('--cache', choices = ('off', 'cold', 'warm'), default = 'off',
+                        help = 'tile cache: disabled, emptied before every run, or filled by a first run')
+    parser.add_argument('--latency', type = float, default = 0.0, help = 'seconds per request of the server')
+    parser.add_argument('--bandwidth', type = float, default = 0, help = 'bytes per second, 0: unlimited')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'runs per measurement, the best one counts')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the synthetic data')
+    parser.add_argument('--nodata', type = float, default = 0.0, help = 'fraction of no data points in the tiles')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'skip the run measuring the memory')
+    parser.add_argument('--tiles', default = os.path.join(tempfile.gettempdir(), 'gpsinfo4zemokost-benchmark-tiles'),
+                        help = 'directory of the generated tiles, reused between invocations')
+    parser.add_argument('--json', default = '', help = 'write the results to this file')
+    parser.add_argument('--compare', default = '', help = 'compare with the results in this file')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'relative slowdown tolerated by --compare')
+    return parser.parse_args(argv)
+
+def main(argv = None):
+    args = parse_args(argv)
+    names = [n for n in args.scenarios.split(',') if n] or \
+            [s[0] for s in SCENARIOS if not args.quick or s[0] in QUICK_SCENARIOS]
+    scenarios = [s for s in SCENARIOS if s[0] in names]
+
+    work = tempfile.mkdtemp(prefix = 'gpsinfo4zemokost-benchmark-')
+    app = start_qgis(os.path.join(work, 'settings'))
+    try:
+        from gpsinfo4zemokost.src import function_module as fm
+        from gpsinfo4zemokost.src import settings
+        from .layers import polygon_layer
+        from .server import TileServer
+        from .tiles import write_tiles
+
+        settings.set_value('cache/enabled', args.cache != 'off')
+        settings.set_value('cache/directory', os.path.join(work, 'cache'))
+        settings.set_value('engine/processes', args.processes)
+        # every run evaluates all tiles of all features, nothing is reused from earlier runs
+        settings.set_value('results/cache', False)
+        settings.set_value('index/enabled', False)
+        tile_root = os.path.join(args.tiles, 'seed{}-nodata{}'.format(args.seed, args.nodata))
+        settings.set_value('source/type', args.source)
+        settings.set_value('source/path', tile_root)
+        downloaders = [d for d in args.downloaders.split(',') if d] if args.source == 'http' else ['directory']
+
+        results = {'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                                   'latency': args.latency, 'bandwidth': args.bandwidth, 'cache': args.cache,
+                                   'processes': args.processes},
+                   'runs': [], 'parts': dict()}
+
+        with TileServer(tile_root, latency = args.latency, bandwidth = args.bandwidth) as server:
+            # the engine downloads from the local server
+            fm.www_folder = server.url
+
+            for (name, count, area_km2) in scenarios:
+                feats = list(polygon_layer(count, area_km2, seed = args.seed).getFeatures())
+                tiles = needed_tiles(fm, feats)
+                written = write_tiles(tile_root, tiles, args.seed, args.nodata)
+                print('{}: {} polygons of {} km², {} tiles ({} generated)'.format(name, count, area_km2,
+                                                                                len(tiles), written))
+                if not results['parts']:
+                    results['parts'].update(run_parts(fm, feats, args.repeat))
+                    results['parts'].update(run_downloads(fm, server, tiles, args.repeat))
+
+                for mode in [m for m in args.modes.split(',') if m]:
+                    settings.set_value('engine/mode', mode)
+                    for downloader in downloaders:
+                        if downloader != 'directory':
+                            fm.remember_downloader(getattr(fm, downloader + '_downloader'))
+                        run = run_compute(fm, feats, server, args)
+                        run.update({'scenario': name, 'mode': mode, 'downloader': downloader,
+                                    'polygons': count, 'area_km2': area_km2, 'tiles': len(tiles)})
+                        results['runs'].append(run)
+                        print('  {:8} {:5} {:8.3f} s  peak {:>8} MB  maxrss {:>8} MB  {:5} requests  '
+                              '{:8.1f} MB  {} results  {} warnings'.format(
+                              mode, downloader, run['seconds'], fmt(run['peak_mb']), fmt(run['maxrss_mb']),
+                              run['requests'], run['mbytes'], run['results'], run['warnings']))
+
+        print('seconds per call:')
+        for (part, seconds) in results['parts'].items():
+            print('  {:16} {:.6f}'.format(part, seconds))
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent = 1)
+        if args.compare:
+            with open(args.compare) as f:
+                if compare(results, json.load(f), args.tolerance) != 0:
+                    return 1
+        return 0
+    finally:
+        app.exitQgis()
+        shutil.rmtree(work, ignore_errors = True)
+
+def fmt(value):
+    return '-' if value is None else '{:.1f}'.format(value)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
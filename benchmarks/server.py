@@ -0,0 +1,165 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains a local stand-in for the data server. It serves the files below
+a directory over HTTP/1.1 with keep-alive and byte ranges (as gdal's /vsicurl/ needs
+them), with a configurable latency per request and a limited bandwidth.
+"""
+# standard python modules
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import posixpath
+import re
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+
+class TileServer:
+    # Usage:
+    #     with TileServer(root, latency = 0.05, bandwidth = 2e6) as server:
+    #         url = server.url      # ends with a slash
+    #
+    # :param root --- the directory served
+    # :param latency --- seconds each request waits before it is answered
+    # :param bandwidth --- bytes per second per connection, 0: unlimited
+
+    def __init__(self, root, latency = 0.0, bandwidth = 0, port = 0):
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        # counters, guarded by lock
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+        handler = type('Handler', (TileRequestHandler,), {'server_config': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/'.format(self.httpd.server_address[1])
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def count(self, nbytes, request = False):
+        with self.lock:
+            self.requests += int(request)
+            self.bytes_sent += nbytes
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # the TileServer, set in TileServer.__init__
+    server_config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.answer(send_body = False)
+
+    def do_GET(self):
+        self.answer(send_body = True)
+
+    def answer(self, send_body):
+        config = self.server_config
+        config.count(0, request = True)
+        if config.latency > 0:
+            time.sleep(config.latency)
+
+        path = self.local_path()
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        # a single byte range, as requested by gdal
+        start, end = 0, len(data) - 1
+        m = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        if m is not None and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), end) if m.group(2) else end
+            else:
+                start = max(len(data) - int(m.group(2)), 0)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(len(data)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(data)))
+        else:
+            self.send_response(200)
+        body = data[start:end + 1]
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.send_throttled(body)
+
+    def local_path(self):
+        # the file below the root the url path points to, None for paths leaving the root
+        parts = [p for p in posixpath.normpath(unquote(urlsplit(self.path).path)).split('/') if p]
+        if '..' in parts:
+            return None
+        return os.path.join(self.server_config.root, *parts)
+
+    def send_throttled(self, body):
+        config = self.server_config
+        chunk = 16384
+        started = time.monotonic()
+        for pos in range(0, len(body), chunk):
+            piece = body[pos:pos + chunk]
+            if config.bandwidth > 0:
+                # send the piece when the bytes up to its end are due
+                delay = started + (pos + len(piece)) / config.bandwidth - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.wfile.write(piece)
+            config.count(len(piece))
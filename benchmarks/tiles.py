@@ -0,0 +1,84 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file generates synthetic slope tiles in the layout of the data server:
+<x>/<y>.asc.zip, containing the ESRI ASCII raster AT_OGD_DHM_LAMB_10M_SLOPE_TILED/<x>/<y>.asc.
+The values are a smooth function of the coordinates plus some noise, so they are
+continuous across the tiles, and the same for the same seed.
+"""
+# standard python modules
+import os
+import zipfile
+import numpy as np
+
+# custom modules
+from gpsinfo4zemokost.src.function_module import TD, tile_geo_transform, tile_member
+
+
+# the values of the tile (tile_nr_x, tile_nr_y) as float32 array, rows from top to bottom.
+# A fraction "nodata" of the points is set to TD['NODATA'].
+def tile_values(tile_nr_x, tile_nr_y, seed = 0, nodata = 0.0):
+    geo_trafo = tile_geo_transform(tile_nr_x, tile_nr_y)
+    x = geo_trafo[0] + (np.arange(TD['NCOLS']) + 0.5) * geo_trafo[1]
+    y = geo_trafo[3] + (np.arange(TD['NROWS']) + 0.5) * geo_trafo[5]
+    xx, yy = np.meshgrid(x, y)
+
+    # slopes (height per horizontal distance) between 0 and about 1, hills of a few km
+    values = 0.45 + 0.27 * np.sin(xx / 2300.0 + seed) * np.cos(yy / 1700.0 - seed) + 0.18 * np.sin((xx + yy) / 700.0)
+    rng = np.random.RandomState((seed * 1000003 + tile_nr_x * 1009 + tile_nr_y) % 2 ** 32)
+    values += rng.uniform(0, 0.09, values.shape)
+    if nodata > 0:
+        values[rng.uniform(size = values.shape) < nodata] = TD['NODATA']
+    return values.astype(np.float32)
+
+# the content of the .asc file of the tile, as the server has it
+def tile_asc(tile_nr_x, tile_nr_y, seed = 0, nodata = 0.0):
+    geo_trafo = tile_geo_transform(tile_nr_x, tile_nr_y)
+    header = ('ncols        {}\nnrows        {}\nxllcorner    {:.12f}\nyllcorner    {:.12f}\n'
+              'cellsize     {:.12f}\nNODATA_value  {}\n').format(
+              TD['NCOLS'], TD['NROWS'], geo_trafo[0], geo_trafo[3] + TD['NROWS'] * geo_trafo[5],
+              TD['CELLSIZE'], TD['NODATA'])
+    rows = tile_values(tile_nr_x, tile_nr_y, seed, nodata)
+    body = '\n'.join(' '.join('{:g}'.format(v) for v in row) for row in rows.tolist())
+    return (header + body + '\n').encode('ascii')
+
+# the path of the zipped tile below "root"
+def tile_path(root, tile_nr_x, tile_nr_y):
+    return os.path.join(root, str(tile_nr_x), str(tile_nr_y) + '.asc.zip')
+
+# Writes the zipped tiles "tiles" (list of (tile_nr_x, tile_nr_y)) below "root", skipping
+# the ones which exist already. Returns the number of tiles written.
+def write_tiles(root, tiles, seed = 0, nodata = 0.0):
+    written = 0
+    for (tile_nr_x, tile_nr_y) in tiles:
+        path = tile_path(root, tile_nr_x, tile_nr_y)
+        if os.path.isfile(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with zipfile.ZipFile(path + '.part', 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(tile_member(tile_nr_x, tile_nr_y), tile_asc(tile_nr_x, tile_nr_y, seed, nodata))
+        os.replace(path + '.part', path)
+        written += 1
+    return written
@@ -0,0 +1,79 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+This file contains the decoder of the ESRI ASCII raster files (.asc) the tiles are
+stored in. It only needs numpy, so it can be used without QGIS.
+"""
+# standard python modules
+import re
+from numpy import fromstring, float32
+
+
+# a header item of an ESRI ASCII raster file: a keyword followed by a value
+header_item = re.compile(rb'\s*(ncols|nrows|xllcorner|yllcorner|xllcenter|yllcenter|cellsize|nodata_value)\s+(\S+)',
+                         re.IGNORECASE)
+
+# Decodes the content "data" (bytes) of an ESRI ASCII raster file, c.f.
+# http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/ESRI_ASCII_raster_format/009t0000000z000000/
+# Returns the geotransform and the data as float32 array, no data points set to "nodata".
+def parse_asc(data, nodata):
+
+    # read the header items by their keywords, until the first number is found. The items
+    # may be separated by line breaks or spaces, and NODATA_VALUE is optional.
+    header = dict()
+    pos = 0
+    m = header_item.match(data, pos)
+    while m is not None:
+        header[m.group(1).decode().lower()] = float(m.group(2))
+        pos = m.end()
+        m = header_item.match(data, pos)
+
+    ncols, nrows, cellsize = int(header['ncols']), int(header['nrows']), header['cellsize']
+
+    # the position may be given by the lower left corner or the center of the lower left cell
+    if 'xllcorner' in header:
+        x_left = header['xllcorner']
+    else:
+        x_left = header['xllcenter'] - cellsize / 2
+    if 'yllcorner' in header:
+        y_bottom = header['yllcorner']
+    else:
+        y_bottom = header['yllcenter'] - cellsize / 2
+
+    # geotransform = (left x-coordinate, x-cellsize, rotation, upper y-coordinate, rotation, y-cellsize)
+    # y-cellsize is negative, since the rows are stored from top to bottom
+    geo_trafo = (x_left, cellsize, 0, y_bottom + cellsize * nrows, 0, -cellsize)
+
+    # decode all the values in one go, line breaks count as separators
+    arr = fromstring(data[pos:], dtype = float32, sep = ' ')
+    if arr.size != ncols * nrows:
+        raise ValueError('Die Rasterdatei enthält {} statt {} Werte.'.format(arr.size, ncols * nrows))
+    arr = arr.reshape((nrows, ncols))
+
+    if 'nodata_value' in header and header['nodata_value'] != nodata:
+        arr[arr == header['nodata_value']] = nodata
+
+    return geo_trafo, arr
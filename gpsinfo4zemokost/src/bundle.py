@@ -0,0 +1,226 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the tile bundles, which make the plugin usable offline. A bundle
+is a single zip file holding the zipped tiles of a region exactly as the server has
+them (<x>/<y>.asc.zip), plus a manifest. Alternatively, the tiles are written to a
+tile store (.sqlite), which can also be used as tile source directly (see
+tile_source.py). build_bundle fetches the tiles of a region from the tile source
+into a bundle, import_bundle puts the tiles of a bundle or store into the tile cache,
+where the downloaders find them without asking the server. Both are available as
+processing algorithms, see processing_provider.py.
+"""
+# standard python modules
+from datetime import datetime, timezone
+from zipfile import ZipFile, ZIP_STORED, BadZipFile
+import json
+import os
+import sqlite3
+
+# custom modules
+from .prefetch import TilePrefetcher
+from .tile_cache import tile_cache
+from .tile_source import tile_source, same_grid, StoreSource, TileStoreWriter
+from . import function_module as fm
+from . import settings
+
+
+# the name of the manifest inside the bundle and the format it declares
+MANIFEST = 'manifest.json'
+FORMAT = 'gpsinfo4zemokost-bundle'
+# the extension of the tile stores
+STORE_EXTENSION = '.sqlite'
+
+
+class BundleError(Exception):
+    pass
+
+
+# the path of the zipped tile inside the bundle, as on the server
+def bundle_member(tile_nr_x, tile_nr_y):
+    return '{}/{}.asc.zip'.format(tile_nr_x, tile_nr_y)
+
+# the tiles of the data region (as in compute) intersecting the bounding box
+def bbox_tiles(xmin, xmax, ymin, ymax):
+    TN_l, TN_r, TN_b, TN_t = fm.compute_tile_bb(xmin, xmax, ymin, ymax)
+    return [(x, y) for x in range(max(TN_l, 0), min(TN_r, 392) + 1)
+                   for y in range(max(TN_b, 0), min(TN_t, 202) + 1)]
+
+# the tiles of the data region intersecting any of the ogr geometries "geoms"
+def geometry_tiles(geoms):
+    tiles = set()
+    for geom in geoms:
+        tiles.update(t for t in fm.feature_tiles(geom) if 0 <= t[0] <= 392 and 0 <= t[1] <= 202)
+    return sorted(tiles)
+
+
+# writes the tiles into a zip file, the manifest last
+class ZipBundleWriter:
+
+    def __init__(self, path):
+        self.zf = ZipFile(path, 'w', ZIP_STORED)
+
+    def put(self, tile_nr_x, tile_nr_y, data):
+        # the tiles are zipped already, so they are stored as they are
+        self.zf.writestr(bundle_member(tile_nr_x, tile_nr_y), data)
+
+    def finish(self, manifest):
+        self.zf.writestr(MANIFEST, json.dumps(manifest, indent = 1))
+        self.zf.close()
+
+
+# writes the tiles into a tile store, the manifest as its metadata
+class StoreBundleWriter(TileStoreWriter):
+
+    def __init__(self, path):
+        super().__init__(path, {'format': FORMAT})
+
+    def finish(self, manifest):
+        self.set_metadata(manifest)
+        self.close()
+
+
+# Fetches the tiles "tiles" from the tile source into the bundle "path" (a tile store,
+# if it ends with STORE_EXTENSION), reporting to "feedback" (see feedback.py). Tiles
+# which cannot be fetched are left out and listed in the manifest. Returns the number
+# of tiles in the bundle.
+def build_bundle(path, tiles, feedback):
+    feedback.set_total(len(tiles))
+    feedback.set_text('Lade {} Kacheln herunter'.format(len(tiles)))
+
+    source = tile_source()
+    bundled, missing = [], []
+    part = path + '.part'
+    try:
+        if os.path.exists(part):
+            os.remove(part)
+        writer = StoreBundleWriter(part) if path.lower().endswith(STORE_EXTENSION) else ZipBundleWriter(part)
+        with TilePrefetcher(source.read_zip, tiles, settings.value('download/workers')) as prefetcher:
+            for (tile_nr_x, tile_nr_y), future in prefetcher:
+                if feedback.is_canceled():
+                    break
+                try:
+                    writer.put(tile_nr_x, tile_nr_y, future.result())
+                    bundled.append((tile_nr_x, tile_nr_y))
+                except fm.TileDownloadError as e:
+                    missing.append((tile_nr_x, tile_nr_y))
+                    feedback.warn(str(e))
+                feedback.step()
+
+        writer.finish({'format': FORMAT, 'version': 1, 'layer': fm.www_layer_name, 'source': source.name or fm.www_folder,
+                       'created': datetime.now(timezone.utc).isoformat(timespec = 'seconds'),
+                       'grid': source.grid(), 'tiles': sorted(bundled), 'missing': sorted(missing)})
+
+        if feedback.is_canceled():
+            os.remove(part)
+            return 0
+        os.replace(part, path)
+    except (OSError, sqlite3.Error) as e:
+        if os.path.exists(part):
+            os.remove(part)
+        raise BundleError('Das Kachelpaket {} konnte nicht geschrieben werden: {}'.format(path, e))
+
+    if missing:
+        feedback.warn('{} von {} Kacheln konnten nicht heruntergeladen werden und fehlen im Kachelpaket.'.format(
+                      len(missing), len(tiles)))
+    return len(bundled)
+
+# Checks the manifest (dict) of a bundle. Raises BundleError, if it is no bundle
+# of the data set of the plugin or its tiles are not on the grid TD of the engine.
+def check_manifest(manifest):
+    if manifest.get('format') != FORMAT or manifest.get('layer') != fm.www_layer_name:
+        raise BundleError('Das Kachelpaket enthält keine Kacheln des Datensatzes {}.'.format(fm.www_layer_name))
+    grid = manifest.get('grid')
+    if isinstance(grid, str):
+        # the metadata of a tile store holds json, see TileStoreWriter
+        try:
+            grid = json.loads(grid)
+        except ValueError:
+            grid = None
+    if not isinstance(grid, dict) or not same_grid(grid):
+        raise BundleError('Die Kacheln des Kachelpakets passen nicht zum Raster des Datensatzes.')
+
+# Opens the bundle or tile store "path". Returns the list of its tiles, a function
+# (tile_nr_x, tile_nr_y) -> size of the zipped tile and a function returning the
+# zipped tile, and the function closing the bundle.
+def open_bundle(path):
+    if path.lower().endswith(STORE_EXTENSION):
+        store = StoreSource(path)
+        try:
+            manifest = store.metadata()
+        except sqlite3.Error:
+            raise BundleError('Die Datei ist kein Kachelspeicher von gpsinfo4zemokost.')
+        check_manifest(manifest)
+        sizes = dict(((x, y), size) for (x, y, size) in store.connection().execute(
+                     'SELECT tile_column, tile_row, length(tile_data) FROM tiles'))
+        return sorted(sizes), sizes.get, store.read_zip, store.connection().close
+
+    zf = ZipFile(path)
+    try:
+        manifest = json.loads(zf.read(MANIFEST).decode('utf-8'))
+    except (KeyError, ValueError):
+        zf.close()
+        raise BundleError('Die Datei ist kein Kachelpaket von gpsinfo4zemokost.')
+    try:
+        check_manifest(manifest)
+    except BundleError:
+        zf.close()
+        raise
+    size = lambda x, y: zf.getinfo(bundle_member(x, y)).file_size
+    read = lambda x, y: zf.read(bundle_member(x, y))
+    return [tuple(t) for t in manifest['tiles']], size, read, zf.close
+
+# Puts the tiles of the bundle or tile store "path" into the tile cache, reporting to
+# "feedback". Returns the number of imported tiles. Raises BundleError, if the cache
+# is disabled or too small for the bundle.
+def import_bundle(path, feedback):
+    cache = tile_cache()
+    if cache is None:
+        raise BundleError('Zum Importieren eines Kachelpakets muss der Zwischenspeicher aktiviert sein (cache/enabled).')
+
+    try:
+        tiles, size, read, close = open_bundle(path)
+        try:
+            # the cache evicts the least recently used tiles, so the bundle has to fit into it
+            total = sum(size(*t) for t in tiles)
+            if total > cache.max_size:
+                raise BundleError(('Das Kachelpaket ist {:.0f} MB groß, der Zwischenspeicher nur {:.0f} MB. Bitte '
+                                   'erhöhen Sie cache/max_size_mb.').format(total / 1024 ** 2, cache.max_size / 1024 ** 2))
+
+            feedback.set_total(len(tiles))
+            feedback.set_text('Importiere {} Kacheln'.format(len(tiles)))
+            imported = 0
+            for (tile_nr_x, tile_nr_y) in tiles:
+                if feedback.is_canceled():
+                    break
+                cache.put(fm.www_layer_name, tile_nr_x, tile_nr_y, read(tile_nr_x, tile_nr_y))
+                imported += 1
+                feedback.step()
+        finally:
+            close()
+    except (OSError, BadZipFile, KeyError, sqlite3.Error, fm.TileDownloadError) as e:
+        raise BundleError('Das Kachelpaket {} konnte nicht gelesen werden: {}'.format(path, e))
+
+    return imported
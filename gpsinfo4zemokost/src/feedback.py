@@ -0,0 +1,57 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the Feedback base class. It does not depend on the engine, so
+the processing provider can be loaded without importing the engine.
+"""
+
+
+# The engine (compute, clipped_raster and tile_engine in function_module.py) reports its progress, warnings and
+# results to a Feedback object. This base class ignores all of them. The background task
+# of the main dialog (task.py) and the processing algorithm have their own subclasses.
+class Feedback:
+
+    def set_total(self, total):
+        # the computation takes "total" steps
+        pass
+
+    def step(self):
+        # one more step is done
+        pass
+
+    def set_text(self, text):
+        # describes what is being done at the moment
+        pass
+
+    def warn(self, text):
+        pass
+
+    def result(self, feature, vals_sum, vals_count, zonal = None):
+        # the result for "feature": sum and number of the data values inside it, and their
+        # extended statistics (a ZonalStats, see zonal_stats.py), if zonal/extended is set
+        pass
+
+    def is_canceled(self):
+        return False
@@ -22,19 +22,29 @@
 
 
 # Qt, qgis and osgeo modules
-from PyQt5.QtWidgets import QTableWidgetItem
-from PyQt5.QtCore import QCoreApplication # import QCoreApplication.processEvents
-from osgeo import gdal, ogr
+from osgeo import gdal, ogr, gdal_array
 from qgis.core import QgsProject, QgsMapLayer, QgsWkbTypes
 from osgeo.osr import SpatialReference
 # standard python modules
 from zipfile import ZipFile
 from io import BytesIO
-from numpy import array, ndarray
-import requests
+import time
+from numpy import zeros, bincount, nonzero, unique, uint8, int32
 
 # custom modules
-from .gpsinfo4zemokost_dialog import GpsInfo4ZemokostWarningDlg
+from .tile_cache import tile_cache
+from .tile_source import tile_source, same_grid, HttpSource
+from .prefetch import TilePrefetcher
+from .parallel import TilePool
+from .raster_export import RasterWriter, VrtWriter, RasterExportError, format_from_path
+from . import zonal_stats
+from .result_cache import result_cache
+from .tile_index import tile_index, TileIndexError
+from . import settings
+from . import http_client
+from . import run_stats
+from . import memory
+from . import asc_format
 
 # --------------------------------------------------------------------------------------
 # -------------------- some global values ----------------------------------------------
@@ -47,31 +57,59 @@ TD = {'NCOLS':150, 'NROWS':150, 'EPSG':'EPSG:31287',
 www_layer_name = 'AT_OGD_DHM_LAMB_10M_SLOPE'
 www_folder = 'https://austrian-geodata-services.org/gpsinfo/' + www_layer_name + '_COMPRESSED/'
 
-# This function (process) is the outer frame of the result creation.
-# The main task of downloading and processing the tiles is done by 
-# the function clipped_raster, defined below.
-def process(dlg, post_warn_dlg):
-    # :param dlg --- the plugins main dialog defined in gps_info_4_zemokost.py
-
-
-
-    # decide whether to calculate mean only for ...
-    # ... selected feature (False) or entire layer (True)
-    only_sel = dlg.onlySelFeat.isChecked()
- 
-    # get a feature iterator                        
-    if dlg.onlySelFeat.isChecked():
-        feats = list(dlg.selected_layer.getSelectedFeatures())
-    else:
-        feats = list(dlg.selected_layer.getFeatures())
-
-    
-    # Define a warning message for features containing no data points and those outside the data region
-    warning = ''
-
-    # Compute the number of tiles that get processed (not necessarily all of them are downloaded).
-    # This needed to set up the progress bar.
-    nr_of_tiles_dl = 0
+# raised by the downloaders, if a tile cannot be downloaded
+class TileDownloadError(Exception):
+    def __init__(self, tile_nr_x, tile_nr_y, reason):
+        self.tile = (tile_nr_x, tile_nr_y)
+        super().__init__('Die Kachel ({}, {}) konnte nicht heruntergeladen werden: {}'.format(
+                         tile_nr_x, tile_nr_y, reason or 'unbekannter Fehler'))
+
+# This function (compute) computes the mean slope of the features "feats" (in EPSG:31287)
+# and reports the results to "feedback" (see feedback.py). If "raster_path" is not empty,
+# the raster data inside the features is saved there, in the format "raster_format" (see
+# raster_export.py, None: derived from the extension of raster_path). The results of
+# features computed before are taken from the result cache, see result_cache.py, and the
+# tiles inside the features from the tile index, see tile_index.py.
+# Returns the timers and counters of the run, see run_stats.py.
+# The main task of downloading and processing the tiles is done by
+# the functions clipped_raster and tile_engine, defined below.
+def compute(feats, raster_path, feedback, raster_format = None):
+
+    stats = run_stats.begin()
+    stats.config.update({'engine/mode': settings.value('engine/mode'),
+                         'engine/processes': settings.value('engine/processes'),
+                         'download/workers': settings.value('download/workers'),
+                         'memory/budget_mb': settings.value('memory/budget_mb'),
+                         'zonal/extended': settings.value('zonal/extended'),
+                         'results/cache': settings.value('results/cache'),
+                         'index/enabled': settings.value('index/enabled')})
+    # the raster export is buffered by gdal's block cache, see memory.py
+    gdal_cache = memory.limit_gdal_cache()
+    # the extended statistics of the features, see zonal_stats.py
+    zonal_config = zonal_stats.config()
+    results = result_cache('{}|{}'.format(www_layer_name, tile_source().name), zonal_config)
+    try:
+        index = tile_index()
+    except TileIndexError as e:
+        feedback.warn(str(e))
+        index = None
+    try:
+        compute_features(feats, raster_path, feedback, raster_format, stats, zonal_config, results, index)
+    finally:
+        if results is not None:
+            results.close()
+        if index is not None:
+            index.close()
+        memory.restore_gdal_cache(gdal_cache)
+        run_stats.end(stats)
+    return stats
+
+# the body of compute, reporting to the RunStats "stats". "results" is the ResultCache
+# (or None) the results are looked up in and stored to, "index" the TileIndex (or None)
+# the evaluated tiles are recorded in.
+def compute_features(feats, raster_path, feedback, raster_format, stats, zonal_config, results, index):
+
+    run_stats.count('features', len(feats))
 
     # tile bounding box for the merged dataset. Initialize with some values
     TN_l_tot, TN_r_tot, TN_b_tot, TN_t_tot= 99999, -99999, 99999, -99999
@@ -87,11 +125,11 @@ def process(dlg, post_warn_dlg):
 
         # make sure the the feature is covered by the data region
         if TN_l < 0 or TN_b < 0 or TN_r > 392 or TN_t > 202:
-            post_warn_dlg.add_warning(  ('In einem Feature mit {} = {} wurden keine Daten abgefragt, weil es'
+            feedback.warn(  ('In einem Feature mit {} = {} wurden keine Daten abgefragt, weil es'
                         ' außerhalb des Datensatzes liegt.').format(f.fields()[0].name(), str(f.attributes()[0])) )
+            run_stats.count('features_outside')
         else: 
             valid_feats.append(f)
-            nr_of_tiles_dl += (TN_r - TN_l+1) * (TN_t - TN_b+1)
 
             # update 
             TN_l_tot = min(TN_l_tot, TN_l)
@@ -104,122 +142,196 @@ def process(dlg, post_warn_dlg):
     nr_of_tiles_x_tot = TN_r_tot - TN_l_tot + 1
     nr_of_tiles_y_tot = TN_t_tot - TN_b_tot + 1
 
-    # check whether gdal.Open works. Consequently, set downloader to gdal_downloader (gdal.Open) or alt_downloader
-    downloader = gdal_downloader
-    # try downloading the tile (1, 1)
-    if downloader(1, 1) == None:
-        downloader = alt_downloader
-
-    # in case we want to save the raster data, set up a raster driver for the whole region
-    if dlg.rasterFilePath.text() != '' and dlg.rasterCheck.isChecked():
-        dr_tot = gdal.GetDriverByName( 'MEM' )
-        ds_tot = dr_tot.Create('', TD['NCOLS'] * nr_of_tiles_x_tot, TD['NROWS'] * nr_of_tiles_y_tot, 1, gdal.GDT_Float32)
-
-        # fetch geotransform for upper left tile
-        ds_ul = downloader(TN_l_tot, TN_t_tot)         # open .asc file
-
-        # set geotransform of merged raster to that of upper left tile
-        ds_tot.SetGeoTransform(ds_ul.GetGeoTransform())
-
-        # initialize an array of the necessary dimension
-        merged_array = ndarray((TD['NROWS'] * nr_of_tiles_y_tot, TD['NCOLS'] * nr_of_tiles_x_tot), dtype = float)
-        merged_array[:,:] = TD['NODATA']
-    else: 
-        merged_array = 0
-
-
-    # set up the progress bar
-    dlg.progressBar.setMinimum(0)
-    dlg.progressBar.setMaximum(nr_of_tiles_dl)
-    dlg.setProgressValue(0)
-
-    # The features in valid_feats may still contain no data points. Define a counter for those features which have
-    # no no data points, that is, only valid points.
-    j = 0
-
-    # collect the clipped datasets in case we want to save them
-    clipped_datasets = []
-
-    # number of too small features
-    nr_too_sm_feats = 0
-    for i in range(len(valid_feats)):
+    # the tiles come from the server or a local copy of it, see tile_source.py
+    source = tile_source()
+    if not same_grid(source.grid()):
+        feedback.warn('Die Kacheln von {} passen nicht zum Raster des Datensatzes.'.format(source.name))
+        return
+    downloader = source.fetch
+
+    # in case we want to save the raster data, set up a raster for the whole region. Its
+    # geotransform is that of the upper left tile. The tiles are written to disk one by one.
+    raster = None
+    if raster_path != '' and len(valid_feats) != 0:
+        geometry = (tile_geo_transform(TN_l_tot, TN_t_tot), TD['NCOLS'] * nr_of_tiles_x_tot,
+                    TD['NROWS'] * nr_of_tiles_y_tot, TD['NODATA'])
+        try:
+            if (raster_format or format_from_path(raster_path)) == 'VRT':
+                # the virtual raster refers to the locally stored tiles
+                if not source.has_gdal_paths():
+                    raise RasterExportError('Ein virtuelles Raster benötigt den Zwischenspeicher (cache/enabled) '
+                                            'oder ein Verzeichnis als Kachelquelle (source/type).')
+                raster = VrtWriter(raster_path, local_tile_path, *geometry)
+            else:
+                raster = RasterWriter(raster_path, raster_format, *geometry)
+        except RasterExportError as e:
+            feedback.warn(str(e))
 
-        vals, nodata_pt = clipped_raster(dlg, valid_feats[i], merged_array, downloader, TN_l_tot, TN_b_tot, nr_of_tiles_x_tot, nr_of_tiles_y_tot)
-            
-        if len(nodata_pt) == 0 and len(vals) != 0: 
-
-            # add a row to the result table    
-            dlg.resultTable.setRowCount(dlg.resultTable.rowCount() + 1)
-            dlg.resultTable.setEnabled(True)
-
-            # compute the centroid as a QgsPointXY object
-            c = valid_feats[i].geometry().centroid().asPoint()
-            # fill the result table
-            dlg.resultTable.setItem(j, 0, QTableWidgetItem(str(valid_feats[i].attributes()[0])))
-            dlg.resultTable.setItem(j, 1, QTableWidgetItem('({:.1f}, {:.1f})'.format(c.x(), c.y() )))
-            # area in square km:
-            dlg.resultTable.setItem(j, 2, QTableWidgetItem('{:.5f}'.format(valid_feats[i].geometry().area() / 1000000 )))
-            dlg.resultTable.setItem(j, 3, QTableWidgetItem('{:.5f}'.format(sum(vals) / len(vals) )))
-
-            dlg.resultTable.resizeColumnsToContents()
-            j += 1
-            QCoreApplication.processEvents()
-        elif len(nodata_pt) != 0:
-            post_warn_dlg.add_warning( ('In einem Feature mit {} = {} wurden keine Daten abgefragt, weil an den'
-                                        ' Koordinaten ({:.0f}, {:.0f}) ein Punkt ohne Daten gefunden '
-                                        'wurde.').format(valid_feats[i].fields()[0].name(),
-                                                         str(valid_feats[i].attributes()[0]), 
-                                                         nodata_pt[0], nodata_pt[1]) )
-
-        elif len(nodata_pt) == 0 and len(vals) == 0:   # in this case, the feature is too small.
-            nr_too_sm_feats += 1
+    # The raster data written so far is discarded, if the engine fails, so no partial
+    # raster file is left behind.
+    try:
+        # number of too small features
+        nr_too_sm_feats = 0
+
+        # reports the result of valid_feats[i] and stores it for later runs, see add_result
+        def report(i, vals_sum, vals_count, nodata_pt, error, zonal):
+            if results is not None and error == '':
+                results.put(keys[i], vals_sum, vals_count, nodata_pt, zonal)
+            return add_result(feedback, valid_feats[i], vals_sum, vals_count, nodata_pt, error, zonal)
+
+        # Take the results of the unchanged features from the result cache. If the raster data
+        # is saved, all features are computed, since their data is needed.
+        keys = [results.key(ogr_geometry(f)) for f in valid_feats] if results is not None else []
+        todo = list(range(len(valid_feats)))
+        if results is not None and raster is None:
+            todo = []
+            for i in range(len(valid_feats)):
+                cached = results.get(keys[i])
+                if cached is None:
+                    todo.append(i)
+                    continue
+                vals_sum, vals_count, nodata_pt, zonal = cached
+                if add_result(feedback, valid_feats[i], vals_sum, vals_count, nodata_pt, '', zonal):
+                    nr_too_sm_feats += 1
+            run_stats.count('features_cached', len(valid_feats) - len(todo))
+
+        # The aggregates of the tiles inside the features are taken from the tile index, unless
+        # the raster data is saved or the statistics need the data values themselves.
+        use_index = index is not None and raster is None and (zonal_config is None or not zonal_config.needs_pixels())
+
+        if settings.value('engine/mode') == 'feature':
+            # process the features one after the other. The tiles of all features are downloaded
+            # concurrently in the background, in the order in which they are processed.
+            with run_stats.timer('prepare'):
+                feat_geoms = [ogr_geometry(valid_feats[i]) for i in todo]
+                feat_tiles = [feature_tiles(g) for g in feat_geoms]
+                covered = [covered_tiles(index, g, ft) if use_index else dict() for (g, ft) in zip(feat_geoms, feat_tiles)]
+                # only the remaining tiles are downloaded
+                feat_tiles = [[t for t in ft if t not in c] for (ft, c) in zip(feat_tiles, covered)]
+            tiles = [tile for ft in feat_tiles for tile in ft]
+
+            # records the fetched tiles in the tile index, a tile shared by several features once
+            recorded = set()
+            def get_tile(tile_nr_x, tile_nr_y):
+                tile = prefetcher.get(tile_nr_x, tile_nr_y)
+                if index is not None and (tile_nr_x, tile_nr_y) not in recorded:
+                    recorded.add((tile_nr_x, tile_nr_y))
+                    index.record(tile_nr_x, tile_nr_y, tile[1])
+                return tile
+
+            # the tiles that could not be fetched. A tile shared by several features is counted once.
+            failed = set()
+
+            # the progress bar counts the tiles of the features
+            feedback.set_total(len(tiles))
+            with TilePrefetcher(downloader, tiles, settings.value('download/workers'),
+                                tiles_in_flight(settings.value('download/workers'))) as prefetcher:
+                for (k, i) in enumerate(todo):
+                    if feedback.is_canceled():
+                        break
+                    try:
+                        vals_sum, vals_count, nodata_pt, zonal = clipped_raster(feedback, valid_feats[i], feat_tiles[k], raster,
+                                                                                get_tile, zonal_config, covered[k].values())
+                        error = ''
+                    except TileDownloadError as e:
+                        vals_sum, vals_count, nodata_pt, zonal, error = 0.0, 0, [], None, str(e)
+                        if e.tile not in failed:
+                            failed.add(e.tile)
+                            run_stats.count('tiles_failed')
+                    if report(i, vals_sum, vals_count, nodata_pt, error, zonal):
+                        nr_too_sm_feats += 1
+        else:
+            # process all features at once, tile by tile
+            vals_sums, vals_counts, nodata_pts, errors, zonals = tile_engine(feedback, [valid_feats[i] for i in todo],
+                                                                             raster, downloader, zonal_config,
+                                                                             index, use_index)
+            if not feedback.is_canceled():
+                for (k, i) in enumerate(todo):
+                    if report(i, vals_sums[k], vals_counts[k], nodata_pts[k], errors[k], zonals[k]):
+                        nr_too_sm_feats += 1
+    except BaseException:
+        if raster is not None:
+            raster.discard()
+        raise
+
+    run_stats.count('features_too_small', nr_too_sm_feats)
 
     # write an error text if there are too small features
     if nr_too_sm_feats == 1:
-        post_warn_dlg.add_warning( ('Ein Feature ist kleiner als die Auflösung des '
+        feedback.warn( ('Ein Feature ist kleiner als die Auflösung des '
                     'zugrundeliegenden Rasterdatensatzes und wird nicht in '
                     'der Tabelle dargestellt.')  )
 
     if nr_too_sm_feats >= 2:
-        post_warn_dlg.add_warning( ('{} Features sind kleiner als die Auflösung des '
+        feedback.warn( ('{} Features sind kleiner als die Auflösung des '
                     'zugrundeliegenden Rasterdatensatzes und werden nicht in '
                     'der Tabelle dargestellt.').format(nr_too_sm_feats) )
 
-    
-    if dlg.rasterFilePath.text() != '' and dlg.rasterCheck.isChecked():
-        dlg.progressBar.setFormat('Speichere Rasterdaten')
-        QCoreApplication.processEvents()
-        ds_tot.GetRasterBand(1).WriteArray(merged_array)
-
-        try:
-            gdal.Translate(dlg.rasterFilePath.text(), ds_tot, format = 'AAIGrid', noData = TD['NODATA']) 
-        except:
-            post_warn_dlg.add_warning('There was an error writing the raster data to file.')
-
-    dlg.progressBar.setFormat('Berechnung beendet.')
-    # enable save button
-    dlg.saveButton.setEnabled(True)
-
-
-
-
-# for given "feature", the following function computes which tiles are necessary,
-# downloads them from the internet, clips the tiles to the extent of the feature
-# and collects the data values in a list, called "vals".
-def clipped_raster(dlg, feature, merged_array, downloader, TN_l_tot, TN_b_tot, nr_of_tiles_x_tot, nr_of_tiles_y_tot):
+    # offline, the tiles that are not in the tile cache are missing, see cache_downloader
+    missing = stats.counters.get('tiles_failed', 0)
+    if missing != 0 and offline() and isinstance(source, HttpSource):
+        feedback.warn( ('{} Kacheln sind nicht im Zwischenspeicher und konnten ohne Verbindung zum Server nicht '
+                        'geladen werden. Die Features, die diese Kacheln berühren, wurden nicht '
+                        'berechnet.').format(missing) )
+
+
+    if raster is not None:
+        if feedback.is_canceled():
+            raster.discard()
+        else:
+            feedback.set_text('Speichere Rasterdaten')
+            try:
+                with run_stats.timer('raster_finish'):
+                    raster.finish()
+            except RasterExportError as e:
+                feedback.warn(str(e))
+
+    cache = tile_cache()
+    if cache is not None:
+        stats.config['cache/size_mb'] = round(cache.size() / 1024 / 1024, 1)
+        stats.config['cache/max_size_mb'] = settings.value('cache/max_size_mb')
+
+
+# Reports the result for "feature" to "feedback", or a warning in case the feature contains
+# a no data point or one of its tiles could not be downloaded ("error").
+# "vals_sum" and "vals_count" are the sum and the number of the data values inside the feature,
+# "zonal" their extended statistics (a ZonalStats, see zonal_stats.py) or None.
+# Returns True, if the feature is too small to contain data.
+def add_result(feedback, feature, vals_sum, vals_count, nodata_pt, error = '', zonal = None):
+
+    if error != '':
+        feedback.warn( ('In einem Feature mit {} = {} wurden keine Daten abgefragt. {}').format(
+                        feature.fields()[0].name(), str(feature.attributes()[0]), error) )
+        run_stats.count('features_failed')
+    elif len(nodata_pt) == 0 and vals_count != 0:
+        feedback.result(feature, vals_sum, vals_count, zonal)
+    elif len(nodata_pt) != 0:
+        feedback.warn( ('In einem Feature mit {} = {} wurden keine Daten abgefragt, weil an den'
+                        ' Koordinaten ({:.0f}, {:.0f}) ein Punkt ohne Daten gefunden '
+                        'wurde.').format(feature.fields()[0].name(),
+                                         str(feature.attributes()[0]),
+                                         nodata_pt[0], nodata_pt[1]) )
+        run_stats.count('features_nodata')
+    else:   # in this case, the feature is too small.
+        return True
+
+    return False
+
+
+
+
+# for given "feature" and the list "tiles" of the tiles intersecting it (see feature_tiles),
+# the following function fetches the tiles using the function get_tile, clips them to the
+# extent of the feature and adds up and counts the data values inside the feature
+# ("vals_sum", "vals_count"). Unless "zonal_config" is None, the values are also added to
+# a ZonalStats ("zonal", see zonal_stats.py), in the same pass. "aggregates" are those of
+# the tiles inside the feature which are not in "tiles", see covered_tiles.
+def clipped_raster(feedback, feature, tiles, raster, get_tile, zonal_config = None, aggregates = ()):
 
     ################################################################
     # STEP 1 -- PREPARE THE GDAL-FEATURE-LAYER
     ################################################################ 
  
-    # remove the Z-dimension and M-dimension, if present
-    abs_geom = feature.geometry().constGet()
-    abs_geom.dropZValue()
-    abs_geom.dropMValue()
-
-    # represent feature as WellKnownText-format so we can import it in ogr
-    feat_wkt = abs_geom.asWkt()
-
     # create a memory vector driver and datasource for the feature
     driver = ogr.GetDriverByName('Memory')
     ds = driver.CreateDataSource('out')
@@ -228,8 +340,8 @@ def clipped_raster(dlg, feature, merged_array, downloader, TN_l_tot, TN_b_tot, n
     spa.ImportFromEPSG(31287)
     # create a layer
     layer = ds.CreateLayer('selected_feature', srs = spa)
-    # create a gdal feature from the wkt-repr. of the qgis feature
-    geom = ogr.CreateGeometryFromWkt(feat_wkt)
+    # create a gdal feature from the qgis feature
+    geom = ogr_geometry(feature)
     gdal_feat = ogr.Feature(ogr.FeatureDefn())
     gdal_feat.SetGeometryDirectly(geom)
     # add it to the layer
@@ -240,98 +352,537 @@ def clipped_raster(dlg, feature, merged_array, downloader, TN_l_tot, TN_b_tot, n
     # STEP 2 -- determine, download and process the necessary tiles
     ################################################################ 
 
-    # get the coordinate bounding box
-    x_totin, x_totax, y_totin, y_totax = layer.GetExtent()
-    # and from it the tile bounding box
-    TN_l, TN_r, TN_b, TN_t = compute_tile_bb(x_totin, x_totax, y_totin, y_totax)
-
     # initialize the return values
-    vals = list()
+    vals_sum = 0.0
+    vals_count = 0
     nodata_pt = []
-
-    # iterate through all the tiles needed to cover the bounding box of the feature
-    for ix in range(TN_r - TN_l+1):
-        for iy in range(TN_t - TN_b+1):
+    zonal = zonal_stats.ZonalStats(zonal_config) if zonal_config is not None else None
+
+    # the tiles inside the feature, from the tile index
+    for agg in aggregates:
+        vals_sum += agg.sum
+        vals_count += agg.count
+        if zonal is not None:
+            zonal.add_aggregate(agg.count, agg.sum, agg.sumsq, agg.min, agg.max)
+
+    # Unless the window of tiles is too large, the feature is rasterized once for all
+    # of its tiles and the mask of each tile is sliced from it. "_w" means "window".
+    array_w = None
+    if len(tiles) != 0:
+        TN_l, TN_r = min(t[0] for t in tiles), max(t[0] for t in tiles)
+        TN_b, TN_t = min(t[1] for t in tiles), max(t[1] for t in tiles)
+        xsize, ysize = (TN_r - TN_l + 1) * TD['NCOLS'], (TN_t - TN_b + 1) * TD['NROWS']
+        if xsize * ysize <= settings.value('engine/window_max_pixels'):
+            with run_stats.timer('rasterize'):
+                # in memory or on disk, depending on the memory budget
+                array_w = rasterize_geometry(geom, tile_geo_transform(TN_l, TN_t), xsize, ysize,
+                                             out = memory.array((ysize, xsize), uint8))
+
+    # iterate through the tiles intersecting the feature, see feature_tiles
+    for (tile_nr_x, tile_nr_y) in tiles:
+        ##########
+        # STEP 2.1
+        ##########
+        # only process the tile if no no-data points have been found yet
+        if len(nodata_pt) == 0:
             ##########
-            # STEP 2.1
+            # STEP 2.2, fetch the downloaded tile
             ##########
-            # check if the tile (ix,iy) really intersects the feature:
-            # create a rectangle of the size of the tile
-            # to be on safe side, make rectangle slightly smaller than tile
-            x_left = TD['XLL'] + ((ix + TN_l) * TD['NCOLS'] +1) * TD['CELLSIZE']
-            x_right = TD['XLL'] + ((ix + TN_l) + 1) * TD['NCOLS'] * TD['CELLSIZE']
-            y_bottom = TD['YLL'] + ((iy + TN_b) * TD['NROWS'] +1) * TD['CELLSIZE']
-            y_top = TD['YLL'] + ((iy + TN_b) +1 ) * TD['NROWS'] * TD['CELLSIZE']
-
-            rect = ogr.Geometry(ogr.wkbLinearRing)
-            rect.AddPoint(x_left, y_bottom)
-            rect.AddPoint(x_right, y_bottom)
-            rect.AddPoint(x_right, y_top)
-            rect.AddPoint(x_left, y_top)
-            rect.AddPoint(x_left, y_bottom)
-
-            poly = ogr.Geometry(ogr.wkbPolygon)
-            poly.AddGeometry(rect)
-
-            # only download and process the tile if it intersects the feature (geom)
-            # and if no no-data points have been found yet
-            if poly.Intersects(geom) and len(nodata_pt) == 0:
-                ##########
-                # STEP 2.2, download, unzip and open the tile with gdal
-                ##########
-
-                ds_www = downloader(TN_l+ix, TN_b+iy)             # open .asc file
-                # save its GeoTransform
-                geo_trafo = ds_www.GetGeoTransform()
-    
 
-                ##########
-                # STEP 2.3, rasterize the polygon feature. "_m" means "mask".
-                ##########
-                dr_m = gdal.GetDriverByName( 'MEM' )
-                ds_m = dr_m.Create('', TD['NCOLS'], TD['NROWS'], 1, gdal.GDT_Int16)
-                ds_m.SetGeoTransform(geo_trafo)
-                # burn the mask values: 1 inside polygon feature, 0 outside
-                gdal.RasterizeLayer(ds_m, [1], layer, burn_values = [1])
-                #gdal.Rasterize(ds_m, ds)#, burnValues = [1], allTouched = True)
-            
+            geo_trafo, array_www = get_tile(tile_nr_x, tile_nr_y)
 
-                ##########
-                # STEP 2.3, multiply the rasterized polygon with the downloaded tile, thereby creating clipped_array
-                ##########
-                array_m = ds_m.ReadAsArray()
-                array_www = ds_www.ReadAsArray()
-                shp = array_www.shape
 
-                # iterate over the elements of the array
-                for i in range(shp[0]):
-                    for j in range(shp[1]):
-                        if array_m[i,j] == 1:       # if "(i,j)" is inside polygon:
-                            if array_www[i,j] == TD['NODATA']:      # if point is nodata point
-                                nodata_pt = gdal.ApplyGeoTransform(geo_trafo, j + 0.5, i + 0.5)
-                            else:
-                                vals.append(array_www[i,j])
+            ##########
+            # STEP 2.3, rasterize the polygon feature. "_m" means "mask".
+            ##########
+            if array_w is not None:
+                # the part of the window covered by the tile
+                I = (TN_t - tile_nr_y) * TD['NROWS']
+                J = (tile_nr_x - TN_l) * TD['NCOLS']
+                array_m = array_w[I:I + TD['NROWS'], J:J + TD['NCOLS']]
+            else:
+                with run_stats.timer('rasterize'):
+                    dr_m = gdal.GetDriverByName( 'MEM' )
+                    ds_m = dr_m.Create('', TD['NCOLS'], TD['NROWS'], 1, gdal.GDT_Int16)
+                    ds_m.SetGeoTransform(geo_trafo)
+                    # burn the mask values: 1 inside polygon feature, 0 outside
+                    gdal.RasterizeLayer(ds_m, [1], layer, burn_values = [1])
+                    #gdal.Rasterize(ds_m, ds)#, burnValues = [1], allTouched = True)
+                    array_m = ds_m.ReadAsArray()
 
 
-                                # if raster should be saved
-                                if dlg.rasterFilePath.text() != '' and dlg.rasterCheck.isChecked():  
+            ##########
+            # STEP 2.3, multiply the rasterized polygon with the downloaded tile, thereby creating clipped_array
+            ##########
 
-                                    # fill the merged array
-                                    I = (nr_of_tiles_y_tot - (TN_b - TN_b_tot + iy + 1))* TD['NROWS'] + i
-                                    J = (TN_l - TN_l_tot + ix) * TD['NCOLS'] + j
-                                  
-                                    merged_array[I, J] = array_www[i, j]
+            with run_stats.timer('evaluate'):
+                # "(i,j)" is inside polygon, if array_m[i,j] == 1
+                inside = array_m == 1
+                valid = array_www != TD['NODATA']
+
+                # report the first no data point inside the polygon
+                rows, cols = nonzero(inside & ~valid)
+                if len(rows) != 0:
+                    nodata_pt = gdal.ApplyGeoTransform(geo_trafo, cols[0] + 0.5, rows[0] + 0.5)
+
+                # add up and count the data values inside the polygon
+                sel = inside & valid
+                vals_sel = array_www[sel]
+                vals_sum += float(vals_sel.sum(dtype = float))
+                vals_count += vals_sel.size
+                if zonal is not None:
+                    zonal.add(vals_sel)
+            run_stats.count('pixels_processed', array_www.size)
+
+            # if raster should be saved
+            if raster is not None:
+                with run_stats.timer('raster_write'):
+                    raster.write(geo_trafo, array_www, sel)
+
+        feedback.step()
+
+    return vals_sum, vals_count, nodata_pt, zonal
+
+# This function is the tile-centric counterpart of clipped_raster. Instead of downloading
+# the tiles feature by feature, it computes the set of tiles required by all the features,
+# downloads each of them once and rasterizes all features intersecting a tile in one go,
+# using the index of the feature (plus 1) as burn value. The sums and counts of the data
+# values of each feature are then obtained with bincount. If the setting engine/processes
+# is positive, the tiles are evaluated in a pool of processes, see parallel.py. Unless
+# "zonal_config" is None, the extended statistics are accumulated per label as well.
+# The evaluated tiles are recorded in the TileIndex "index" (or None). If "use_index",
+# the tiles inside a feature are taken from it for this feature, see covered_tiles.
+# Returns the lists vals_sums, vals_counts, nodata_pts, errors (of the downloads) and
+# zonals (ZonalStats or None), indexed like "feats".
+def tile_engine(feedback, feats, raster, downloader, zonal_config = None, index = None, use_index = False):
+
+    nr_of_feats = len(feats)
+    started = time.perf_counter()
 
+    ################################################################
+    # STEP 1 -- determine the tiles and the features intersecting them
+    ################################################################
 
+    geoms = [ogr_geometry(f) for f in feats]
+
+    # tile (tile_nr_x, tile_nr_y) : indices of the features intersecting it. The tiles
+    # inside a feature taken from the tile index are left out, as (index, Aggregate) in "covered".
+    tile_feats = dict()
+    covered = []
+    for i in range(nr_of_feats):
+        tiles = feature_tiles(geoms[i])
+        inside = covered_tiles(index, geoms[i], tiles) if use_index else dict()
+        for tile in tiles:
+            if tile in inside:
+                covered.append((i, inside[tile]))
             else:
-                # this is the case that either we have already found a no data point inside the polygon
-                # or the tile doesn't intersect the polygon
-                pass  
-            
-            dlg.setProgressValue(dlg.progressBar.value()+1)
-            QCoreApplication.processEvents()
-            
-    return vals, nodata_pt
+                tile_feats.setdefault(tile, []).append(i)
+
+    # the progress bar counts the tiles
+    feedback.set_total(len(tile_feats))
+
+    ################################################################
+    # STEP 2 -- prepare one gdal-feature-layer per group of non-overlapping features
+    ################################################################
+
+    # A label raster can only hold one feature per pixel. Overlapping features are
+    # therefore put into different groups, each of which is rasterized separately.
+    group = label_groups(geoms, tile_feats)
+    nr_of_groups = max(group) + 1 if nr_of_feats else 0
+
+    # the tiles intersecting the features of each group
+    group_tiles = [[] for g in range(nr_of_groups)]
+    for tile in sorted(tile_feats):
+        for g in set(group[i] for i in tile_feats[tile]):
+            group_tiles[g].append(tile)
+
+    pool = None
+    processes = settings.value('engine/processes')
+    if processes > 0:
+        try:
+            pool = TilePool(processes, settings.value('engine/python'), tiles_in_flight(processes))
+        except (ImportError, RuntimeError, OSError) as e:
+            feedback.warn('Die parallele Berechnung ist nicht möglich ({}). '
+                          'Die Kacheln werden nacheinander ausgewertet.'.format(e))
+
+    # the worker processes get the features as WKB
+    wkbs = [bytes(g.ExportToWkb()) for g in geoms] if pool is not None else []
+
+    spa = SpatialReference()
+    spa.ImportFromEPSG(31287)
+    driver = ogr.GetDriverByName('Memory')
+    ds = driver.CreateDataSource('out')
+    layers = []
+    for g in range(nr_of_groups):
+        layer = ds.CreateLayer('features_{}'.format(g), srs = spa)
+        layer.CreateField(ogr.FieldDefn('label', ogr.OFTInteger))
+        layers.append(layer)
+    for i in range(nr_of_feats):
+        layer = layers[group[i]]
+        gdal_feat = ogr.Feature(layer.GetLayerDefn())
+        gdal_feat.SetField('label', i + 1)
+        gdal_feat.SetGeometry(geoms[i])
+        layer.CreateFeature(gdal_feat)
+
+    run_stats.add_time('prepare', time.perf_counter() - started)
+
+    ################################################################
+    # STEP 3 -- download and process the tiles
+    ################################################################
+
+    # initialize the return values. Index 0 collects the pixels outside of all features.
+    vals_sums = zeros(nr_of_feats + 1)
+    vals_counts = zeros(nr_of_feats + 1, dtype = int)
+    nodata_pts = [[] for i in range(nr_of_feats)]
+    # the tile of each no data point. The point of the first tile in sorted order is
+    # reported, so it does not depend on the order in which the downloads finish.
+    nodata_tiles = [None for i in range(nr_of_feats)]
+    errors = ['' for i in range(nr_of_feats)]
+    # label : ZonalStats of the feature
+    zonal = dict()
+
+    for (i, agg) in covered:
+        vals_sums[i + 1] += agg.sum
+        vals_counts[i + 1] += agg.count
+        if zonal_config is not None:
+            if i + 1 not in zonal:
+                zonal[i + 1] = zonal_stats.ZonalStats(zonal_config)
+            zonal[i + 1].add_aggregate(agg.count, agg.sum, agg.sumsq, agg.min, agg.max)
+
+    save_raster = raster is not None
+
+    # the results of the worker processes, tile : (labels, sums, counts, nodata points, ZonalStats)
+    results = dict()
+
+    # Each group is rasterized once, with its first tile, over the window of its tiles and the
+    # labels of each tile are sliced from it, see clipped_raster and label_window. The window
+    # of a group is released after its last tile. The live windows take at most a quarter of
+    # the memory budget, see memory.py; the groups not fitting in are rasterized per tile.
+    # group : (TN_l, TN_t, label array) or None, if the group is rasterized per tile
+    windows = dict()
+    budget = memory.budget()
+    window_bytes = None if budget is None else budget // 4
+    # the number of tiles of each group not evaluated yet
+    tiles_left = [len(tiles) for tiles in group_tiles]
+
+    def tile_done(tile):
+        # releases the windows of the groups whose last tile "tile" is
+        for g in set(group[i] for i in tile_feats[tile]):
+            tiles_left[g] -= 1
+            if tiles_left[g] == 0:
+                windows[g] = None
+
+    try:
+        # the tiles are downloaded concurrently and processed in the order the downloads finish
+        with TilePrefetcher(downloader, sorted(tile_feats), settings.value('download/workers'),
+                            tiles_in_flight(settings.value('download/workers'))) as prefetcher:
+            for (tile_nr_x, tile_nr_y), future in prefetcher:
+                if feedback.is_canceled():
+                    break
+                try:
+                    geo_trafo, array_www = future.result()
+                except TileDownloadError as e:
+                    run_stats.count('tiles_failed')
+                    # the features intersecting the tile cannot be evaluated
+                    for i in tile_feats[(tile_nr_x, tile_nr_y)]:
+                        errors[i] = errors[i] or str(e)
+                    tile_done((tile_nr_x, tile_nr_y))
+                    feedback.step()
+                    continue
+
+                run_stats.count('pixels_processed', array_www.size)
+                if index is not None:
+                    index.record(tile_nr_x, tile_nr_y, array_www)
+
+                if pool is not None:
+                    # hand the tile over to the worker processes, one list of (label, wkb) per group
+                    groups = dict()
+                    for i in tile_feats[(tile_nr_x, tile_nr_y)]:
+                        groups.setdefault(group[i], []).append((i + 1, wkbs[i]))
+                    with run_stats.timer('parallel'):
+                        pool.submit((tile_nr_x, tile_nr_y), geo_trafo, array_www, [groups[g] for g in sorted(groups)],
+                                    TD['NODATA'], save_raster, zonal_config)
+                        collect_results(feedback, pool, results, raster, block = pool.busy())
+                    continue
+
+                valid = array_www != TD['NODATA']
+
+                # The labels of the features evaluated in the tile. The label raster of a group
+                # also holds the features the tile is taken from the tile index for, they
+                # must not be counted twice.
+                wanted = zeros(nr_of_feats + 1, dtype = bool)
+                wanted[[i + 1 for i in tile_feats[(tile_nr_x, tile_nr_y)]]] = True
+
+                if save_raster:
+                    # the data inside any of the features
+                    inside_any = zeros(array_www.shape, dtype = bool)
+
+                for g in sorted(set(group[i] for i in tile_feats[(tile_nr_x, tile_nr_y)])):
+                    # rasterize the features of group g intersecting the tile into a label raster
+                    with run_stats.timer('rasterize'):
+                        if g not in windows:
+                            free = None
+                            if window_bytes is not None:
+                                free = window_bytes - sum(w[2].nbytes for w in windows.values() if w is not None)
+                            windows[g] = label_window(layers[g], group_tiles[g], free)
+                        if windows[g] is not None:
+                            # the part of the window covered by the tile
+                            TN_l, TN_t, array_w = windows[g]
+                            I = (TN_t - tile_nr_y) * TD['NROWS']
+                            J = (tile_nr_x - TN_l) * TD['NCOLS']
+                            array_l = array_w[I:I + TD['NROWS'], J:J + TD['NCOLS']]
+                        else:
+                            array_l = rasterize_labels(layers[g], geo_trafo, TD['NCOLS'], TD['NROWS'])
+
+                    with run_stats.timer('evaluate'):
+                        inside = wanted[array_l]
+
+                        # report the first no data point of each feature
+                        rows, cols = nonzero(inside & ~valid)
+                        if len(rows) != 0:
+                            labels, first = unique(array_l[rows, cols], return_index = True)
+                            for label, k in zip(labels, first):
+                                if nodata_tiles[label - 1] is None or (tile_nr_x, tile_nr_y) < nodata_tiles[label - 1]:
+                                    nodata_pts[label - 1] = gdal.ApplyGeoTransform(geo_trafo, cols[k] + 0.5, rows[k] + 0.5)
+                                    nodata_tiles[label - 1] = (tile_nr_x, tile_nr_y)
+
+                        # add up the data values and count them, for all features at once
+                        sel = inside & valid
+                        labels = array_l[sel]
+                        vals_sums += bincount(labels, weights = array_www[sel], minlength = nr_of_feats + 1)
+                        vals_counts += bincount(labels, minlength = nr_of_feats + 1)
+                        if zonal_config is not None:
+                            zonal_stats.add_by_label(zonal, labels, array_www[sel], zonal_config)
+
+                        if save_raster:
+                            inside_any |= sel
+
+                if save_raster:
+                    with run_stats.timer('raster_write'):
+                        raster.write(geo_trafo, array_www, inside_any)
+
+                tile_done((tile_nr_x, tile_nr_y))
+                feedback.step()
+
+        if pool is not None and not feedback.is_canceled():
+            with run_stats.timer('parallel'):
+                collect_results(feedback, pool, results, raster, wait_all = True)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    if pool is not None:
+        # Merge the results in the order of the tiles, so the sums do not depend on the
+        # order in which the worker processes finished.
+        for tile in sorted(results):
+            labels, sums, counts, tile_nodata_pts, tile_zonal = results[tile]
+            vals_sums[labels] += sums
+            vals_counts[labels] += counts
+            for label in sorted(tile_nodata_pts):
+                if len(nodata_pts[label - 1]) == 0:
+                    nodata_pts[label - 1] = tile_nodata_pts[label]
+            for label in sorted(tile_zonal):
+                if label in zonal:
+                    zonal[label].merge(tile_zonal[label])
+                else:
+                    zonal[label] = tile_zonal[label]
+
+    zonals = [zonal.get(i + 1) for i in range(nr_of_feats)]
+    # plain python numbers, like clipped_raster returns, e.g. for the attributes of QGIS features
+    return vals_sums[1:].tolist(), vals_counts[1:].tolist(), nodata_pts, errors, zonals
+
+# Stores the results of the tiles finished by the worker processes of "pool" in "results"
+# and their clipped data in "raster". See TilePool.finished for "block" and "wait_all".
+def collect_results(feedback, pool, results, raster, block = False, wait_all = False):
+    for (tile_nr_x, tile_nr_y), result, clipped in pool.finished(block, wait_all):
+        results[(tile_nr_x, tile_nr_y)] = result
+        if clipped is not None:
+            raster.write(tile_geo_transform(tile_nr_x, tile_nr_y), clipped, clipped != TD['NODATA'])
+        feedback.step()
+
+# Returns the dict (tile_nr_x, tile_nr_y) : Aggregate of the tiles among "tiles" lying
+# completely inside the ogr geometry "geom", whose aggregates are in the TileIndex "index"
+# (see tile_index.py). Tiles with no data points are left out, they are evaluated as
+# usual, so the no data point is reported.
+def covered_tiles(index, geom, tiles):
+    covered = dict()
+    for (tile_nr_x, tile_nr_y) in tiles:
+        agg = index.get(tile_nr_x, tile_nr_y)
+        if agg is not None and agg.nodata == 0 and geom.Contains(tile_box(tile_nr_x, tile_nr_y)):
+            covered[(tile_nr_x, tile_nr_y)] = agg
+    run_stats.count('tiles_from_index', len(covered))
+    return covered
+
+# Assigns each of the geometries "geoms" a group, such that the geometries in a group
+# do not overlap (touching is fine). Only geometries sharing a tile are compared.
+# Returns the list of the group numbers.
+def label_groups(geoms, tile_feats):
+
+    # the indices of the geometries that share a tile with geometry i
+    neighbours = [set() for g in geoms]
+    for indices in tile_feats.values():
+        for i in indices:
+            neighbours[i].update(indices)
+
+    group = []
+    for i in range(len(geoms)):
+        taken = set()
+        for j in neighbours[i]:
+            if j < i and group[j] not in taken and \
+                    geoms[i].Intersects(geoms[j]) and not geoms[i].Touches(geoms[j]):
+                taken.add(group[j])
+        g = 0
+        while g in taken:
+            g += 1
+        group.append(g)
+
+    return group
+
+# Rasterizes the features of "layer" intersecting the raster of size xsize x ysize with
+# geotransform "geo_trafo", burning the value of their attribute "label". Returns the label
+# raster as array, which is "out" (of zeros, dtype int32), if given, otherwise a new one.
+def rasterize_labels(layer, geo_trafo, xsize, ysize, out = None):
+    # only consider the features intersecting the raster
+    layer.SetSpatialFilterRect(geo_trafo[0], geo_trafo[3] - ysize * TD['CELLSIZE'],
+                               geo_trafo[0] + xsize * TD['CELLSIZE'], geo_trafo[3])
+
+    # gdal rasterizes directly into the array, without a copy
+    array = zeros((ysize, xsize), dtype = int32) if out is None else out
+    ds_l = gdal_array.OpenArray(array)
+    ds_l.SetGeoTransform(geo_trafo)
+    gdal.RasterizeLayer(ds_l, [1], layer, options = ['ATTRIBUTE=label'])
+    ds_l.FlushCache()
+
+    layer.SetSpatialFilter(None)
+    return array
+
+# the least share of the tiles of a label window that have to be needed, see label_window
+WINDOW_MIN_SHARE = 0.25
+
+# Rasterizes the features of "layer" over the window of the tiles "tiles", see rasterize_labels.
+# Returns (TN_l, TN_t, label array) with the tile numbers of the upper left tile of the window.
+# Returns None, if the window has more than engine/window_max_pixels pixels, if less than
+# WINDOW_MIN_SHARE of its tiles are among "tiles" (e.g. for features far apart), or if it
+# takes more than "free_bytes" bytes (None: no limit).
+def label_window(layer, tiles, free_bytes = None):
+    TN_l, TN_r = min(t[0] for t in tiles), max(t[0] for t in tiles)
+    TN_b, TN_t = min(t[1] for t in tiles), max(t[1] for t in tiles)
+    nr_x, nr_y = TN_r - TN_l + 1, TN_t - TN_b + 1
+    xsize, ysize = nr_x * TD['NCOLS'], nr_y * TD['NROWS']
+    if xsize * ysize > settings.value('engine/window_max_pixels') or len(tiles) < WINDOW_MIN_SHARE * nr_x * nr_y:
+        return None
+    if free_bytes is not None and xsize * ysize * 4 > free_bytes:
+        return None
+    # in memory or on disk, depending on the memory budget
+    array_w = rasterize_labels(layer, tile_geo_transform(TN_l, TN_t), xsize, ysize,
+                               out = memory.array((ysize, xsize), int32))
+    return TN_l, TN_t, array_w
+
+# Returns the list of the tiles (tile_nr_x, tile_nr_y) intersecting the ogr geometry "geom",
+# sorted by tile_nr_x, then tile_nr_y. Instead of testing every tile of the bounding box,
+# the geometry is rasterized at tile resolution, so each pixel is a tile: the tiles whose
+# center is inside the geometry intersect it, only the tiles touched by its boundary
+# are tested with tile_polygon.
+def feature_tiles(geom):
+    x_min, x_max, y_min, y_max = geom.GetEnvelope()
+    TN_l, TN_r, TN_b, TN_t = compute_tile_bb(x_min, x_max, y_min, y_max)
+
+    # the geotransform of the tile grid covering the bounding box
+    geo_trafo = (TD['XLL'] + TN_l * TD['NCOLS'] * TD['CELLSIZE'], TD['NCOLS'] * TD['CELLSIZE'], 0,
+                 TD['YLL'] + (TN_t + 1) * TD['NROWS'] * TD['CELLSIZE'], 0, -TD['NROWS'] * TD['CELLSIZE'])
+    xsize, ysize = TN_r - TN_l + 1, TN_t - TN_b + 1
+    touched = rasterize_geometry(geom, geo_trafo, xsize, ysize, all_touched = True)
+    center_in = rasterize_geometry(geom, geo_trafo, xsize, ysize)
+
+    tiles = []
+    for row, col in zip(*nonzero(touched)):
+        tile_nr_x, tile_nr_y = TN_l + int(col), TN_t - int(row)
+        if center_in[row, col] or tile_polygon(tile_nr_x, tile_nr_y).Intersects(geom):
+            tiles.append((tile_nr_x, tile_nr_y))
+    return sorted(tiles)
+
+# Rasterizes the ogr geometry "geom" into a raster of size xsize x ysize with geotransform
+# "geo_trafo". Returns the array, 1 inside the geometry and 0 outside. If "all_touched",
+# all pixels touched by the geometry are inside, otherwise those whose center is inside.
+# The array is "out" (of zeros, dtype uint8), if given, otherwise a new one.
+def rasterize_geometry(geom, geo_trafo, xsize, ysize, all_touched = False, out = None):
+    ds = ogr.GetDriverByName('Memory').CreateDataSource('out')
+    layer = ds.CreateLayer('geometry')
+    gdal_feat = ogr.Feature(layer.GetLayerDefn())
+    gdal_feat.SetGeometry(geom)
+    layer.CreateFeature(gdal_feat)
+
+    # gdal rasterizes directly into the array, without a copy
+    array = zeros((ysize, xsize), dtype = uint8) if out is None else out
+    ds_m = gdal_array.OpenArray(array)
+    ds_m.SetGeoTransform(geo_trafo)
+    options = ['ALL_TOUCHED=TRUE'] if all_touched else []
+    gdal.RasterizeLayer(ds_m, [1], layer, burn_values = [1], options = options)
+    ds_m.FlushCache()
+    return array
+
+# the number of tiles that may be in flight in the download threads or the worker
+# processes, "workers" of them at a time, see memory.py
+def tiles_in_flight(workers):
+    return memory.max_tiles(2 * workers, TD['NCOLS'] * TD['NROWS'] * 4)
+
+# The gdal path of the locally stored tile (in the cache or a directory source) with
+# geotransform "geo_trafo", or None if there is none. This is the tile_source of the VrtWriter.
+def local_tile_path(geo_trafo):
+    tile_nr_x = int(round((geo_trafo[0] - TD['XLL']) / (TD['NCOLS'] * TD['CELLSIZE'])))
+    tile_nr_y = int(round((geo_trafo[3] - TD['YLL']) / (TD['NROWS'] * TD['CELLSIZE']))) - 1
+    return tile_source().gdal_path(tile_nr_x, tile_nr_y)
+
+# the geotransform of the tile (tile_nr_x, tile_nr_y), computed from the tile data TD
+def tile_geo_transform(tile_nr_x, tile_nr_y):
+    return (TD['XLL'] + tile_nr_x * TD['NCOLS'] * TD['CELLSIZE'], TD['CELLSIZE'], 0,
+            TD['YLL'] + (tile_nr_y + 1) * TD['NROWS'] * TD['CELLSIZE'], 0, -TD['CELLSIZE'])
+
+# converts the geometry of the qgis feature "feature" into an ogr geometry
+def ogr_geometry(feature):
+    # remove the Z-dimension and M-dimension, if present
+    abs_geom = feature.geometry().constGet()
+    abs_geom.dropZValue()
+    abs_geom.dropMValue()
+
+    # represent feature as WellKnownText-format so we can import it in ogr
+    return ogr.CreateGeometryFromWkt(abs_geom.asWkt())
+
+# creates a rectangle of the size of the tile (tile_nr_x, tile_nr_y).
+# To be on safe side, the rectangle is slightly smaller than the tile.
+def tile_polygon(tile_nr_x, tile_nr_y):
+    x_left = TD['XLL'] + (tile_nr_x * TD['NCOLS'] +1) * TD['CELLSIZE']
+    x_right = TD['XLL'] + (tile_nr_x + 1) * TD['NCOLS'] * TD['CELLSIZE']
+    y_bottom = TD['YLL'] + (tile_nr_y * TD['NROWS'] +1) * TD['CELLSIZE']
+    y_top = TD['YLL'] + (tile_nr_y +1 ) * TD['NROWS'] * TD['CELLSIZE']
+
+    rect = ogr.Geometry(ogr.wkbLinearRing)
+    rect.AddPoint(x_left, y_bottom)
+    rect.AddPoint(x_right, y_bottom)
+    rect.AddPoint(x_right, y_top)
+    rect.AddPoint(x_left, y_top)
+    rect.AddPoint(x_left, y_bottom)
+
+    poly = ogr.Geometry(ogr.wkbPolygon)
+    poly.AddGeometry(rect)
+    return poly
+
+# the rectangle covered by the tile (tile_nr_x, tile_nr_y), exactly
+def tile_box(tile_nr_x, tile_nr_y):
+    x_left, cellsize, rot_x, y_top, rot_y, minus_cellsize = tile_geo_transform(tile_nr_x, tile_nr_y)
+    x_right = x_left + TD['NCOLS'] * cellsize
+    y_bottom = y_top - TD['NROWS'] * cellsize
+
+    rect = ogr.Geometry(ogr.wkbLinearRing)
+    rect.AddPoint(x_left, y_bottom)
+    rect.AddPoint(x_right, y_bottom)
+    rect.AddPoint(x_right, y_top)
+    rect.AddPoint(x_left, y_top)
+    rect.AddPoint(x_left, y_bottom)
+
+    poly = ogr.Geometry(ogr.wkbPolygon)
+    poly.AddGeometry(rect)
+    return poly
 
 def load_layers(iface):
     # Load a dictionary of layerId:layer pairs
@@ -355,73 +906,169 @@ def load_layers(iface):
 
     return poly_dic, poly_ind
 
-# this downloader is default
-def gdal_downloader(tile_nr_x, tile_nr_y):
+# url of the zipped tile on the server
+def tile_url(tile_nr_x, tile_nr_y):
+    return www_folder + str(tile_nr_x) + '/' + str(tile_nr_y) + '.asc.zip'
+
+# path of the .asc file inside the zipped tile
+def tile_member(tile_nr_x, tile_nr_y):
+    return www_layer_name + '_TILED/' + str(tile_nr_x) + '/' + str(tile_nr_y) + '.asc'
+
+# Returns the downloader that works on this machine (gdal_downloader is preferred), by
+# downloading the tile (tile_nr_x, tile_nr_y) from the server the way each of them does.
+# The tile cache is bypassed, since a cached tile would pass the check without contacting
+# the server. "timeout": seconds for a quick check without retries (see http_client.get_once),
+# None: the timeouts and retries of the settings. Returns None, if neither of them works.
+def working_downloader(tile_nr_x = 1, tile_nr_y = 1, timeout = None):
+    url = tile_url(tile_nr_x, tile_nr_y)
+
+    # gdal's curl, as gdal_downloader uses it
+    http_client.session()       # applies the timeouts and retries to gdal
+    ds = gdal.Open('/vsizip//vsicurl/' + url + '/' + tile_member(tile_nr_x, tile_nr_y))
+    if ds is not None and ds.ReadAsArray() is not None:
+        return gdal_downloader
+
+    # the http session, as alt_downloader uses it
+    try:
+        response = http_client.get(url) if timeout is None else http_client.get_once(url, timeout)
+        response.raise_for_status()
+        with ZipFile(BytesIO(response.content)) as zf:
+            parse_asc(zf.read(zf.infolist()[0]))
+        return alt_downloader
+    except Exception:
+        return None
 
-    url = '/vsizip//vsicurl/' + www_folder + str(tile_nr_x)+'/'+str(tile_nr_y)+\
-                      '.asc.zip/' + www_layer_name + '_TILED/' + \
-                      str(tile_nr_x)+'/'+str(tile_nr_y)+'.asc'
+# the downloader that works on this machine, determined once per session
+_downloader = None
+
+# True, if the probe found no connection to the server, so the tiles are taken from
+# the tile cache only, see cache_downloader
+def offline():
+    return _downloader is cache_downloader
+
+def remember_downloader(downloader):
+    global _downloader
+    _downloader = downloader
+
+# Returns the remembered downloader. If there is none yet (e.g. the processing
+# algorithm runs without the dialog), it is determined now by the probe, which also
+# switches to cache_downloader when offline. If neither works, alt_downloader is tried.
+def session_downloader():
+    if _downloader is None:
+        from . import probe
+        probe.probe_server()
+    return _downloader or alt_downloader
+
+# The downloaders return the geotransform and the data (as array) of the tile
+# (tile_nr_x, tile_nr_y). They are called from the download threads.
+# this downloader is default. Raises TileDownloadError on failure.
+def gdal_downloader(tile_nr_x, tile_nr_y):
 
-    return gdal.Open(url)
+    http_client.session()       # applies the timeouts and retries to gdal
+    run_stats.count('tiles_fetched')
+    cache = tile_cache()
+    if cache is None:
+        url = '/vsizip//vsicurl/' + tile_url(tile_nr_x, tile_nr_y) + '/' + tile_member(tile_nr_x, tile_nr_y)
+        # gdal downloads the data when the tile is opened
+        with run_stats.timer('download'):
+            ds = gdal.Open(url)
+        if ds is None:
+            raise TileDownloadError(tile_nr_x, tile_nr_y, gdal.GetLastErrorMsg())
+        with run_stats.timer('decode'):
+            return ds.GetGeoTransform(), ds.ReadAsArray()
+
+    # look the tile up in the cache, download it with gdal if it is not there
+    path = cache.get(www_layer_name, tile_nr_x, tile_nr_y)
+    if path is None:
+        run_stats.count('cache_misses')
+        with run_stats.timer('download'):
+            data = vsicurl_read(tile_url(tile_nr_x, tile_nr_y))
+        if data is None:
+            raise TileDownloadError(tile_nr_x, tile_nr_y, gdal.GetLastErrorMsg())
+        run_stats.count('bytes_downloaded', len(data))
+        path = cache.put(www_layer_name, tile_nr_x, tile_nr_y, data)
+    else:
+        run_stats.count('cache_hits')
+
+    with run_stats.timer('decode'):
+        ds = gdal.Open('/vsizip/' + path + '/' + tile_member(tile_nr_x, tile_nr_y))
+        if ds is None:
+            # the cached file is corrupt. Remove it, such that it is downloaded again next time.
+            cache.discard(www_layer_name, tile_nr_x, tile_nr_y)
+            raise TileDownloadError(tile_nr_x, tile_nr_y, gdal.GetLastErrorMsg())
+        return ds.GetGeoTransform(), ds.ReadAsArray()
+
+# read the file at "url" into memory using gdal's curl, returns None on failure
+def vsicurl_read(url):
+    f = gdal.VSIFOpenL('/vsicurl/' + url, 'rb')
+    if f is None:
+        return None
+    try:
+        gdal.VSIFSeekL(f, 0, 2)
+        size = gdal.VSIFTellL(f)
+        gdal.VSIFSeekL(f, 0, 0)
+        data = gdal.VSIFReadL(1, size, f)
+    finally:
+        gdal.VSIFCloseL(f)
+
+    if data is None or len(data) != size:
+        return None
+    return data
 
-# this alternative downloader is used if gdal.Open does not work
+# this alternative downloader is used if gdal.Open does not work. Raises TileDownloadError on failure.
 def alt_downloader(tile_nr_x, tile_nr_y):
 
-    # construct url
-    url = www_folder + str(tile_nr_x) + '/' + str(tile_nr_y) + '.asc.zip'
-
+    run_stats.count('tiles_fetched')
+    cache = tile_cache()
 
     try:
-        # create a momemory driver and dataset on it
-        driver = gdal.GetDriverByName( 'MEM' )
-        ds = driver.Create('', TD['NCOLS'], TD['NROWS'], 1, gdal.GDT_Float32)
-
-        # access the zip file
-        zf = ZipFile(BytesIO(requests.get(url).content))
-
-        # read the rasterfile in the format of an array
-        lines = zf.open(zf.infolist()[0]).readlines()
-
-        # NOTE:
-        # in the following lines we use some properties that the .asc files on our server have:
-        # - carriage returns are used to separate header items and rows
-        # - the header is 6 lines, that is, there is a NO DATA value in line 6
-        # - the data starts in line 7 (index 6)
-        # these are not required by the standard, c.f. 
-        # http://help.arcgis.com/en/arcgisdesktop/10.0/help/index.html#/ESRI_ASCII_raster_format/009t0000000z000000/
-        # in particular, NO DATA is optional and carriage returns may be replaced by spaces
-
-        # read the geo transform
-    
-        #as from http://geoexamples.blogspot.com/2012/01/creating-files-in-ogr-and-gdal-with.html:
-
-        #geotransform = (left x-coordinate, x-cellsize, rotation ?,upper y-coordinate,rotation,y-cellsize)
-
-        #Xgeo = geotransform[0] + Xpixel*geotransform[1] + Yline*geotransform[2]
-        #Ygeo = geotransform[3] + Xpixel*geotransform[4] + Yline*geotransform[5]
-
-        #for some reason, y-cellsize must be negative here
-    
-        geo_trafo = (float(lines[2].split()[1]), TD['CELLSIZE'], 0,
-                float(lines[3].split()[1]) + TD['CELLSIZE'] * TD['NROWS'],0 , -TD['CELLSIZE'])
+        # access the zip file, either in the cache or on the server
+        path = None if cache is None else cache.get(www_layer_name, tile_nr_x, tile_nr_y)
+        if path is None:
+            if cache is not None:
+                run_stats.count('cache_misses')
+            with run_stats.timer('download'):
+                data = http_client.get(tile_url(tile_nr_x, tile_nr_y)).content
+            run_stats.count('bytes_downloaded', len(data))
+            # this raises, if the server did not send a zip file. So only valid files are cached.
+            zf = ZipFile(BytesIO(data))
+            if cache is not None:
+                cache.put(www_layer_name, tile_nr_x, tile_nr_y, data)
+        else:
+            run_stats.count('cache_hits')
+            zf = ZipFile(path)
+
+        # read the rasterfile and decode it
+        with zf, run_stats.timer('decode'):
+            return parse_asc(zf.read(zf.infolist()[0]))
+
+    except Exception as e:
+        raise TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+
+# Offline, this downloader takes the tiles from the tile cache only. The tiles that are
+# not cached fail at once, instead of waiting for the timeouts and retries of the server.
+# Raises TileDownloadError on failure.
+def cache_downloader(tile_nr_x, tile_nr_y):
+
+    run_stats.count('tiles_fetched')
+    cache = tile_cache()
+    path = None if cache is None else cache.get(www_layer_name, tile_nr_x, tile_nr_y)
+    if path is None:
+        run_stats.count('cache_misses')
+        raise TileDownloadError(tile_nr_x, tile_nr_y, 'Sie ist nicht im Zwischenspeicher und es besteht keine '
+                                                      'Verbindung zum Server.')
+    run_stats.count('cache_hits')
 
-        ds.SetGeoTransform(geo_trafo)
-
-        # read and write the data to the dataset
-        arr = list(map(lambda x : list(map(float,x.split())),lines[6:]))
-        zf.close()
-        band = ds.GetRasterBand(1)
-        band.WriteArray(array(arr))
-
-        # set the spatial reference system (probably not necessary)
-        proj = SpatialReference()
-        proj.SetWellKnownGeogCS("EPSG:31287")
-        ds.SetProjection(proj.ExportToWkt())
-
-        return ds
-
-    except:  
-        return None
+    try:
+        with ZipFile(path) as zf, run_stats.timer('decode'):
+            return parse_asc(zf.read(zf.infolist()[0]))
+    except Exception as e:
+        raise TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+
+# Decodes the content "data" (bytes) of an ESRI ASCII raster file, see asc_format.py.
+# Returns the geotransform and the data as float32 array, no data points set to TD['NODATA'].
+def parse_asc(data):
+    return asc_format.parse_asc(data, TD['NODATA'])
 
 def compute_tile_bb(xmin, xmax, ymin, ymax):
     # compute the tile numbers corresponding to xmin, xmax, ymin, ymay
@@ -26,21 +26,14 @@
 This file contains the definition of the plugin class GpsInfoForZemokost
 and the definitions of the various dialog classes.
 """
-# Qt, qgis and osgeo modules
-from PyQt5.QtCore import QSettings, QTranslator, qVersion, QCoreApplication
-from PyQt5.QtGui import QIcon, QPixmap
+# Qt and qgis modules
+from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QAction
-from PyQt5.Qt import QApplication
-import qgis.core, qgis.gui
-from osgeo import gdal, ogr, osr
+import qgis.core
 
-# standard python modules
-import os.path
-import requests as r
-
-# custom modules
-from . import function_module as fm
-from . import gpsinfo4zemokost_dialog as gps_info
+# custom modules. The engine (function_module), the http client and the dialogs are
+# imported in run, so loading the plugin at the start of QGIS is fast.
+from .processing_provider import GpsInfo4ZemokostProvider
 from .resources import *
 
 class GpsInfoForZemokost:
@@ -74,6 +67,8 @@ class GpsInfoForZemokost:
         """
         self.actions = []
         self.menu = 'gpsinfo4zemokost'
+        # the processing provider, see initProcessing
+        self.provider = None
 
         
     """
@@ -110,14 +105,38 @@ class GpsInfoForZemokost:
         self.iface.addToolBarIcon(self.action)        
         self.iface.addPluginToMenu('&gpsinfo4zemokost', self.action)
 
+        self.initProcessing()
+
+    def initProcessing(self):
+        # register the processing provider. QGIS calls this also without GUI, e.g. for qgis_process.
+        if self.provider is None:
+            self.provider = GpsInfo4ZemokostProvider()
+            qgis.core.QgsApplication.processingRegistry().addProvider(self.provider)
+
     def unload(self):
         # Removes the plugin menu item and icon from QGIS GUI.
         self.iface.removePluginMenu('&gpsinfo4zemokost', self.action)
         self.iface.removeToolBarIcon(self.action)
+        if self.provider is not None:
+            qgis.core.QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+        # stop a computation that is still running
+        if getattr(self, 'dlg', None) is not None and self.dlg.task is not None:
+            self.dlg.task.cancel()
 
 
     def run(self):
-        # do all the checks (EPSG, >0 polygon layers, >0 features, server connection)
+        # if a computation is still running, bring its dialog back instead of starting another one
+        if getattr(self, 'dlg', None) is not None and self.dlg.task is not None:
+            self.dlg.show()
+            self.dlg.raise_()
+            return
+
+        from . import function_module as fm
+        from . import gpsinfo4zemokost_dialog as gps_info
+
+        # do the quick checks (QGIS version, >0 polygon layers, >0 features). The connection
+        # to the server is checked in the background, once the dialog is open (see probe.py).
         em = ''   # stores the error message. If empty, plugin may start.
 
         # load the nonempty polygon layers and their indices
@@ -131,29 +150,6 @@ class GpsInfoForZemokost:
         elif len(poly_ind) == 0:
             em = ('Sie müssen mindestens einen Polygonlayer '
                  'mit mindestens einem Polygon im Koordinatenreferenzsystem "EPSG:31287" erstellen.')
-        # check server access
-        else:
-            try:
-                r.get('https://austrian-geodata-services.org/')
-                connection = True
-            except r.exceptions.ConnectionError:
-                connection = False
-            if not connection:
-                try:  # in this case, the problem is the gpsinfo-server
-                    r.get('http://www.orf.at')
-                    r.get('http://www.google.com)')
-                    em = ('gpsinfo4zemokost kann keine Verbindung zum Server http://gpsinfo.org herstellen. '
-                          'Bitte versuchen Sie es zu einem späteren Zeitpunkt erneut.')  
-                except r.exceptions.ConnectionError: # in this case, the problem is user's internet connection
-                    em = ('gpsinfo4zemokost kann keine Verbindung zum Server http://gpsinfo.org herstellen. '
-                          'Bitte überprüfen Sie Ihre Internetverbindung.')
-            else:    # also check whether we can access and unzip data from the server, here, tile (1,1)
-                # number of rows of alternatively downloaded dataset
-
-                if fm.gdal_downloader(1, 1) == None and fm.alt_downloader(1, 1) == None: # if gdal.Open does not work
-                    em = ('gpsinfo4zemokost kann nicht auf die Daten auf dem Server http://gpsinfo.org zugreifen. '
-                          'Bitte versuchen Sie es zu einem späteren Zeitpunkt erneut.')
-
 
         # now either start pluging or show error dialog
         if em == '':
@@ -167,6 +163,7 @@ class GpsInfoForZemokost:
             self.dlg.resize(width, self.dlg.size().height())
 
             self.dlg.show()
+            self.dlg.start_probe()
             # at this point, we leave this file and continue in gps_info_4_zemokost_dialog.py
             # through the functions connected to the various buttons of the dialog
         else:
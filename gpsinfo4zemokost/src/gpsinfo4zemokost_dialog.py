@@ -22,27 +22,45 @@
 """
 
 # Qt, qgis and osgeo modules
-from PyQt5.QtCore import QSettings, QTranslator, qVersion, QCoreApplication, Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtWidgets import QAction, QDialog, QTableWidgetItem, QHeaderView, QFileDialog, QApplication, QWidget, QLabel
-from PyQt5.Qt import QApplication
-from PyQt5 import uic
-import qgis.core, qgis.gui
-from osgeo import gdal, ogr, osr
+from PyQt5.QtWidgets import QDialog, QHeaderView, QFileDialog, QApplication
+import qgis.core
 
 # standard python modules
-import webbrowser
 import os.path
+import io
+import time
 
 # custom module
 from . import function_module as fm
-
-
-# This loads the .ui file so that PyQt can populate the plugin with the elements from Qt Designer
-FORM_CLASS, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), '../ui/gpsinfo4zemokost_dialog.ui'))
-
-class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
+from . import probe
+from . import settings
+from . import zonal_stats
+from .task import ComputeTask, ProbeTask
+from .result_model import ResultTableModel
+from .raster_export import format_from_path
+from .ui_dialogs import (Ui_AustrianMeanElevationDialogBase, Ui_ErrorDialog, Ui_aboutDialog, Ui_WarningDialog,
+                         Ui_SizeWarningDialog)
+
+
+# the file filters for saving the raster data : (format, see raster_export.py, extension)
+RASTER_FILTERS = {'GeoTIFF (*.tif)': ('GTiff', '.tif'),
+                  'Cloud Optimized GeoTIFF (*.tif)': ('COG', '.tif'),
+                  'ESRI-Grid (*.asc)': ('AAIGrid', '.asc'),
+                  'Virtuelles Raster über dem Zwischenspeicher (*.vrt)': ('VRT', '.vrt')}
+
+# The format of the raster file "path": the one chosen in the file dialog ("chosen", or None),
+# if the path still has its extension, otherwise the one of the extension. The path may have
+# been edited by hand after choosing it.
+def raster_format(path, chosen):
+    extensions = dict(RASTER_FILTERS.values())
+    if chosen is not None and path.lower().endswith(extensions[chosen]):
+        return chosen
+    return format_from_path(path)
+
+# The user interface classes are generated from the .ui files, see ui_dialogs.py
+class GpsInfo4ZemokostMainDlg(QDialog, Ui_AustrianMeanElevationDialogBase):
     def __init__(self, iface, parent=None):
         super(GpsInfo4ZemokostMainDlg, self).__init__(parent)
     
@@ -58,6 +76,23 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         except:
             pass
         
+        # setup the result table. The results are kept in the model, see result_model.py
+        self.result_model = ResultTableModel(self)
+        self.resultTable.setModel(self.result_model)
+        self.resultTable.setEnabled(False)
+        self.resultTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode(0))
+        # ResizeMode(0) means resizeable by user
+        # unsorted until the user clicks on a header
+        self.resultTable.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+
+        # The results of the running computation are collected and added to the table
+        # in batches, a few times per second.
+        self.pending_results = []
+        self.result_timer = QTimer(self)
+        self.result_timer.setSingleShot(True)
+        self.result_timer.setInterval(250)
+        self.result_timer.timeout.connect(self.flush_results)
+
         # get the list of polygon layers. At this point, we know that it's nonempty.
         self.poly_dic, self.poly_ind = fm.load_layers(iface)
 
@@ -76,24 +111,15 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         # disable save button
         self.saveButton.setEnabled(False)
 
-        # setup the header of the result table
-        self.resultTable.setColumnCount(4)
-        self.resultTable.setRowCount(0)
-        self.resultTable.setEnabled(False)
-        self.resultTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode(0))
-        # ResizeMode(0) means resizeable by user
-        self.resultTable.setHorizontalHeaderItem(1, QTableWidgetItem('Polygonschwerpunkt [(m, m)]'))
-        self.resultTable.setHorizontalHeaderItem(2, QTableWidgetItem(u'Fläche [km\u00b2]'))
-        self.resultTable.setHorizontalHeaderItem(3, QTableWidgetItem('Hangneigung [1]'))
-
         # connect the buttons to functions
         self.closeButton.clicked.connect(self.reject)
         self.run.clicked.connect(self.start_preprocess)
         self.selectLayer.currentIndexChanged.connect(self.update)     
         self.onlySelFeat.stateChanged.connect(self.clear_result)
         self.saveButton.clicked.connect(self.save_result)
-        self.about_dlg = GpsInfo4ZemokostAbout()
-        self.aboutButton.clicked.connect(self.about_dlg.show)
+        # the about dialog is created when it is needed
+        self.about_dlg = None
+        self.aboutButton.clicked.connect(self.show_about)
         self.helpButton.clicked.connect(self.openHelp)
         self.rasterBrowse.clicked.connect(self.getRasterFilename)
         self.rasterCheck.stateChanged.connect(self.enableSaveRaster)
@@ -104,6 +130,39 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         # instantiate clipboard for copy and paste purpose
         self.clip = QApplication.clipboard()
 
+        # the running computation (a ComputeTask), None if there is none
+        self.task = None
+        # the running connection check (a ProbeTask), None if there is none
+        self.probe_task = None
+
+        # the format of the raster file chosen in getRasterFilename, see raster_format
+        self.raster_format = None
+
+    def start_probe(self):     # called when the dialog is opened. Checks the connection in the background,
+        # unless it has been checked recently. The computation can be started once it succeeded.
+        if probe.recent() or self.probe_task is not None:
+            return
+        self.run.setEnabled(False)
+        self.progressBar.setFormat('Verbindung zum Server wird geprüft ...')
+        self.probe_task = ProbeTask()
+        self.probe_task.probed.connect(self.probe_finished)
+        qgis.core.QgsApplication.taskManager().addTask(self.probe_task)
+
+    def probe_finished(self, ok, message):     # connected to the probed signal of the probe task
+        self.probe_task = None
+        if ok:
+            self.run.setEnabled(True)
+            self.setProgressValue(0)
+            if message != '':   # offline
+                self.progressBar.setFormat(message)
+        else:
+            self.progressBar.setFormat('Keine Verbindung zum Server.')
+            self.errormessage = GpsInfo4ZemokostErrorDlg(self)
+            self.errormessage.message.setText(message)
+            self.errormessage.adjustSize()
+            self.errormessage.setMinimumSize(self.errormessage.size())
+            self.errormessage.show()
+
     def setProgressValue(self, val):
         pb = self.progressBar
         pb.setValue(val)
@@ -114,9 +173,15 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
             self.progressBar.setFormat('{:.1f}% der Daten heruntergeladen'.format(percentage))
 
 
+    def show_about(self):     # connected to about button
+        if self.about_dlg is None:
+            self.about_dlg = GpsInfo4ZemokostAbout()
+        self.about_dlg.show()
+
     def openHelp(self):     # connected to help button
         # loc_help_file = os.path.join(os.path.dirname(__file__), '../doc/manual.html')
         try: 
+            import webbrowser
             webbrowser.open('http://gpsinfo.org/gpsinfo4zemokost/')   
         except:
             pass
@@ -133,7 +198,7 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         self.selectLayer.clear() 
 
         # Get a polygon icon
-        poly_icon = qgis.core.QgsLayoutItemPolygon(qgis.core.QgsLayout(qgis.core.QgsProject.instance())).icon()
+        poly_icon = qgis.core.QgsApplication.getThemeIcon('/mIconPolygonLayer.svg')
 
         # populate the combobox
         for l in self.poly_dic:
@@ -153,19 +218,19 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         self.selected_layer = self.poly_dic[self.poly_ind[self.selectLayer.currentIndex()]]
 
     def getRasterFilename(self):
-        # open a file browser
+        # open a file browser. The filter determines the format of the raster file.
         (file_path, filt) = QFileDialog.getSaveFileName(self, directory = os.getenv('HOME'), 
                                                         caption = 'Rasterdaten speichern', 
-                                                        filter = 'ESRI-Grid (*.asc)')
+                                                        filter = ';;'.join(RASTER_FILTERS),
+                                                        initialFilter = list(RASTER_FILTERS)[0])
 
         if file_path != '':  # if user pressed cancel, file_path is still empty
-            # check whether the user entered file extension '.asc'. If not, add it
-            (direc, fname) = os.path.split(file_path)
-            if len(fname.rpartition('.asc')[2]) != 0:
-                fname = fname + '.asc'
-                self.rasterFilePath.setText(os.path.join(direc, fname))
-            else:
-                self.rasterFilePath.setText(file_path)
+            (raster_format, ext) = RASTER_FILTERS.get(filt, ('GTiff', '.tif'))
+            self.raster_format = raster_format
+            # check whether the user entered the file extension. If not, add it
+            if not file_path.lower().endswith(ext):
+                file_path = file_path + ext
+            self.rasterFilePath.setText(file_path)
 
         if file_path == '':  # if user pressed cancel, disable checkbox
             self.rasterFilePath.setEnabled(False)
@@ -176,8 +241,14 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
     def clear_result(self):     # this is smaller sister of update(). Connected to state change of checkbox
         self.setProgressValue(0)
         # clear the result table
-        self.resultTable.setRowCount(0)
+        self.result_timer.stop()
+        self.pending_results = []
+        # with the extra columns of the extended statistics, see zonal_stats.py
+        self.result_model.clear(zonal_stats.columns(zonal_stats.config()))
         self.resultTable.setEnabled(False)
+        # the seconds spent updating the table and the timers and counters of the run, see run_stats.py
+        self.table_seconds = 0.0
+        self.stats = None
         self.saveButton.setEnabled(False)
 
 
@@ -198,7 +269,7 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
 
         # set the remaining table column name and adjust number of rows
         first_field = self.selected_layer.fields()[0].name()
-        self.resultTable.setHorizontalHeaderItem(0, QTableWidgetItem(first_field))
+        self.result_model.set_id_header(first_field)
         self.resultTable.resizeColumnsToContents()
 
         # set the "save Raster data" checkbox to unselected and file name to empty
@@ -209,7 +280,10 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
     def start_preprocess(self):   # Connected to Start button. Checks the size of the selected features and
         # displays a warning, when they are bigger than 200 square-km. If warning is ignored or not needed,
         # method self.start_preprocess is called.
-        
+
+        # only one computation at a time, and only if the connection check succeeded
+        if self.task is not None or not self.run.isEnabled():
+            return
 
         # get a feature iterator containing the (selected) features in the selected layer
         only_sel = self.onlySelFeat.isChecked()
@@ -256,21 +330,121 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
             self.start_process()
        
 
-    def start_process(self):       #Basically calls fm.process, which calls fm.clipped_raster,
-        # found in function_module.py. Those two functions do the main processing 
-        # and possibly add warning messages tp self.post_warn_dlg
+    def start_process(self):       # Starts the computation (fm.compute, found in function_module.py)
+        # as a background task, see task.py. While it is running, its results are added to the result
+        # table and possible warnings to self.post_warn_dlg.
 
+        # only one computation at a time, and only if the connection check succeeded
+        if self.task is not None or not self.run.isEnabled():
+            return
 
         # first clear the result, just in case it hasn't happened.
         self.clear_result()
 
         # construct instance of a post warning dialogs
-        self.post_warn_dlg = GpsInfo4ZemokostWarningDlg()      
-        # now do the processing and possibly get a warning message
-        fm.process(self, self.post_warn_dlg)
+        self.post_warn_dlg = GpsInfo4ZemokostWarningDlg()
+
+        # decide whether to calculate mean only for selected features or entire layer
+        if self.onlySelFeat.isChecked():
+            feats = list(self.selected_layer.getSelectedFeatures())
+        else:
+            feats = list(self.selected_layer.getFeatures())
+
+        # in case we want to save the raster data
+        raster_path = ''
+        if self.rasterCheck.isChecked():
+            raster_path = self.rasterFilePath.text()
+
+        # the progress is reported in percent, with one decimal
+        self.progressBar.setMinimum(0)
+        self.progressBar.setMaximum(1000)
+        self.setProgressValue(0)
+
+        self.task = ComputeTask(feats, raster_path, raster_format(raster_path, self.raster_format))
+        self.task.progressChanged.connect(self.task_progress)
+        self.task.text.connect(self.progressBar.setFormat)
+        self.task.warning.connect(self.post_warn_dlg.add_warning)
+        self.task.result.connect(self.add_result)
+        self.task.taskCompleted.connect(self.task_completed)
+        self.task.taskTerminated.connect(self.task_terminated)
+
+        self.lock_input(True)
+        qgis.core.QgsApplication.taskManager().addTask(self.task)
+
+    def lock_input(self, lock):     # disables the inputs while a computation is running and restores them afterwards
+        if lock:
+            widgets = [self.run, self.selectLayer, self.onlySelFeat, self.rasterCheck, self.rasterBrowse, self.rasterFilePath]
+            self.input_state = [(w, w.isEnabled()) for w in widgets]
+            for (w, enabled) in self.input_state:
+                w.setEnabled(False)
+        else:
+            for (w, enabled) in self.input_state:
+                w.setEnabled(enabled)
+
+    def task_progress(self, progress):     # connected to the progress signal of the task, progress in percent
+        self.setProgressValue(int(progress * 10))
+
+    def add_result(self, feature, vals_sum, vals_count, extra):     # connected to the result signal of the task
+        # compute the centroid as a QgsPointXY object
+        c = feature.geometry().centroid().asPoint()
+        # area in square km
+        area = feature.geometry().area() / 1000000
+        # "extra" are the values of the extended statistics, if any
+        self.pending_results.append((feature.attributes()[0], c.x(), c.y(), area, vals_sum / vals_count, vals_count)
+                                    + tuple(extra or ()))
+        if not self.result_timer.isActive():
+            self.result_timer.start()
+
+    def flush_results(self):     # adds the collected results to the result table
+        if len(self.pending_results) != 0:
+            started = time.perf_counter()
+            self.result_model.append(self.pending_results)
+            self.pending_results = []
+            self.resultTable.setEnabled(True)
+            self.table_seconds += time.perf_counter() - started
+
+    def task_completed(self):
+        self.task_finished(True)
+
+    def task_terminated(self):     # the task was canceled or failed
+        self.task_finished(False)
+
+    def task_finished(self, completed):
+        # The task manager deletes the task once it is finished, so only
+        # its python attributes may be used from here on.
+        exception = self.task.exception
+        stats = self.task.stats
+        self.task = None
+        self.lock_input(False)
+
+        # show the remaining results and fit the columns to them, once
+        self.result_timer.stop()
+        self.flush_results()
+        self.resultTable.resizeColumnsToContents()
+
+        if stats is not None:
+            stats.add_time('table', self.table_seconds)
+            self.stats = stats
+            if settings.value('stats/log'):
+                stats.log()
+
+        if completed:
+            self.progressBar.setFormat('Berechnung beendet.')
+            # enable save button
+            self.saveButton.setEnabled(True)
+        else:
+            self.progressBar.setFormat('Berechnung abgebrochen.')
+        if exception is not None:
+            self.post_warn_dlg.add_warning('Bei der Berechnung ist ein Fehler aufgetreten: {}'.format(exception))
+
+        if self.isVisible():
+            self.post_warn_dlg.show_if_nonempty()
+
+    def reject(self):     # closing the dialog cancels the running computation
+        if self.task is not None:
+            self.task.cancel()
+        super(GpsInfo4ZemokostMainDlg, self).reject()
 
-        self.post_warn_dlg.show_if_nonempty()
-    
     def keyPressEvent(self, event):     # override the key press event to define keyboard shortcuts
 
         # (1) Copying to clipboard: event should be C-Key pressed while Control-Key is pressed
@@ -278,8 +452,9 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
         # https://stackoverflow.com/questions/24971305/copy-pyqt-table-selection-including-column-and-row-headers
         if event.modifiers() & Qt.ControlModifier:
             if event.key() == Qt.Key_C: 
-                s = self.result_to_csv(True) 
-                self.clip.setText(s)
+                f = io.StringIO()
+                if self.result_to_csv(f, True):
+                    self.clip.setText(f.getvalue().rstrip('\n'))
  
         # (2) Save as: event should be S-Key pressed while Control-Key is pressed. (As above)
         if self.saveButton.isEnabled() and event.modifiers() == Qt.ControlModifier:
@@ -299,63 +474,29 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
            self.openHelp()
 
 
-    def result_to_csv(self, selected):    # transforms (selected) content of result table to .csv string
+    def result_to_csv(self, f, selected):    # writes the (selected) content of the result table as .csv to the file f
         # this method is called by "save_result()" and when Ctrl-C is pressed (see keyPressEvent())
+        # The values are taken from the result store, with full precision. Returns False, if
+        # the selected cells do not cover a rectangular region.
+        model = self.result_model
 
-        sep = ';'    # a separator for values.
-        s = ''       # here we store the .csv
+        if not selected:
+            model.write_csv(f)
+            return True
 
         # create lists of row and column values of selected cells
-        ind_r = []   # will hold the row values of all (selected) cells
-        ind_c = []   # will hold the column values of all (selected) cells
-        if selected:
-            ind_list = self.resultTable.selectedIndexes()
-            for i in ind_list:
-                ind_r.append(i.row())
-                ind_c.append(i.column())
-        else:
-            for ir in range(self.resultTable.rowCount()):
-                for ic in range(self.resultTable.columnCount()):
-                    ind_r.append(ir)
-                    ind_c.append(ic)
+        ind_list = self.resultTable.selectionModel().selectedIndexes()
+        ind_r = [i.row() for i in ind_list]
+        ind_c = [i.column() for i in ind_list]
 
         # check if the (selected) cells cover a rectangular region
-        if len(ind_r) != 0 and len(ind_r) == (max(ind_r)+1-min(ind_r)) * (max(ind_c)+1-min(ind_c)):
-            # arrange cell texts to a ; delimited text and copy to clipboard
-            # first save the header = column names
-            for ic in range(min(ind_c), max(ind_c) + 1):
-                t = self.resultTable.horizontalHeaderItem(ic).text()
-                if ic == 1: # this column is the centroid. We extract the x- and y-coordinates separately
-                    s +=  'Polygonschwerpunkt X [m]' + sep + 'Polygonschwerpunkt Y [m]' + sep
-                else:
-                    s +=  self.resultTable.horizontalHeaderItem(ic).text() + sep
-            s += '\n'
-            # now add the selected cell contents
-            for ir in range(min(ind_r), max(ind_r) + 1):
-                for ic in range(min(ind_c), max(ind_c) + 1):
-                    if ic == 1: # this column is the centroid. We extract the x- and y-coordinates separately
-                        try:
-                            xy = self.resultTable.item(ir, ic).text().partition(',')
-                            x = xy[0].partition('(')[2]
-                            y = xy[2].partition(')')[0]
-                            s += x + sep + y + sep
-                        except AttributeError: # for empty fields, just in case
-                            s += ' ' + sep + ' ' + sep
-                    else:
-                        try:
-                            s += self.resultTable.item(ir, ic).text() + sep
-                        except AttributeError: # for empty fields, just in case
-                            s += ' ' + sep
-
-                s = s.rstrip(sep)
-                s += '\n'
-            s = s.rstrip('\n')
-        return s
+        if len(ind_r) == 0 or len(ind_r) != (max(ind_r)+1-min(ind_r)) * (max(ind_c)+1-min(ind_c)):
+            return False
+        model.write_csv(f, range(min(ind_r), max(ind_r) + 1), range(min(ind_c), max(ind_c) + 1))
+        return True
 
 
     def save_result(self):     # connected to save button
-        # get the result as csv-string
-        s = self.result_to_csv(False)
         # open a file selection dialog
         (path, filt) = QFileDialog.getSaveFileName(self, directory = os.getenv('HOME'), 
                                                    caption = 'Ergebnis speichern', 
@@ -366,17 +507,17 @@ class GpsInfo4ZemokostMainDlg(QDialog, FORM_CLASS):
             # check if the user entered '.csv'-extension in case the CSV filter is selected
             if filt == 'CSV-Datei (*.csv)' and fname.rpartition('.csv')[2] != '':
                 path = path + '.csv'
-            f = open(path, 'w') 
-            f.write(s)
-            f.close()
+            # utf-8 with byte order mark, so spreadsheet programs recognize the encoding
+            with open(path, 'w', newline = '', encoding = 'utf-8-sig') as f:
+                self.result_to_csv(f, False)
+            # the run report goes next to it
+            if self.stats is not None and settings.value('stats/json_report'):
+                self.stats.write_json(os.path.splitext(path)[0] + '.run.json')
 
 
 #########################################
 # create the dialog for the error message
-FORM_CLASS_ERR_DLG, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), '../ui/error_dialog.ui'))
-
-class GpsInfo4ZemokostErrorDlg(QDialog, FORM_CLASS_ERR_DLG):
+class GpsInfo4ZemokostErrorDlg(QDialog, Ui_ErrorDialog):
     def __init__(self, parent=None):
         """Constructor."""
         super(GpsInfo4ZemokostErrorDlg, self).__init__(parent)
@@ -385,11 +526,7 @@ class GpsInfo4ZemokostErrorDlg(QDialog, FORM_CLASS_ERR_DLG):
 
 #########################################
 # create the dialog for the about message
-
-FORM_CLASS_ABOUT, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), '../ui/about_dialog.ui'))
-
-class GpsInfo4ZemokostAbout(QDialog, FORM_CLASS_ABOUT):
+class GpsInfo4ZemokostAbout(QDialog, Ui_aboutDialog):
     def __init__(self, parent=None):
         #Constructor.
         super(GpsInfo4ZemokostAbout, self).__init__(parent)
@@ -403,10 +540,7 @@ class GpsInfo4ZemokostAbout(QDialog, FORM_CLASS_ABOUT):
         
 ###########################################
 # create the dialog for the post computation warning message
-FORM_CLASS_WARN, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), '../ui/warning_dialog.ui'))
-
-class GpsInfo4ZemokostWarningDlg(QDialog, FORM_CLASS_WARN):
+class GpsInfo4ZemokostWarningDlg(QDialog, Ui_WarningDialog):
     def __init__(self, parent=None):
         """Constructor."""
         super(GpsInfo4ZemokostWarningDlg, self).__init__(parent)
@@ -428,10 +562,7 @@ class GpsInfo4ZemokostWarningDlg(QDialog, FORM_CLASS_WARN):
 
 ###########################################
 # create the dialog for the second warning message
-FORM_CLASS_WARN_SIZE, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), '../ui/size_warning_dialog.ui'))
-
-class GpsInfo4ZemokostSizeWarningDlg(QDialog, FORM_CLASS_WARN_SIZE):
+class GpsInfo4ZemokostSizeWarningDlg(QDialog, Ui_SizeWarningDialog):
     def __init__(self, dlg, parent=None):
         """Constructor."""
         super(GpsInfo4ZemokostSizeWarningDlg, self).__init__(parent)
@@ -442,7 +573,6 @@ class GpsInfo4ZemokostSizeWarningDlg(QDialog, FORM_CLASS_WARN_SIZE):
 
     def acc(self):
         self.close()
-        self.dlg.start_process()
-        QCoreApplication.processEvents() 
+        self.dlg.start_process() 
 
 
@@ -0,0 +1,116 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the HTTP client shared by all requests of the plugin. It keeps
+a pool of open connections (keep-alive), so the TLS handshake with the server is
+done once per connection instead of once per tile, and it applies the timeouts
+and the retry policy from the settings. The same timeouts and retries are passed
+on to gdal for the downloads it does itself (/vsicurl/).
+"""
+# osgeo modules
+from osgeo import gdal
+
+# standard python modules
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+# custom modules
+from . import settings
+
+
+# the shared session and the settings it was created with
+_session = None
+_session_config = None
+# the session without retries, see get_once
+_once_session = None
+_lock = threading.Lock()
+
+def _config():
+    return (settings.value('http/connect_timeout'), settings.value('http/read_timeout'),
+            settings.value('http/retries'), settings.value('http/backoff'),
+            settings.value('download/workers'))
+
+def session():
+    # Returns the shared requests session. It is created again, if the settings changed.
+    global _session, _session_config, _once_session
+
+    config = _config()
+    with _lock:
+        if _session is None or config != _session_config:
+            connect_timeout, read_timeout, retries, backoff, workers = config
+
+            # retry on connection problems and temporary server errors, waiting
+            # backoff * (2 ** (number of retries - 1)) seconds in between
+            retry = Retry(total = retries, connect = retries, read = retries, backoff_factor = backoff,
+                          status_forcelist = (500, 502, 503, 504))
+            # one connection per download thread, plus some for the other requests
+            adapter = HTTPAdapter(pool_connections = 4, pool_maxsize = workers + 2, max_retries = retry)
+
+            s = requests.Session()
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+
+            # a single attempt, e.g. for the connection check of probe.py
+            once = requests.Session()
+            once_adapter = HTTPAdapter(pool_connections = 2, pool_maxsize = 2, max_retries = Retry(0, read = False))
+            once.mount('https://', once_adapter)
+            once.mount('http://', once_adapter)
+
+            if _session is not None:
+                _session.close()
+                _once_session.close()
+            _session, _session_config, _once_session = s, config, once
+
+            # apply the same policy to gdal's own downloads
+            gdal.SetConfigOption('GDAL_HTTP_CONNECTTIMEOUT', str(int(connect_timeout)))
+            gdal.SetConfigOption('GDAL_HTTP_TIMEOUT', str(int(connect_timeout + read_timeout)))
+            gdal.SetConfigOption('GDAL_HTTP_MAX_RETRY', str(retries))
+            gdal.SetConfigOption('GDAL_HTTP_RETRY_DELAY', str(max(backoff, 0.1)))
+
+        return _session
+
+def timeout():
+    # the (connect, read) timeout in seconds
+    return (settings.value('http/connect_timeout'), settings.value('http/read_timeout'))
+
+def get(url, **kwargs):
+    # GET "url" with the shared session. Raises a requests.exceptions.RequestException
+    # if the server cannot be reached or answers with an error status.
+    kwargs.setdefault('timeout', timeout())
+    response = session().get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+def get_once(url, timeout):
+    # GET "url" with a single attempt without retries and with the timeout "timeout"
+    # (seconds), e.g. for a quick check. Like the shared session, it uses the proxies of
+    # the environment and the system. Any answer of the server is returned, also an error
+    # status. Raises a requests.exceptions.RequestException, if the server cannot be reached.
+    session()
+    with _lock:
+        once = _once_session
+    return once.get(url, timeout = timeout)
@@ -0,0 +1,82 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the memory budget of the engine (setting memory/budget_mb), which
+keeps the memory of a run bounded, e.g. for 32 bit installations of QGIS:
+- arrays larger than a quarter of the budget, like the mask of a large feature in
+  clipped_raster, are backed by a temporary file (numpy.memmap) instead of memory,
+- the tiles downloaded ahead and the tiles handed to the worker processes take at
+  most a quarter of the budget,
+- gdal's block cache, which buffers the raster export, is limited to a quarter of
+  the budget during a run.
+A budget of 0 disables all of this. Only the functions reading the settings or
+changing gdal's cache import Qt or gdal, so the rest can be used without QGIS.
+"""
+# standard python modules
+import tempfile
+import numpy as np
+
+# custom modules
+from . import run_stats
+
+
+def budget():
+    # the budget in bytes, None if there is none
+    from . import settings
+    mb = settings.value('memory/budget_mb')
+    return mb * 1024 * 1024 if mb > 0 else None
+
+def array(shape, dtype):
+    # Returns zeros of "shape" and "dtype", in memory or, if they take more than a quarter
+    # of the budget, in a temporary file, which is removed when the array is released.
+    b = budget()
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if b is None or nbytes <= b // 4:
+        return np.zeros(shape, dtype = dtype)
+    run_stats.count('arrays_on_disk')
+    with tempfile.TemporaryFile(prefix = 'gpsinfo4zemokost-') as f:
+        # the mapping keeps the file alive
+        return np.memmap(f, dtype = dtype, mode = 'w+', shape = shape)
+
+def max_tiles(default, tile_bytes):
+    # the number of tiles of "tile_bytes" bytes each that may be in flight: at most
+    # "default", at most a quarter of the budget, but at least 2
+    b = budget()
+    if b is None:
+        return default
+    return max(2, min(default, b // 4 // tile_bytes))
+
+def limit_gdal_cache():
+    # limits gdal's block cache to a quarter of the budget, returns the previous limit
+    from osgeo import gdal
+    previous = gdal.GetCacheMax()
+    b = budget()
+    if b is not None and b // 4 < previous:
+        gdal.SetCacheMax(b // 4)
+    return previous
+
+def restore_gdal_cache(previous):
+    from osgeo import gdal
+    gdal.SetCacheMax(previous)
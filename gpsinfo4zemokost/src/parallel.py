@@ -0,0 +1,205 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the parallel execution mode of the tile engine. The tiles are
+evaluated in a pool of processes: the tile data is passed in shared memory, the
+features as WKB. The worker processes import this file and zonal_stats.py only,
+so they must not import qgis or Qt.
+"""
+# osgeo modules
+from osgeo import gdal, ogr
+
+# standard python modules
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import os
+import shutil
+import sys
+import numpy as np
+
+# custom modules
+from .zonal_stats import add_by_label
+
+
+def python_executable(configured = ''):
+    # Inside QGIS, sys.executable is usually QGIS itself, so the processes have to be
+    # started with the python interpreter QGIS is using.
+    if configured:
+        return configured
+    if os.name == 'nt':
+        candidates = [os.path.join(sys.exec_prefix, 'pythonw.exe'), os.path.join(sys.exec_prefix, 'python.exe')]
+    else:
+        candidates = [os.path.join(sys.exec_prefix, 'bin', 'python3'), shutil.which('python3') or '']
+    for exe in candidates + [sys.executable]:
+        if exe and os.path.isfile(exe) and 'python' in os.path.basename(exe).lower():
+            return exe
+    raise RuntimeError('Der Python-Interpreter für die parallele Berechnung wurde nicht gefunden.')
+
+
+class TilePool:
+    # Evaluates tiles in a pool of processes, see evaluate_tile below. At most
+    # "max_pending" (default 2 * processes) tiles are in flight, each of them in a block
+    # of shared memory.
+
+    def __init__(self, processes, python = '', max_pending = None):
+        # raises ImportError for python < 3.8
+        from multiprocessing import shared_memory
+        self._shared_memory = shared_memory
+
+        ctx = multiprocessing.get_context('spawn')
+        ctx.set_executable(python_executable(python))
+        self._executor = ProcessPoolExecutor(max_workers = processes, mp_context = ctx)
+        self._max_pending = max_pending or 2 * processes
+
+        # tile : (future, shared memory, shape) of the submitted tiles
+        self._pending = dict()
+
+    def busy(self):
+        return len(self._pending) >= self._max_pending
+
+    def submit(self, tile, geo_trafo, array_www, groups, nodata, clip, zonal_config = None):
+        # :param groups --- list of groups of non-overlapping features intersecting the tile,
+        #                   each a list of (label, wkb)
+        # :param clip --- if True, the clipped tile is returned as well, for saving the raster
+        # :param zonal_config --- the extended statistics to compute, see zonal_stats.py
+        shm = self._shared_memory.SharedMemory(create = True, size = array_www.size * 4)
+        np.ndarray(array_www.shape, dtype = np.float32, buffer = shm.buf)[:] = array_www
+        future = self._executor.submit(evaluate_tile, shm.name, array_www.shape, geo_trafo, groups, nodata, clip,
+                                       zonal_config)
+        self._pending[tile] = (future, shm, array_www.shape)
+
+    def finished(self, block = False, wait_all = False):
+        # Yields (tile, result, clipped array or None) of the finished tiles. If "block", waits
+        # for at least one tile, if "wait_all", for all of them. result is as in evaluate_tile.
+        if not self._pending:
+            return
+        futures = [future for (future, shm, shape) in self._pending.values()]
+        if wait_all:
+            wait(futures)
+        elif block:
+            wait(futures, return_when = FIRST_COMPLETED)
+
+        for tile in [t for t in self._pending if self._pending[t][0].done()]:
+            future, shm, shape = self._pending.pop(tile)
+            try:
+                result = future.result()
+                clipped = None
+                if result[-1]:
+                    clipped = np.ndarray(shape, dtype = np.float32, buffer = shm.buf).copy()
+            finally:
+                shm.close()
+                shm.unlink()
+            yield tile, result[:-1], clipped
+
+    def close(self):
+        for (future, shm, shape) in self._pending.values():
+            future.cancel()
+        self._executor.shutdown(wait = True)
+        for (future, shm, shape) in self._pending.values():
+            shm.close()
+            shm.unlink()
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Evaluates a tile in a worker process. The tile data is read from the shared memory
+# "shm_name". Returns the labels of the features found in the tile, the sums and counts
+# of their data values, a dict label : first no data point, a dict label : ZonalStats
+# (empty if "zonal_config" is None) and whether the clipped tile (data outside of the
+# features set to nodata) has been written back to shared memory.
+def evaluate_tile(shm_name, shape, geo_trafo, groups, nodata, clip, zonal_config = None):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name = shm_name)
+    try:
+        # the block belongs to the main process, don't let this process remove it
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+    try:
+        array_www = np.ndarray(shape, dtype = np.float32, buffer = shm.buf)
+        valid = array_www != nodata
+        if clip:
+            clipped = np.zeros(shape, dtype = bool)
+
+        labels, sums, counts = [], [], []
+        nodata_pts = dict()
+        zonal = dict()
+        for feats in groups:
+            array_l = rasterize_labels(feats, geo_trafo, shape)
+            inside = array_l > 0
+
+            # the first no data point of each feature
+            rows, cols = np.nonzero(inside & ~valid)
+            if len(rows) != 0:
+                nd_labels, first = np.unique(array_l[rows, cols], return_index = True)
+                for label, k in zip(nd_labels, first):
+                    nodata_pts[int(label)] = gdal.ApplyGeoTransform(geo_trafo, float(cols[k]) + 0.5, float(rows[k]) + 0.5)
+
+            # sums and counts of the data values of the features
+            sel = inside & valid
+            l_sel = array_l[sel]
+            s = np.bincount(l_sel, weights = array_www[sel])
+            c = np.bincount(l_sel)
+            present = np.nonzero(c)[0]
+            present = present[present > 0]
+            labels.append(present)
+            sums.append(s[present])
+            counts.append(c[present])
+            if zonal_config is not None:
+                add_by_label(zonal, l_sel, array_www[sel], zonal_config)
+
+            if clip:
+                clipped |= sel
+
+        if clip:
+            array_www[~clipped] = nodata
+
+        return np.concatenate(labels), np.concatenate(sums), np.concatenate(counts), nodata_pts, zonal, clip
+    finally:
+        shm.close()
+
+# rasterizes the features "feats" (list of (label, wkb)) into a label raster of the given shape
+def rasterize_labels(feats, geo_trafo, shape):
+    ds = ogr.GetDriverByName('Memory').CreateDataSource('out')
+    layer = ds.CreateLayer('features')
+    layer.CreateField(ogr.FieldDefn('label', ogr.OFTInteger))
+    for (label, wkb) in feats:
+        gdal_feat = ogr.Feature(layer.GetLayerDefn())
+        gdal_feat.SetField('label', int(label))
+        gdal_feat.SetGeometry(ogr.CreateGeometryFromWkb(wkb))
+        layer.CreateFeature(gdal_feat)
+
+    ds_l = gdal.GetDriverByName('MEM').Create('', shape[1], shape[0], 1, gdal.GDT_Int32)
+    ds_l.SetGeoTransform(geo_trafo)
+    gdal.RasterizeLayer(ds_l, [1], layer, options = ['ATTRIBUTE=label'])
+    return ds_l.ReadAsArray()
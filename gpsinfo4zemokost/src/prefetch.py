@@ -0,0 +1,102 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the TilePrefetcher, which downloads tiles concurrently with a
+bounded pool of threads while the tiles downloaded so far are processed. The
+downloads report to the RunStats of the thread creating the TilePrefetcher, see
+run_stats.py.
+"""
+# standard python modules
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# custom modules
+from . import run_stats
+
+
+class TilePrefetcher:
+
+    def __init__(self, fetch, tiles, workers, max_ahead = None):
+        # :param fetch --- function (tile_nr_x, tile_nr_y) -> tile, called in the worker threads
+        # :param tiles --- list of the (tile_nr_x, tile_nr_y) that are going to be needed
+        # :param workers --- number of concurrent downloads
+        # :param max_ahead --- maximal number of tiles downloaded, but not yet consumed
+        self._fetch = fetch
+        # the statistics of the computation, handed to the worker threads
+        self._stats = run_stats.current()
+        self._tiles = iter(tiles)
+        self._max_ahead = max_ahead or 2 * workers
+        self._executor = ThreadPoolExecutor(max_workers = workers)
+
+        # (tile, future) pairs in the order they were submitted
+        self._queue = deque()
+        self._fill()
+
+    def _fill(self):
+        # submit further downloads until max_ahead tiles are in flight
+        while len(self._queue) < self._max_ahead:
+            tile = next(self._tiles, None)
+            if tile is None:
+                break
+            self._queue.append((tile, self._executor.submit(run_stats.run_with, self._stats, self._fetch, tile[0], tile[1])))
+
+    def get(self, tile_nr_x, tile_nr_y):
+        # Returns the tile (tile_nr_x, tile_nr_y), waiting for its download if necessary.
+        # The tiles have to be requested in the order they were passed to the constructor.
+        # Tiles may be left out, e.g. if they are not needed anymore.
+        while self._queue:
+            tile, future = self._queue.popleft()
+            self._fill()
+            if tile == (tile_nr_x, tile_nr_y):
+                with run_stats.timer('wait'):
+                    return future.result()
+            future.cancel()
+
+        # the tile was not announced, so fetch it right away
+        return self._fetch(tile_nr_x, tile_nr_y)
+
+    def __iter__(self):
+        # yields (tile_nr_x, tile_nr_y), future in the order the downloads finish. The tile
+        # is future.result(), which raises the exception of fetch, if the download failed.
+        while self._queue:
+            with run_stats.timer('wait'):
+                done, not_done = wait([future for (tile, future) in self._queue], return_when = FIRST_COMPLETED)
+            for item in [item for item in self._queue if item[1] in done]:
+                self._queue.remove(item)
+                self._fill()
+                yield item[0], item[1]
+
+    def close(self):
+        # cancel the pending downloads and wait for the running ones
+        for (tile, future) in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._executor.shutdown(wait = True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,134 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the probe, which checks once per session whether the server and
+the data can be reached and which downloader works on this machine (see
+working_downloader in function_module.py). It uses short timeouts and no retries,
+so it fails fast when offline, and it is run in the background (see ProbeTask in
+task.py) while the main dialog opens. A successful result is reused for
+'probe/max_age' seconds, the downloader is remembered by function_module.py.
+Without a connection, the plugin still works offline on the tiles in the tile
+cache, e.g. imported from a tile bundle (see bundle.py), with a downloader that
+does not try the server (cache_downloader in function_module.py). Local tile sources (see
+tile_source.py) are checked by the source itself.
+"""
+# osgeo modules
+from osgeo import gdal
+
+# standard python modules
+import threading
+import time
+import requests
+
+# custom modules
+from . import http_client
+from . import settings
+
+
+# the messages of a failed probe
+SERVER_MESSAGE = ('gpsinfo4zemokost kann keine Verbindung zum Server http://gpsinfo.org herstellen. '
+                  'Bitte versuchen Sie es zu einem späteren Zeitpunkt erneut.')
+INTERNET_MESSAGE = ('gpsinfo4zemokost kann keine Verbindung zum Server http://gpsinfo.org herstellen. '
+                    'Bitte überprüfen Sie Ihre Internetverbindung.')
+DATA_MESSAGE = ('gpsinfo4zemokost kann nicht auf die Daten auf dem Server http://gpsinfo.org zugreifen. '
+                'Bitte versuchen Sie es zu einem späteren Zeitpunkt erneut.')
+OFFLINE_MESSAGE = 'Offline: nur Kacheln aus dem Zwischenspeicher'
+
+# time.monotonic() of the last successful probe, None if there was none, and the source it checked
+_succeeded_at = None
+_succeeded_source = None
+_lock = threading.Lock()
+
+def recent():
+    # True, if the last successful probe checked the current source and is younger than 'probe/max_age' seconds
+    from .tile_source import tile_source
+    with _lock:
+        return _succeeded_at is not None and _succeeded_source is tile_source() and \
+               time.monotonic() - _succeeded_at < settings.value('probe/max_age')
+
+def reachable(url, timeout):
+    # A single GET without retries. Any answer counts, also an error status like 403 or
+    # 404 of the bare server root, only connection errors and timeouts do not.
+    try:
+        http_client.get_once(url, timeout)
+        return True
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        return False
+
+def probe():
+    # Checks the tile source (see tile_source.py). Returns (ok, message), see probe_server.
+    global _succeeded_at, _succeeded_source
+    from .tile_source import tile_source
+
+    source = tile_source()
+    ok, message = source.check()
+    if ok and message == '':
+        with _lock:
+            _succeeded_at, _succeeded_source = time.monotonic(), source
+    return ok, message
+
+def probe_server():
+    # Checks the server and the data and remembers the downloader that works. Returns
+    # (ok, message): (True, '') if the server works, (True, OFFLINE_MESSAGE) if it cannot
+    # be reached, but there are cached tiles, and (False, error message for the user)
+    # otherwise. Blocks for a few seconds at most per check, so call it in the background.
+    from . import function_module as fm
+    from .tile_cache import tile_cache
+
+    timeout = settings.value('probe/timeout')
+    if not reachable('https://austrian-geodata-services.org/', timeout):
+        # either the server is down or the user is offline
+        message = SERVER_MESSAGE if reachable('http://www.orf.at', timeout) else INTERNET_MESSAGE
+
+        # work offline, if a cached tile can be read. The tiles that are not cached fail at once.
+        cache = tile_cache()
+        tiles = [] if cache is None else cache.tiles(fm.www_layer_name)
+        if not tiles:
+            return False, message
+        try:
+            fm.cache_downloader(*tiles[0])
+        except fm.TileDownloadError:
+            return False, message
+        fm.remember_downloader(fm.cache_downloader)
+        return True, OFFLINE_MESSAGE
+
+    # check whether we can access and unzip data from the server, here, tile (1,1), with
+    # each downloader, bypassing the tile cache. gdal's downloads in this thread get the
+    # short timeout as well.
+    options = {'GDAL_HTTP_CONNECTTIMEOUT': str(max(int(timeout), 1)),
+               'GDAL_HTTP_TIMEOUT': str(max(int(2 * timeout), 1)),
+               'GDAL_HTTP_MAX_RETRY': '0'}
+    for (key, val) in options.items():
+        gdal.SetThreadLocalConfigOption(key, val)
+    try:
+        downloader = fm.working_downloader(timeout = timeout)
+    finally:
+        for key in options:
+            gdal.SetThreadLocalConfigOption(key, None)
+    if downloader is None:
+        return False, DATA_MESSAGE
+
+    fm.remember_downloader(downloader)
+    return True, ''
@@ -0,0 +1,367 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the processing provider of the plugin and its algorithms. They
+make the computation available in the processing toolbox, the graphical modeler,
+the batch mode and qgis_process, without the main dialog, as well as building and
+importing the tile bundles for offline use (see bundle.py) and building the tile
+index (see tile_index.py).
+"""
+# Qt and qgis modules
+from PyQt5.QtCore import QVariant
+from PyQt5.QtGui import QIcon
+from qgis.core import (QgsProcessing, QgsProcessingProvider, QgsProcessingAlgorithm, QgsProcessingException,
+                       QgsProcessingParameterFeatureSource, QgsProcessingParameterFeatureSink,
+                       QgsProcessingParameterRasterDestination, QgsProcessingParameterExtent,
+                       QgsProcessingParameterFileDestination, QgsProcessingParameterFile, QgsProcessingOutputNumber,
+                       QgsFeature, QgsFeatureSink, QgsField, QgsFields, QgsCoordinateReferenceSystem,
+                       QgsCoordinateTransform)
+
+# custom modules
+from .feedback import Feedback
+from . import settings
+
+
+class GpsInfo4ZemokostProvider(QgsProcessingProvider):
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(MeanSlopeAlgorithm())
+        self.addAlgorithm(BuildBundleAlgorithm())
+        self.addAlgorithm(ImportBundleAlgorithm())
+        self.addAlgorithm(BuildIndexAlgorithm())
+
+    def id(self):
+        return 'gpsinfo4zemokost'
+
+    def name(self):
+        return 'gpsinfo4zemokost'
+
+    def icon(self):
+        return QIcon(':/plugins/gpsinfo4zemokost/images/gpsinfo_logo_pink_24px.png')
+
+    def supportedOutputRasterLayerExtensions(self):
+        # the formats of raster_export.py
+        return ['tif', 'asc', 'vrt']
+
+
+# forwards the feedback of the engine to the feedback of a processing algorithm
+# and collects the results by feature id
+class ProcessingFeedback(Feedback):
+
+    def __init__(self, feedback):
+        self.feedback = feedback
+        self.total = 1
+        self.done = 0
+        self.results = dict()
+
+    def set_total(self, total):
+        self.total = max(total, 1)
+        self.done = 0
+        self.feedback.setProgress(0)
+
+    def step(self):
+        self.done += 1
+        self.feedback.setProgress(100 * self.done / self.total)
+
+    def set_text(self, text):
+        self.feedback.setProgressText(text)
+
+    def warn(self, text):
+        self.feedback.reportError(text)
+
+    def result(self, feature, vals_sum, vals_count, zonal = None):
+        self.results[feature.id()] = (float(vals_sum) / int(vals_count), int(vals_count),
+                                      [] if zonal is None else zonal.values())
+
+    def is_canceled(self):
+        return self.feedback.isCanceled()
+
+
+class MeanSlopeAlgorithm(QgsProcessingAlgorithm):
+
+    INPUT = 'INPUT'
+    OUTPUT = 'OUTPUT'
+    OUTPUT_RASTER = 'OUTPUT_RASTER'
+
+    def name(self):
+        return 'meanslope'
+
+    def displayName(self):
+        return 'Durchschnittliche Hangneigung berechnen'
+
+    def shortHelpString(self):
+        return ('Berechnet die durchschnittliche Hangneigung [1] der Polygone eines Layers in Österreich. '
+                'Die Ausgabe enthält alle Attribute der Eingabe sowie die Fläche in km², die durchschnittliche '
+                'Hangneigung und die Anzahl der ausgewerteten Rasterpunkte, mit der Einstellung zonal/extended '
+                'auch Standardabweichung, Minimum, Maximum, Perzentile und Histogramm der Hangneigung. Polygone ohne Ergebnis (außerhalb des '
+                'Datensatzes, mit Punkten ohne Daten oder kleiner als die Auflösung) erhalten leere Werte. '
+                'Optional werden die Rasterdaten innerhalb der Polygone als GeoTIFF (.tif), ESRI-Grid (.asc) '
+                'oder als virtuelles Raster (.vrt) über den zwischengespeicherten Kacheln gespeichert.')
+
+    def createInstance(self):
+        return MeanSlopeAlgorithm()
+
+    def initAlgorithm(self, config = None):
+        self.addParameter(QgsProcessingParameterFeatureSource(self.INPUT, 'Polygonlayer',
+                                                              [QgsProcessing.TypeVectorPolygon]))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, 'Hangneigung',
+                                                            QgsProcessing.TypeVectorPolygon))
+        self.addParameter(QgsProcessingParameterRasterDestination(self.OUTPUT_RASTER, 'Rasterdaten',
+                                                                  optional = True, createByDefault = False))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        raster_path = self.parameterAsOutputLayer(parameters, self.OUTPUT_RASTER, context) or ''
+
+        # the output has the fields of the input plus the results
+        fields = QgsFields(source.fields())
+        fields.append(QgsField('area_km2', QVariant.Double))
+        fields.append(QgsField('mean_slope', QVariant.Double))
+        fields.append(QgsField('pixels', QVariant.Int))
+        # the extended statistics, see zonal_stats.py
+        from . import zonal_stats
+        zonal_config = zonal_stats.config()
+        extra = zonal_stats.columns(zonal_config)
+        for col in extra:
+            fields.append(QgsField(col.field, QVariant.Int if col.typecode == 'q' else QVariant.Double))
+
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                               source.wkbType(), source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # the computation needs the features in EPSG:31287
+        crs = QgsCoordinateReferenceSystem('EPSG:31287')
+        transform = None
+        if source.sourceCrs() != crs:
+            transform = QgsCoordinateTransform(source.sourceCrs(), crs, context.transformContext())
+
+        feats = []
+        areas = dict()
+        for f in source.getFeatures():
+            if not f.hasGeometry():
+                continue
+            g = f.geometry()
+            if transform is not None:
+                g.transform(transform)
+            f_31287 = QgsFeature(f)
+            f_31287.setGeometry(g)
+            feats.append(f_31287)
+            areas[f.id()] = g.area() / 1000000
+
+        # the engine is imported when it is needed, not when QGIS loads the provider
+        from . import function_module as fm
+        engine_feedback = ProcessingFeedback(feedback)
+        stats = fm.compute(feats, raster_path, engine_feedback)
+        if settings.value('stats/log'):
+            stats.log()
+            feedback.pushInfo(stats.summary())
+
+        # write the features with their results
+        for f in source.getFeatures():
+            if feedback.isCanceled():
+                break
+            mean, count, values = engine_feedback.results.get(f.id(), (None, None, [None] * len(extra)))
+            out = QgsFeature(fields)
+            out.setGeometry(f.geometry())
+            out.setAttributes(f.attributes() + [areas.get(f.id()), mean, count] + values)
+            sink.addFeature(out, QgsFeatureSink.FastInsert)
+
+        results = {self.OUTPUT: dest_id}
+        if raster_path != '':
+            results[self.OUTPUT_RASTER] = raster_path
+        return results
+
+
+# The tiles covering the polygons of the parameter INPUT or, if there are none, the area of
+# the parameter EXTENT of "algorithm". None, if neither of them is given.
+def area_tiles(algorithm, parameters, context):
+    from . import bundle
+    from . import function_module as fm
+
+    crs = QgsCoordinateReferenceSystem('EPSG:31287')
+    source = algorithm.parameterAsSource(parameters, algorithm.INPUT, context)
+    if source is not None:
+        # the tiles intersecting the polygons
+        transform = None
+        if source.sourceCrs() != crs:
+            transform = QgsCoordinateTransform(source.sourceCrs(), crs, context.transformContext())
+        geoms = []
+        for f in source.getFeatures():
+            if not f.hasGeometry():
+                continue
+            g = f.geometry()
+            if transform is not None:
+                g.transform(transform)
+            f_31287 = QgsFeature(f)
+            f_31287.setGeometry(g)
+            geoms.append(fm.ogr_geometry(f_31287))
+        return bundle.geometry_tiles(geoms)
+    if parameters.get(algorithm.EXTENT) is not None:
+        # the tiles of the bounding box
+        ext = algorithm.parameterAsExtent(parameters, algorithm.EXTENT, context, crs)
+        return bundle.bbox_tiles(ext.xMinimum(), ext.xMaximum(), ext.yMinimum(), ext.yMaximum())
+    return None
+
+
+class BuildBundleAlgorithm(QgsProcessingAlgorithm):
+
+    INPUT = 'INPUT'
+    EXTENT = 'EXTENT'
+    OUTPUT = 'OUTPUT'
+    TILES = 'TILES'
+
+    def name(self):
+        return 'buildbundle'
+
+    def displayName(self):
+        return 'Kachelpaket für die Offline-Nutzung erstellen'
+
+    def shortHelpString(self):
+        return ('Lädt die Kacheln der Hangneigung [1], die die Polygone eines Layers oder ein Gebiet überdecken, '
+                'herunter und speichert sie in einem Kachelpaket (.zip) oder einem Kachelspeicher (.sqlite), der '
+                'auch direkt als Kachelquelle dienen kann (source/type = store). Nach dem Importieren des Kachelpakets '
+                '(Kachelpaket importieren) rechnet die Erweiterung in diesem Gebiet ohne Verbindung zum Server. '
+                'Ist sowohl ein Polygonlayer als auch ein Gebiet angegeben, werden die Kacheln des Polygonlayers '
+                'verwendet.')
+
+    def createInstance(self):
+        return BuildBundleAlgorithm()
+
+    def initAlgorithm(self, config = None):
+        self.addParameter(QgsProcessingParameterFeatureSource(self.INPUT, 'Polygonlayer',
+                                                              [QgsProcessing.TypeVectorPolygon], optional = True))
+        self.addParameter(QgsProcessingParameterExtent(self.EXTENT, 'Gebiet', optional = True))
+        self.addParameter(QgsProcessingParameterFileDestination(self.OUTPUT, 'Kachelpaket',
+                                                                'Kachelpaket (*.zip);;Kachelspeicher (*.sqlite)'))
+        self.addOutput(QgsProcessingOutputNumber(self.TILES, 'Anzahl der Kacheln'))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        from . import bundle
+
+        tiles = area_tiles(self, parameters, context)
+        if tiles is None:
+            raise QgsProcessingException('Bitte geben Sie einen Polygonlayer oder ein Gebiet an.')
+
+        if len(tiles) == 0:
+            raise QgsProcessingException('Das Gebiet liegt außerhalb des Datensatzes.')
+
+        path = self.parameterAsFileOutput(parameters, self.OUTPUT, context)
+        try:
+            count = bundle.build_bundle(path, tiles, ProcessingFeedback(feedback))
+        except bundle.BundleError as e:
+            raise QgsProcessingException(str(e))
+        return {self.OUTPUT: path, self.TILES: count}
+
+
+class ImportBundleAlgorithm(QgsProcessingAlgorithm):
+
+    INPUT = 'INPUT'
+    TILES = 'TILES'
+
+    def name(self):
+        return 'importbundle'
+
+    def displayName(self):
+        return 'Kachelpaket importieren'
+
+    def shortHelpString(self):
+        return ('Übernimmt die Kacheln eines Kachelpakets (Kachelpaket für die Offline-Nutzung erstellen) in den '
+                'Zwischenspeicher. Danach rechnet die Erweiterung in diesem Gebiet ohne Verbindung zum Server. Der '
+                'Zwischenspeicher muss aktiviert und groß genug für das Kachelpaket sein (cache/max_size_mb).')
+
+    def createInstance(self):
+        return ImportBundleAlgorithm()
+
+    def initAlgorithm(self, config = None):
+        # a bundle (.zip) or a tile store (.sqlite)
+        self.addParameter(QgsProcessingParameterFile(self.INPUT, 'Kachelpaket'))
+        self.addOutput(QgsProcessingOutputNumber(self.TILES, 'Anzahl der Kacheln'))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        from . import bundle
+
+        path = self.parameterAsFile(parameters, self.INPUT, context)
+        try:
+            count = bundle.import_bundle(path, ProcessingFeedback(feedback))
+        except bundle.BundleError as e:
+            raise QgsProcessingException(str(e))
+        return {self.TILES: count}
+
+
+class BuildIndexAlgorithm(QgsProcessingAlgorithm):
+
+    INPUT = 'INPUT'
+    EXTENT = 'EXTENT'
+    OUTPUT = 'OUTPUT'
+    TILES = 'TILES'
+
+    def name(self):
+        return 'buildindex'
+
+    def displayName(self):
+        return 'Kachelindex erstellen'
+
+    def shortHelpString(self):
+        return ('Erfasst Summe, Anzahl, Minimum und Maximum der Hangneigung [1] und die Anzahl der Punkte ohne Daten '
+                'je Kachel in einem Kachelindex (.sqlite). Für Kacheln, die vollständig innerhalb eines Polygons '
+                'liegen, verwendet die Berechnung diese Werte, statt die Kachel herunterzuladen. Erfasst werden die '
+                'Kacheln des Polygonlayers, sonst die des Gebiets, sonst alle Kacheln im Zwischenspeicher. Ohne '
+                'Ausgabedatei wird der Kachelindex der Einstellungen (index/path) ergänzt. Ein erstellter Kachelindex '
+                'kann weitergegeben und mit index/path verwendet werden.')
+
+    def createInstance(self):
+        return BuildIndexAlgorithm()
+
+    def initAlgorithm(self, config = None):
+        self.addParameter(QgsProcessingParameterFeatureSource(self.INPUT, 'Polygonlayer',
+                                                              [QgsProcessing.TypeVectorPolygon], optional = True))
+        self.addParameter(QgsProcessingParameterExtent(self.EXTENT, 'Gebiet', optional = True))
+        self.addParameter(QgsProcessingParameterFileDestination(self.OUTPUT, 'Kachelindex', 'Kachelindex (*.sqlite)',
+                                                                optional = True, createByDefault = False))
+        self.addOutput(QgsProcessingOutputNumber(self.TILES, 'Anzahl der Kacheln im Kachelindex'))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        from . import tile_index
+
+        tiles = area_tiles(self, parameters, context)
+        if tiles is None:
+            tiles = tile_index.cached_tiles()
+            if len(tiles) == 0:
+                raise QgsProcessingException('Der Zwischenspeicher enthält keine Kacheln. Bitte geben Sie einen '
+                                             'Polygonlayer oder ein Gebiet an.')
+
+        path = self.parameterAsFileOutput(parameters, self.OUTPUT, context) or ''
+        try:
+            count = tile_index.build_index(tiles, ProcessingFeedback(feedback), path)
+        except tile_index.TileIndexError as e:
+            raise QgsProcessingException(str(e))
+        results = {self.TILES: count}
+        if path != '':
+            results[self.OUTPUT] = path
+        return results
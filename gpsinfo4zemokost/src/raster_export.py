@@ -0,0 +1,199 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the RasterWriter, which saves the raster data inside the
+features. The tiles are written one by one into a sparse, tiled GeoTIFF on disk,
+in which only the blocks that are written take up space. When all tiles are
+written, it is converted into the requested format (compressed GeoTIFF, Cloud
+Optimized GeoTIFF or ESRI-Grid). The memory needed does not depend on the size
+of the region.
+The VrtWriter instead saves a virtual raster (VRT), which refers to the tiles in
+the tile cache and only stores a mask of the features itself.
+"""
+# osgeo modules
+from osgeo import gdal
+from osgeo.osr import SpatialReference
+
+# standard python modules
+import os
+from xml.sax.saxutils import escape
+
+
+# the supported formats: gdal driver and creation options of the final file
+FORMATS = {
+    'GTiff': ['TILED=YES', 'COMPRESS=DEFLATE', 'PREDICTOR=3', 'SPARSE_OK=TRUE', 'BIGTIFF=IF_SAFER'],
+    'COG': ['COMPRESS=DEFLATE', 'PREDICTOR=YES', 'BIGTIFF=IF_SAFER'],
+    'AAIGrid': [],
+    'VRT': [],
+}
+
+# the format of the file "path", derived from its extension
+def format_from_path(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.asc':
+        return 'AAIGrid'
+    if ext == '.vrt':
+        return 'VRT'
+    return 'GTiff'
+
+
+class RasterExportError(Exception):
+
+    def __init__(self, reason):
+        super().__init__('Die Rasterdaten konnten nicht gespeichert werden: {}'.format(reason))
+
+
+class RasterWriter:
+
+    def __init__(self, path, raster_format, geo_trafo, xsize, ysize, nodata, epsg = 31287, data_type = gdal.GDT_Float32):
+        # :param raster_format --- one of FORMATS, None: derive it from the extension of "path"
+        # :param geo_trafo --- the geotransform of the whole region
+        # :param xsize, ysize --- the size of the whole region in pixels
+        self.path = path
+        self.format = raster_format or format_from_path(path)
+        if self.format == 'COG' and gdal.GetDriverByName('COG') is None:
+            # the COG driver needs gdal >= 3.1
+            self.format = 'GTiff'
+        self.geo_trafo = geo_trafo
+        self.nodata = nodata
+
+        # the intermediate file: uncompressed, so rewritten blocks stay in place
+        self.tmp_path = path + '.part.tif'
+        self.ds = gdal.GetDriverByName('GTiff').Create(self.tmp_path, xsize, ysize, 1, data_type,
+                                                       options = ['TILED=YES', 'SPARSE_OK=TRUE', 'BIGTIFF=IF_SAFER'])
+        if self.ds is None:
+            raise RasterExportError(gdal.GetLastErrorMsg())
+        self.ds.SetGeoTransform(geo_trafo)
+        srs = SpatialReference()
+        srs.ImportFromEPSG(epsg)
+        self.ds.SetProjection(srs.ExportToWkt())
+        self.band = self.ds.GetRasterBand(1)
+        # blocks that have never been written are read as nodata
+        self.band.SetNoDataValue(nodata)
+
+    def write(self, geo_trafo, array, sel):
+        # Writes the values array[sel] of the tile with geotransform "geo_trafo". The other
+        # pixels of the tile keep their values, so a tile may be written several times.
+        xoff = int(round((geo_trafo[0] - self.geo_trafo[0]) / self.geo_trafo[1]))
+        yoff = int(round((geo_trafo[3] - self.geo_trafo[3]) / self.geo_trafo[5]))
+        window = self.band.ReadAsArray(xoff, yoff, array.shape[1], array.shape[0])
+        window[sel] = array[sel]
+        self.band.WriteArray(window, xoff, yoff)
+
+    def finish(self):
+        # converts the intermediate file into the final one
+        self.ds = self.band = None
+        try:
+            ds = gdal.Translate(self.path, self.tmp_path, format = self.format,
+                                creationOptions = FORMATS[self.format], noData = self.nodata)
+            if ds is None:
+                raise RasterExportError(gdal.GetLastErrorMsg())
+            ds = None
+        finally:
+            self.discard()
+
+    def discard(self):
+        # removes the intermediate file, e.g. when the computation was canceled
+        self.ds = self.band = None
+        gdal.Unlink(self.tmp_path)
+
+
+class VrtWriter:
+
+    def __init__(self, path, tile_source, geo_trafo, xsize, ysize, nodata, epsg = 31287):
+        # :param tile_source --- function geo_trafo -> gdal path of the locally stored tile
+        #                        with this geotransform, or None if there is none
+        # the other parameters are as for RasterWriter
+        self.path = path
+        self.tile_source = tile_source
+        self.geo_trafo = geo_trafo
+        self.xsize, self.ysize = xsize, ysize
+        self.nodata = nodata
+        srs = SpatialReference()
+        srs.ImportFromEPSG(epsg)
+        self.srs = srs.ExportToWkt()
+
+        # the mask of the features: 255 inside, 0 outside. It is the only data written.
+        self.mask_path = os.path.splitext(path)[0] + '.mask.tif'
+        self.mask = RasterWriter(self.mask_path, 'GTiff', geo_trafo, xsize, ysize, 0, epsg, gdal.GDT_Byte)
+
+        # (xoff, yoff) : (gdal path, xsize, ysize) of the tiles
+        self.sources = dict()
+        # the number of tiles that were not stored locally
+        self.missing = 0
+
+    def write(self, geo_trafo, array, sel):
+        # as RasterWriter.write, but the data values are taken from the stored tile
+        source = self.tile_source(geo_trafo)
+        if source is None:
+            self.missing += 1
+            return
+        xoff = int(round((geo_trafo[0] - self.geo_trafo[0]) / self.geo_trafo[1]))
+        yoff = int(round((geo_trafo[3] - self.geo_trafo[3]) / self.geo_trafo[5]))
+        self.sources[(xoff, yoff)] = (source, array.shape[1], array.shape[0])
+        self.mask.write(geo_trafo, sel.astype('uint8') * 255, sel)
+
+    def finish(self):
+        self.mask.finish()
+
+        # the tiles might have been removed from the cache in the meantime
+        missing = self.missing + len([s for (s, w, h) in self.sources.values() if gdal.VSIStatL(s) is None])
+        if missing:
+            raise RasterExportError('{} Kacheln sind nicht im Zwischenspeicher. Bitte vergrößern Sie '
+                                    'den Zwischenspeicher (cache/max_size_mb).'.format(missing))
+
+        xml = ['<VRTDataset rasterXSize="{}" rasterYSize="{}">'.format(self.xsize, self.ysize),
+               '  <SRS>{}</SRS>'.format(escape(self.srs)),
+               '  <GeoTransform>{}</GeoTransform>'.format(', '.join(repr(float(v)) for v in self.geo_trafo)),
+               '  <VRTRasterBand dataType="Float32" band="1">',
+               '    <NoDataValue>{}</NoDataValue>'.format(self.nodata)]
+        for (xoff, yoff) in sorted(self.sources, key = lambda o: (o[1], o[0])):
+            source, w, h = self.sources[(xoff, yoff)]
+            xml += ['    <SimpleSource>',
+                    '      <SourceFilename relativeToVRT="0">{}</SourceFilename>'.format(escape(source)),
+                    '      <SourceBand>1</SourceBand>',
+                    '      <SrcRect xOff="0" yOff="0" xSize="{}" ySize="{}"/>'.format(w, h),
+                    '      <DstRect xOff="{}" yOff="{}" xSize="{}" ySize="{}"/>'.format(xoff, yoff, w, h),
+                    '    </SimpleSource>']
+        xml += ['  </VRTRasterBand>',
+                '  <MaskBand>',
+                '    <VRTRasterBand dataType="Byte">',
+                '      <SimpleSource>',
+                '        <SourceFilename relativeToVRT="1">{}</SourceFilename>'.format(
+                    escape(os.path.basename(self.mask_path))),
+                '        <SourceBand>1</SourceBand>',
+                '      </SimpleSource>',
+                '    </VRTRasterBand>',
+                '  </MaskBand>',
+                '</VRTDataset>']
+
+        try:
+            with open(self.path, 'w') as f:
+                f.write('\n'.join(xml) + '\n')
+        except OSError as e:
+            raise RasterExportError(e)
+
+    def discard(self):
+        self.mask.discard()
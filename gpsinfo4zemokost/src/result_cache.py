@@ -0,0 +1,135 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+This file contains the ResultCache, which keeps the results of the features of a
+project in a sqlite file, keyed by a hash of their geometry, the dataset and the
+configuration of the extended statistics (zonal_stats.py). When the computation is
+repeated, e.g. after editing some of the polygons, only the new and changed features
+are computed again. The files are stored in the folder 'results' of the tile cache,
+one per project.
+"""
+# standard python modules
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# custom modules
+from . import settings
+from .tile_cache import default_directory
+from .zonal_stats import ZonalStats
+
+# Increase it whenever the engine computes different results for the same input,
+# so the results stored before are not used anymore.
+RESULT_VERSION = 1
+
+
+class ResultCache:
+
+    def __init__(self, path, context, zonal_config):
+        # :param path --- the sqlite file, created if it does not exist
+        # :param context --- text identifying the dataset the results are computed from
+        # :param zonal_config --- the extended statistics stored with the results, or None
+        self.path = path
+        self.zonal_config = zonal_config
+        self._prefix = '{}|{}|{}|'.format(RESULT_VERSION, context,
+                                          '' if zonal_config is None else zonal_config.key())
+
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        self.con = sqlite3.connect(path, timeout = 10)
+        self.con.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT, used REAL)')
+        # the keys of the results used in this run
+        self._used = []
+
+    def key(self, geom):
+        # the key of the results of the ogr geometry "geom"
+        h = hashlib.sha1(self._prefix.encode())
+        h.update(bytes(geom.ExportToWkb()))
+        return h.hexdigest()
+
+    def get(self, key):
+        # Returns the result (vals_sum, vals_count, nodata_pt, zonal) stored for "key", see
+        # function_module.add_result, or None if there is none or it cannot be read.
+        try:
+            row = self.con.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            result = json.loads(row[0])
+            zonal = None
+            if self.zonal_config is not None and result['zonal'] is not None:
+                zonal = ZonalStats.from_state(self.zonal_config, result['zonal'])
+            self._used.append(key)
+            return result['sum'], result['count'], result['nodata_pt'], zonal
+        except (sqlite3.Error, ValueError, KeyError, TypeError, IndexError):
+            return None
+
+    def put(self, key, vals_sum, vals_count, nodata_pt, zonal = None):
+        # stores the result of a feature. Failing to store it is not an error.
+        result = {'sum': float(vals_sum), 'count': int(vals_count), 'nodata_pt': [float(c) for c in nodata_pt],
+                  'zonal': None if zonal is None else zonal.state()}
+        try:
+            self.con.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, json.dumps(result), time.time()))
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        # Marks the results used in this run and removes those not used for
+        # results/max_age_days, then writes everything to disk.
+        now = time.time()
+        try:
+            self.con.executemany('UPDATE results SET used = ? WHERE key = ?', [(now, key) for key in self._used])
+            max_age = settings.value('results/max_age_days')
+            if max_age > 0:
+                self.con.execute('DELETE FROM results WHERE used < ?', (now - max_age * 24 * 3600,))
+            self.con.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            self.con.close()
+
+
+def result_directory():
+    return os.path.join(settings.value('cache/directory') or default_directory(), 'results')
+
+# The path of the file of the current project. Projects that have not been saved yet share one.
+def project_path():
+    from qgis.core import QgsProject
+    project = QgsProject.instance().absoluteFilePath()
+    if not project:
+        return os.path.join(result_directory(), 'unsaved.sqlite')
+    name = os.path.splitext(os.path.basename(project))[0]
+    return os.path.join(result_directory(), '{}-{}.sqlite'.format(name, hashlib.sha1(project.encode()).hexdigest()[:8]))
+
+def result_cache(context, zonal_config):
+    # Returns the ResultCache of the current project (see ResultCache for the arguments),
+    # or None if results/cache is not set or the file cannot be opened.
+    if not settings.value('results/cache'):
+        return None
+    try:
+        return ResultCache(project_path(), context, zonal_config)
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,147 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the ResultTableModel, the model of the result table in the
+main dialog. The results are kept as numbers in a ResultStore (result_store.py)
+and are only formatted when the view displays them, so adding rows is cheap. The
+extended statistics (zonal_stats.py) are shown in extra columns after the fixed ones.
+"""
+# Qt modules
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+# custom modules
+from .result_store import ResultStore
+
+
+class ResultTableModel(QAbstractTableModel):
+
+    # the headers of the columns; the first one is the name of the first field of the layer
+    HEADERS = ['', 'Polygonschwerpunkt [(m, m)]', u'Fläche [km²]', 'Hangneigung [1]', 'Rasterpunkte']
+
+    # the columns of the store shown in the table columns, with their CSV headers
+    CSV_COLUMNS = [[('', 'ids')],
+                   [('Polygonschwerpunkt X [m]', 'x'), ('Polygonschwerpunkt Y [m]', 'y')],
+                   [(u'Fläche [km²]', 'area')],
+                   [('Hangneigung [1]', 'mean')],
+                   [('Rasterpunkte', 'count')]]
+
+    def __init__(self, parent = None):
+        super(ResultTableModel, self).__init__(parent)
+        self.id_header = ''
+        self.set_columns([])
+        # the position each row was added at
+        self.order = []
+
+    def set_columns(self, extra):
+        # the extra columns, a list of zonal_stats.Column
+        self.extra = extra
+        self.headers = self.HEADERS + [col.header for col in extra]
+        self.csv_columns = self.CSV_COLUMNS + [[(col.header, col.name)] for col in extra]
+        self.store = ResultStore([(col.name, col.typecode) for col in extra])
+
+    def clear(self, extra = ()):
+        # removes all rows, the table then has the extra columns "extra" (see set_columns)
+        self.beginResetModel()
+        self.set_columns(list(extra))
+        self.order = []
+        self.endResetModel()
+
+    def set_id_header(self, text):
+        self.id_header = text
+        self.headerDataChanged.emit(Qt.Horizontal, 0, 0)
+
+    def append(self, rows):
+        # adds the rows (id, centroid x, centroid y, area, mean, count, extra values ...) at once
+        if len(rows) == 0:
+            return
+        n = len(self.store)
+        self.beginInsertRows(QModelIndex(), n, n + len(rows) - 1)
+        self.store.extend(rows)
+        self.order.extend(range(n, n + len(rows)))
+        self.endInsertRows()
+
+    def write_csv(self, f, rows = None, columns = None):
+        # writes the rows "rows" and table columns "columns" (all, if None) as CSV to the file "f"
+        if columns is None:
+            columns = range(len(self.headers))
+        csv_columns = []
+        for c in columns:
+            csv_columns += [(self.id_header if name == 'ids' else header, name) for (header, name) in self.csv_columns[c]]
+        self.store.write_csv(f, csv_columns, rows)
+
+    def rowCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role = Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        r, c = index.row(), index.column()
+        store = self.store
+        if c == 0:
+            return str(store.ids[r])
+        if c == 1:
+            return '({:.1f}, {:.1f})'.format(store.x[r], store.y[r])
+        if c == 2:
+            return '{:.5f}'.format(store.area[r])
+        if c == 3:
+            return '{:.5f}'.format(store.mean[r])
+        if c == 4:
+            return str(store.count[r])
+        col = self.extra[c - 5]
+        val = store.column(col.name)[r]
+        return str(val) if col.typecode == 'q' else '{:.5f}'.format(val)
+
+    def headerData(self, section, orientation, role = Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Vertical:
+            return str(section + 1)
+        return self.id_header if section == 0 else self.headers[section]
+
+    def sort(self, column, order = Qt.AscendingOrder):
+        # sorts by the numbers, not by the displayed text. column -1 restores the original order.
+        store = self.store
+        if column >= 5:
+            keys = store.column(self.extra[column - 5].name)
+        else:
+            keys = {-1: self.order, 0: store.ids, 1: store.x, 2: store.area, 3: store.mean, 4: store.count}[column]
+        if column == 0:
+            # the ids may be of any type
+            keys = [(not isinstance(k, (int, float)), k if isinstance(k, (int, float)) else str(k)) for k in keys]
+        perm = sorted(range(len(keys)), key = keys.__getitem__, reverse = (order == Qt.DescendingOrder))
+
+        self.layoutAboutToBeChanged.emit()
+        store.permute(perm)
+        self.order = [self.order[k] for k in perm]
+        # keep the selection on the same rows
+        new_row = [0] * len(perm)
+        for (k, r) in enumerate(perm):
+            new_row[r] = k
+        for index in self.persistentIndexList():
+            self.changePersistentIndex(index, self.index(new_row[index.row()], index.column()))
+        self.layoutChanged.emit()
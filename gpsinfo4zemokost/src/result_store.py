@@ -0,0 +1,91 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the ResultStore, which keeps the results of a computation
+column by column in typed arrays, and writes them as CSV. Besides the fixed columns,
+it may have extra columns, e.g. for the extended statistics (zonal_stats.py). The numbers are
+written with full precision, row by row, without building the whole text.
+"""
+# standard python modules
+from array import array
+import csv
+
+
+class ResultStore:
+
+    # the columns: id (the value of the first field of the feature), centroid x and y [m],
+    # area [km²], mean slope [1] and the number of pixels the mean was computed from
+    COLUMNS = ['ids', 'x', 'y', 'area', 'mean', 'count']
+
+    def __init__(self, extra = ()):
+        # :param extra --- list of (name, typecode) of the extra columns
+        self.ids = []
+        self.x = array('d')
+        self.y = array('d')
+        self.area = array('d')
+        self.mean = array('d')
+        self.count = array('q')
+        self.extra = [name for (name, typecode) in extra]
+        for (name, typecode) in extra:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, fid, x, y, area, mean, count, *extra):
+        self.ids.append(fid)
+        self.x.append(x)
+        self.y.append(y)
+        self.area.append(area)
+        self.mean.append(mean)
+        self.count.append(count)
+        for (name, val) in zip(self.extra, extra):
+            getattr(self, name).append(val)
+
+    def extend(self, rows):
+        # adds the rows (id, x, y, area, mean, count, extra values ...)
+        for row in rows:
+            self.append(*row)
+
+    def column(self, name):
+        return getattr(self, name)
+
+    def permute(self, perm):
+        # reorders the rows, row k becomes the former row perm[k]
+        for name in self.COLUMNS + self.extra:
+            col = getattr(self, name)
+            new = [col[k] for k in perm]
+            setattr(self, name, new if isinstance(col, list) else array(col.typecode, new))
+
+    def write_csv(self, f, columns, rows = None, sep = ';'):
+        # Writes the rows "rows" (all, if None) to the text file "f".
+        # :param columns --- list of (header, column name), see COLUMNS and extra
+        writer = csv.writer(f, delimiter = sep, lineterminator = '\n')
+        writer.writerow([header for (header, name) in columns])
+        cols = [getattr(self, name) for (header, name) in columns]
+        if rows is None:
+            rows = range(len(self))
+        # floats are written with repr, so they are read back exactly
+        writer.writerows([col[r] for col in cols] for r in rows)
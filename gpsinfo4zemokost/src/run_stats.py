@@ -0,0 +1,177 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the RunStats, the timers and counters of a computation, which
+show where the time of a run goes. compute (function_module.py) starts them with
+begin and stops them with end. In between, the engine reports to them through the
+functions timer and count of this module, which do nothing if no computation is
+running in the thread, so the downloaders need no extra argument. The RunStats
+belong to the thread that called begin, so computations running at the same time,
+e.g. a task of the dialog and a processing algorithm, keep their statistics apart.
+Threads working for a computation, like the download threads of the TilePrefetcher
+(prefetch.py), are handed its RunStats with run_with. The times of the stages
+running in several threads at once (downloading, decoding) are summed over the
+threads, so they may add up to more than the wall time.
+"""
+# standard python modules
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+# the stages, in the order they are reported : description
+STAGES = [
+    ('prepare', 'Vorbereitung (Kacheln und Gruppen der Features)'),
+    ('download', 'Herunterladen'),
+    ('decode', 'Entpacken und Dekodieren'),
+    ('wait', 'Warten auf heruntergeladene Kacheln'),
+    ('rasterize', 'Rasterisieren der Features'),
+    ('evaluate', 'Auswerten der Rasterpunkte'),
+    ('parallel', 'Übergabe an die und Warten auf die Prozesse'),
+    ('raster_write', 'Schreiben der Rasterdaten'),
+    ('raster_finish', 'Speichern der Rasterdatei'),
+    ('table', 'Aktualisieren der Tabelle'),
+]
+
+# the counters, in the order they are reported : description
+COUNTERS = [
+    ('features', 'Features'),
+    ('features_outside', 'Features außerhalb des Datensatzes'),
+    ('features_too_small', 'Features kleiner als die Auflösung'),
+    ('features_nodata', 'Features mit Punkten ohne Daten'),
+    ('features_failed', 'Features mit nicht heruntergeladenen Kacheln'),
+    ('features_cached', 'Features mit gespeichertem Ergebnis früherer Berechnungen'),
+    ('tiles_fetched', 'Abgerufene Kacheln'),
+    ('tiles_failed', 'Nicht heruntergeladene Kacheln'),
+    ('cache_hits', 'Kacheln aus dem Zwischenspeicher'),
+    ('cache_misses', 'Kacheln nicht im Zwischenspeicher'),
+    ('bytes_downloaded', 'Heruntergeladene Bytes'),
+    ('pixels_processed', 'Ausgewertete Rasterpunkte'),
+    ('tiles_from_index', 'Kacheln innerhalb der Features aus dem Kachelindex'),
+    ('arrays_on_disk', 'Auf die Festplatte ausgelagerte Felder'),
+]
+
+# the log messages of the plugin are shown in this tab of the message log
+LOG_TAG = 'gpsinfo4zemokost'
+
+
+class RunStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        # stage : seconds, counter : value
+        self.seconds = dict()
+        self.counters = dict()
+        # the configuration of the run, e.g. the number of download threads
+        self.config = dict()
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count(self, name, n = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stop(self):
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def report(self):
+        # the statistics as dict, e.g. for json
+        with self._lock:
+            return {'wall_seconds': self.wall_seconds, 'config': dict(self.config),
+                    'stages': {s: self.seconds[s] for (s, d) in STAGES if s in self.seconds},
+                    'counters': {c: self.counters.get(c, 0) for (c, d) in COUNTERS}}
+
+    def summary(self):
+        # the statistics as text, for the message log
+        report = self.report()
+        lines = ['Laufzeit {:.2f} s'.format(report['wall_seconds'] or 0.0)]
+        lines += ['  {}: {:.2f} s'.format(d, report['stages'][s]) for (s, d) in STAGES if s in report['stages']]
+        lines += ['  {}: {}'.format(d, report['counters'][c]) for (c, d) in COUNTERS]
+        lines += ['  {}: {}'.format(k, v) for (k, v) in sorted(report['config'].items())]
+        return '\n'.join(lines)
+
+    def log(self):
+        from qgis.core import QgsMessageLog, Qgis
+        QgsMessageLog.logMessage(self.summary(), LOG_TAG, Qgis.Info)
+
+    def write_json(self, path):
+        with open(path, 'w', encoding = 'utf-8') as f:
+            json.dump(self.report(), f, indent = 1)
+
+
+# the statistics of the computation running in the thread, see current
+_local = threading.local()
+
+def begin():
+    # starts the statistics of a computation in the calling thread
+    _local.stats = RunStats()
+    return _local.stats
+
+def end(stats):
+    stats.stop()
+    if current() is stats:
+        _local.stats = None
+
+def current():
+    # the statistics of the computation running in the calling thread, None if there is none
+    return getattr(_local, 'stats', None)
+
+def run_with(stats, fn, *args):
+    # Calls fn(*args) reporting to the RunStats "stats" (or None), e.g. in a thread of a
+    # ThreadPoolExecutor working for a computation. Returns the result of fn.
+    previous = current()
+    _local.stats = stats
+    try:
+        return fn(*args)
+    finally:
+        _local.stats = previous
+
+@contextmanager
+def timer(stage):
+    # adds the time spent in the with-block to "stage"
+    stats = current()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_time(stage, time.perf_counter() - started)
+
+def add_time(stage, seconds):
+    stats = current()
+    if stats is not None:
+        stats.add_time(stage, seconds)
+
+def count(name, n = 1):
+    stats = current()
+    if stats is not None:
+        stats.count(name, n)
@@ -0,0 +1,83 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the user configurable settings of the plugin. They are stored
+in the QGIS settings below the group 'gpsinfo4zemokost' and can be changed with
+the advanced settings editor of QGIS (Settings -> Options -> Advanced).
+"""
+# Qt modules
+from PyQt5.QtCore import QSettings
+
+# the group all settings of the plugin are stored in
+GROUP = 'gpsinfo4zemokost/'
+
+# The default values. The type of the default value also determines the type
+# a setting is converted to when it is read.
+DEFAULTS = {
+    # persistent tile cache
+    'cache/enabled': True,
+    'cache/directory': '',          # empty: use a folder in the QGIS settings directory
+    'cache/max_size_mb': 500,
+    # tile source, see tile_source.py
+    'source/type': 'http',          # 'http': the server, 'directory': a mirror, 'store': a tile store (.sqlite)
+    'source/path': '',              # the directory or the tile store
+    # downloading
+    'download/workers': 4,          # number of tiles downloaded concurrently
+    'http/connect_timeout': 5.0,    # seconds
+    'http/read_timeout': 30.0,      # seconds
+    'http/retries': 3,              # retries of a failed request
+    'http/backoff': 0.5,            # seconds, doubled with every retry
+    'probe/timeout': 3.0,           # seconds, timeout of the connection check when the dialog opens
+    'probe/max_age': 3600,          # seconds a successful connection check is reused
+    # computation
+    'engine/mode': 'tile',          # 'tile': all features tile by tile, 'feature': feature by feature
+    'engine/processes': 0,          # worker processes of the tile engine, 0: evaluate in QGIS itself
+    'engine/python': '',            # python interpreter of the worker processes, empty: find it
+    'engine/window_max_pixels': 25000000,   # features (groups in tile mode) rasterized at once up to this window size, 0: per tile
+    'memory/budget_mb': 1024,       # memory budget of a run, see memory.py, 0: unlimited
+    # extended statistics of the features, see zonal_stats.py
+    'zonal/extended': False,        # compute standard deviation, minimum, maximum, percentiles and histogram
+    'zonal/percentiles': '10, 50, 90',  # percentiles in %, separated by commas
+    'zonal/hist_bins': 10,          # number of bins of the histogram, 0: no histogram
+    'zonal/hist_min': 0.0,          # range of the histogram (and of the fine histogram of the percentiles),
+    'zonal/hist_max': 1.0,          # in the unit of the slope [1], height per horizontal distance
+    # results of earlier runs, see result_cache.py
+    'results/cache': True,          # reuse the results of unchanged features
+    'results/max_age_days': 90,     # results not used for this many days are removed, 0: never
+    # aggregates of the tiles, see tile_index.py
+    'index/enabled': True,          # record the evaluated tiles and skip the tiles inside the features
+    'index/path': '',               # the index file, empty: a file in the cache directory
+    # run statistics, see run_stats.py
+    'stats/log': True,              # write the timers and counters of each run to the message log
+    'stats/json_report': False,     # save them as <name>.run.json next to the saved .csv
+}
+
+def value(key):
+    # read the setting "key", falling back to its default value
+    default = DEFAULTS[key]
+    return QSettings().value(GROUP + key, default, type = type(default))
+
+def set_value(key, val):
+    QSettings().setValue(GROUP + key, val)
@@ -0,0 +1,121 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the tasks of the main dialog, which run in the background with
+the task manager of QGIS: the ProbeTask checks the connection (see probe.py) while
+the dialog opens, the ComputeTask runs the computation. The engine reports to the task
+through a TaskFeedback, the task passes the progress, warnings and results on to
+the dialog with signals. As the dialog lives in the main thread, the signals are
+delivered there (queued), so the engine never touches the user interface.
+"""
+# Qt and qgis modules
+from PyQt5.QtCore import pyqtSignal
+from qgis.core import QgsTask
+
+# custom modules
+from . import function_module as fm
+from . import probe
+from .feedback import Feedback
+
+
+class ProbeTask(QgsTask):
+
+    # the result of the probe, see probe.probe. Emitted in the main thread.
+    probed = pyqtSignal(bool, str)
+
+    def __init__(self):
+        super().__init__('Verbindung zum Server prüfen')
+        self.ok, self.message = False, ''
+
+    def run(self):
+        # runs in a background thread
+        try:
+            self.ok, self.message = probe.probe()
+        except Exception as e:
+            self.ok, self.message = False, probe.DATA_MESSAGE + ' ({})'.format(e)
+        return True
+
+    def finished(self, result):
+        self.probed.emit(self.ok, self.message)
+
+
+class ComputeTask(QgsTask):
+
+    # the text describing what is being done at the moment
+    text = pyqtSignal(str)
+    # a warning for the post warning dialog
+    warning = pyqtSignal(str)
+    # the result for a feature: feature, sum and number of the data values inside it, and
+    # the values of the extended statistics (see zonal_stats.py) or None
+    result = pyqtSignal(object, float, int, object)
+
+    def __init__(self, feats, raster_path, raster_format = None):
+        super().__init__('Durchschnittliche Hangneigung berechnen', QgsTask.CanCancel)
+        self.feats = feats
+        self.raster_path = raster_path
+        self.raster_format = raster_format
+        # the exception raised by the engine, if any
+        self.exception = None
+        # the timers and counters of the run, see run_stats.py
+        self.stats = None
+
+    def run(self):
+        # runs in a background thread
+        try:
+            self.stats = fm.compute(self.feats, self.raster_path, TaskFeedback(self), self.raster_format)
+        except Exception as e:
+            self.exception = e
+            return False
+        return not self.isCanceled()
+
+
+# forwards the feedback of the engine to the signals of a ComputeTask
+class TaskFeedback(Feedback):
+
+    def __init__(self, task):
+        self.task = task
+        self.total = 1
+        self.done = 0
+
+    def set_total(self, total):
+        self.total = max(total, 1)
+        self.done = 0
+        self.task.setProgress(0)
+
+    def step(self):
+        self.done += 1
+        self.task.setProgress(100 * self.done / self.total)
+
+    def set_text(self, text):
+        self.task.text.emit(text)
+
+    def warn(self, text):
+        self.task.warning.emit(text)
+
+    def result(self, feature, vals_sum, vals_count, zonal = None):
+        self.task.result.emit(feature, float(vals_sum), int(vals_count), None if zonal is None else zonal.values())
+
+    def is_canceled(self):
+        return self.task.isCanceled()
@@ -0,0 +1,215 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the persistent on-disk tile cache. The zipped tiles are stored
+exactly as they are delivered by the server, in the folder structure
+<cache directory>/<dataset name>/<tile_nr_x>/<tile_nr_y>.asc.zip
+The total size of the cache is bounded. If it is exceeded, the least recently
+used tiles are removed. The modification time of a file serves as its time of
+last use, so the order survives a restart of QGIS. The TileCache itself does not
+need QGIS, only tile_cache, which configures it from the settings.
+"""
+# standard python modules
+from collections import OrderedDict
+import os
+import tempfile
+import threading
+
+
+class TileCache:
+
+    def __init__(self, directory, max_size):
+        # :param directory --- the root folder of the cache
+        # :param max_size --- the maximal size of the cache in bytes
+        self.directory = directory
+        self.max_size = max_size
+
+        # counters, e.g. for reporting
+        self.hits = 0
+        self.misses = 0
+
+        # path:size pairs of the cached tiles, least recently used first.
+        # The folder is only scanned when the cache is used for the first time.
+        self._entries = None
+        self._size = 0
+
+        # the cache is shared by the download threads
+        self._lock = threading.RLock()
+
+    def tile_path(self, layer_name, tile_nr_x, tile_nr_y):
+        return os.path.join(self.directory, layer_name, str(tile_nr_x), str(tile_nr_y) + '.asc.zip')
+
+    def get(self, layer_name, tile_nr_x, tile_nr_y):
+        # returns the path to the cached tile or None, if the tile is not cached
+        with self._lock:
+            return self._get(layer_name, tile_nr_x, tile_nr_y)
+
+    def _get(self, layer_name, tile_nr_x, tile_nr_y):
+        self._scan()
+        path = self.tile_path(layer_name, tile_nr_x, tile_nr_y)
+
+        if path not in self._entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # mark the tile as most recently used, in memory and on disk
+        self._entries.move_to_end(path)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, layer_name, tile_nr_x, tile_nr_y, data):
+        # stores the zipped tile "data" (bytes) and returns the path to it
+        path = self.tile_path(layer_name, tile_nr_x, tile_nr_y)
+        with self._lock:
+            self._scan()
+
+        # write to a temporary file first, so there are never incomplete tiles in the cache.
+        # This is done outside of the lock, such that other threads are not blocked.
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(suffix = '.part', dir = os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        with self._lock:
+            os.replace(tmp_path, path)
+
+            self._size -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._size += len(data)
+
+            self._evict()
+        return path
+
+    def discard(self, layer_name, tile_nr_x, tile_nr_y):
+        # removes a tile from the cache, e.g. if it turned out to be corrupt
+        with self._lock:
+            self._scan()
+            path = self.tile_path(layer_name, tile_nr_x, tile_nr_y)
+            if path in self._entries:
+                self._size -= self._entries.pop(path)
+                self._remove_file(path)
+
+    def clear(self):
+        with self._lock:
+            self._scan()
+            for path in self._entries:
+                self._remove_file(path)
+            self._entries.clear()
+            self._size = 0
+
+    def tiles(self, layer_name):
+        # the (tile_nr_x, tile_nr_y) of the cached tiles of the layer "layer_name"
+        with self._lock:
+            self._scan()
+            paths = list(self._entries)
+
+        prefix = os.path.join(self.directory, layer_name) + os.sep
+        tiles = []
+        for path in paths:
+            parts = path[len(prefix):].split(os.sep) if path.startswith(prefix) else []
+            if len(parts) == 2 and parts[0].isdigit() and parts[1][:-len('.asc.zip')].isdigit():
+                tiles.append((int(parts[0]), int(parts[1][:-len('.asc.zip')])))
+        return sorted(tiles)
+
+    def size(self):
+        # the current size of the cache in bytes
+        with self._lock:
+            self._scan()
+            return self._size
+
+    def _scan(self):
+        # read the cached tiles from disk and sort them by their time of last use
+        if self._entries is not None:
+            return
+
+        found = []
+        for root, dirs, files in os.walk(self.directory):
+            # The tiles are <layer>/<tile_nr_x>/<tile_nr_y>.asc.zip. The other files and folders
+            # in the directory, e.g. of the result cache and the tile index, are left alone.
+            rel = os.path.relpath(root, self.directory)
+            depth = 0 if rel == os.curdir else len(rel.split(os.sep))
+            if depth >= 2:
+                dirs[:] = []
+            if depth != 2 or not os.path.basename(root).isdigit():
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith('.part'):      # left over from an interrupted write
+                    self._remove_file(path)
+                elif name.endswith('.asc.zip'):
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+
+        self._entries = OrderedDict((path, size) for (mtime, path, size) in found)
+        self._size = sum(size for (mtime, path, size) in found)
+        self._evict()
+
+    def _evict(self):
+        # remove least recently used tiles until the cache fits into max_size.
+        # The most recently used tile is always kept.
+        while self._size > self.max_size and len(self._entries) > 1:
+            path, size = self._entries.popitem(last = False)
+            self._size -= size
+            self._remove_file(path)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# the tile cache of the running QGIS session, see tile_cache() below
+_cache = None
+
+def default_directory():
+    from qgis.core import QgsApplication
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), 'cache', 'gpsinfo4zemokost')
+
+def tile_cache():
+    # Returns the tile cache as configured in the settings, or None if caching is disabled.
+    # The cache is created once and reused, so its counters cover the whole session.
+    global _cache
+    from . import settings
+
+    if not settings.value('cache/enabled'):
+        return None
+
+    directory = settings.value('cache/directory') or default_directory()
+    max_size = settings.value('cache/max_size_mb') * 1024 * 1024
+
+    if _cache is None or _cache.directory != directory:
+        _cache = TileCache(directory, max_size)
+    else:
+        _cache.max_size = max_size
+    return _cache
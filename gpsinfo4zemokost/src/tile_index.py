@@ -0,0 +1,197 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+This file contains the TileIndex, a sqlite file with aggregates of the data of each
+tile: sum and sum of squares of the data values, their number, the number of no data
+points, minimum and maximum. For the tiles lying completely inside a feature, the
+engine takes these instead of downloading and evaluating the tile, so only the tiles
+on the boundary of the features are downloaded. The index is filled with every tile
+the engine evaluates, it can be built from the cached tiles and shipped as a file
+(index/path). An index belongs to one tile source (tile_source.py), so the aggregates
+of one source are never taken for another.
+"""
+# standard python modules
+from collections import namedtuple
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+
+# custom modules
+from . import settings
+from .prefetch import TilePrefetcher
+from .tile_cache import tile_cache, default_directory
+from .tile_source import tile_source, same_grid
+
+FORMAT = 'gpsinfo4zemokost-index'
+
+# the aggregates of a tile. min and max are None, if the tile has no data.
+Aggregate = namedtuple('Aggregate', ['sum', 'sumsq', 'count', 'nodata', 'min', 'max'])
+
+
+# raised if the index cannot be opened
+class TileIndexError(Exception):
+    pass
+
+
+# the aggregates of the tile data "array" with no data value "nodata"
+def aggregate(array, nodata):
+    vals = array[array != nodata].astype(np.float64)
+    if vals.size == 0:
+        return Aggregate(0.0, 0.0, 0, int(array.size), None, None)
+    return Aggregate(float(vals.sum()), float(np.dot(vals, vals)), int(vals.size), int(array.size - vals.size),
+                     float(vals.min()), float(vals.max()))
+
+
+class TileIndex:
+    # The index is used by one thread only, the one that opened it.
+
+    def __init__(self, path, source):
+        # :param path --- the sqlite file, created if it does not exist
+        # :param source --- the name of the tile source the aggregates are computed from
+        from . import function_module as fm
+
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        self.con = sqlite3.connect(path, timeout = 10)
+        try:
+            self.con.executescript('''
+                CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS tiles (tile_column INTEGER, tile_row INTEGER, sum REAL, sumsq REAL,
+                                                  count INTEGER, nodata INTEGER, min REAL, max REAL,
+                                                  PRIMARY KEY (tile_column, tile_row));''')
+            metadata = dict(self.con.execute('SELECT name, value FROM metadata'))
+            if not metadata:
+                grid = dict((key, fm.TD[key]) for key in fm.TD)
+                self.con.executemany('INSERT INTO metadata VALUES (?, ?)',
+                                     [('format', FORMAT), ('layer', fm.www_layer_name), ('grid', json.dumps(grid)),
+                                      ('source', source)])
+                self.con.commit()
+            elif metadata.get('format') != FORMAT or metadata.get('layer') != fm.www_layer_name or \
+                    not same_grid(json.loads(metadata.get('grid', '{}'))):
+                raise TileIndexError('Die Datei {} ist kein Kachelindex des Datensatzes {}.'.format(
+                                     path, fm.www_layer_name))
+            elif metadata.get('source') != source:
+                raise TileIndexError('Der Kachelindex {} wurde aus der Kachelquelle {} erstellt, nicht aus {}.'.format(
+                                     path, metadata.get('source', '(unbekannt)'), source))
+        except (sqlite3.Error, ValueError) as e:
+            self.con.close()
+            raise TileIndexError('Der Kachelindex {} konnte nicht geöffnet werden: {}'.format(path, e))
+        except TileIndexError:
+            self.con.close()
+            raise
+
+        self._nodata = fm.TD['NODATA']
+        # (tile_nr_x, tile_nr_y) : Aggregate or None, of the tiles looked up so far
+        self._entries = dict()
+
+    def get(self, tile_nr_x, tile_nr_y):
+        # the Aggregate of the tile, or None if it is not in the index
+        tile = (tile_nr_x, tile_nr_y)
+        if tile not in self._entries:
+            try:
+                row = self.con.execute('SELECT sum, sumsq, count, nodata, min, max FROM tiles '
+                                       'WHERE tile_column = ? AND tile_row = ?', tile).fetchone()
+            except sqlite3.Error:
+                row = None
+            self._entries[tile] = None if row is None else Aggregate(*row)
+        return self._entries[tile]
+
+    def record(self, tile_nr_x, tile_nr_y, array):
+        # adds the tile with data "array" to the index, unless it is there already
+        if self.get(tile_nr_x, tile_nr_y) is not None:
+            return
+        agg = aggregate(array, self._nodata)
+        self._entries[(tile_nr_x, tile_nr_y)] = agg
+        try:
+            self.con.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (tile_nr_x, tile_nr_y) + tuple(agg))
+        except sqlite3.Error:
+            pass
+
+    def size(self):
+        # the number of tiles in the index
+        return self.con.execute('SELECT count(*) FROM tiles').fetchone()[0]
+
+    def close(self):
+        try:
+            self.con.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            self.con.close()
+
+
+# the index of the tile source "source" (its name) in the tile cache directory
+def default_path(source):
+    from .function_module import www_layer_name
+    return os.path.join(settings.value('cache/directory') or default_directory(), 'index',
+                        '{}-{}.sqlite'.format(www_layer_name, hashlib.sha1(source.encode()).hexdigest()[:8]))
+
+def tile_index():
+    # Returns the TileIndex of the settings (index/path) for the current tile source, or
+    # None if index/enabled is not set. Raises TileIndexError, if it cannot be opened.
+    if not settings.value('index/enabled'):
+        return None
+    source = tile_source().name
+    path = settings.value('index/path') or default_path(source)
+    try:
+        return TileIndex(path, source)
+    except OSError as e:
+        raise TileIndexError('Der Kachelindex {} konnte nicht geöffnet werden: {}'.format(path, e))
+
+# Adds the tiles "tiles" to the index "path" (empty: the one of the settings), fetching
+# them from the tile source, and reports to "feedback" (see feedback.py). Tiles in the
+# index already are skipped. Returns the number of tiles in the index.
+def build_index(tiles, feedback, path = ''):
+    from . import function_module as fm
+
+    source = tile_source()
+    index = TileIndex(path or settings.value('index/path') or default_path(source.name), source.name)
+    try:
+        todo = [t for t in tiles if index.get(*t) is None]
+        feedback.set_total(len(todo))
+        feedback.set_text('Erfasse {} Kacheln'.format(len(todo)))
+        with TilePrefetcher(source.fetch, todo, settings.value('download/workers')) as prefetcher:
+            for (tile_nr_x, tile_nr_y), future in prefetcher:
+                if feedback.is_canceled():
+                    break
+                try:
+                    geo_trafo, array = future.result()
+                    index.record(tile_nr_x, tile_nr_y, array)
+                except fm.TileDownloadError as e:
+                    feedback.warn(str(e))
+                feedback.step()
+        return index.size()
+    finally:
+        index.close()
+
+# the tiles of the tile cache, e.g. to build the index from
+def cached_tiles():
+    from .function_module import www_layer_name
+    cache = tile_cache()
+    return [] if cache is None else cache.tiles(www_layer_name)
@@ -0,0 +1,355 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the tile sources, from which the engine fetches the tiles:
+
+- HttpSource: the data server, with the downloaders and the tile cache of
+  function_module.py (the default),
+- DirectorySource: a local directory or network share mirroring the server
+  (<x>/<y>.asc.zip, or unzipped <x>/<y>.asc), e.g. an extracted tile bundle,
+- StoreSource: a single sqlite file in the style of MBTiles, holding the zipped
+  tiles as blobs (see TileStoreWriter, built with the bundle algorithm).
+
+The source is chosen with the settings source/type and source/path, see tile_source().
+A source reports the grid of its tiles, which has to be the grid TD of the engine.
+"""
+# osgeo modules
+from osgeo import gdal
+
+# standard python modules
+from abc import ABC, abstractmethod
+from io import BytesIO
+from zipfile import ZipFile
+import json
+import os
+import sqlite3
+import threading
+
+# custom modules
+from . import run_stats
+from . import settings
+from .tile_cache import tile_cache
+
+
+# the keys of the grid a source has to agree on with the engine
+GRID_KEYS = ('NCOLS', 'NROWS', 'EPSG', 'XLL', 'YLL', 'CELLSIZE', 'NODATA')
+
+# True, if the grid "grid" (dict like TD) is the grid TD of the engine
+def same_grid(grid):
+    from .function_module import TD
+    for key in GRID_KEYS:
+        a, b = grid.get(key), TD[key]
+        if isinstance(b, str) and a != b:
+            return False
+        if not isinstance(b, str) and (a is None or abs(float(a) - b) > 1e-6):
+            return False
+    return True
+
+
+class TileSource(ABC):
+    # The interface of the tile sources. The functions are called from the download
+    # threads, so they have to be thread safe. A source has to implement the abstract
+    # ones, otherwise it cannot be created.
+
+    # the name of the source, for the messages
+    name = ''
+
+    def grid(self):
+        # the grid of the tiles: a dict with the keys GRID_KEYS, see TD
+        from .function_module import TD
+        return dict(TD)
+
+    def geo_transform(self, tile_nr_x, tile_nr_y):
+        from .function_module import tile_geo_transform
+        return tile_geo_transform(tile_nr_x, tile_nr_y)
+
+    def nodata(self):
+        return self.grid()['NODATA']
+
+    @abstractmethod
+    def fetch(self, tile_nr_x, tile_nr_y):
+        # Returns the geotransform and the data (as array) of the tile, like the downloaders.
+        # Raises TileDownloadError on failure.
+        pass
+
+    @abstractmethod
+    def read_zip(self, tile_nr_x, tile_nr_y):
+        # Returns the zipped tile (bytes) as on the server. Raises TileDownloadError on failure.
+        pass
+
+    def gdal_path(self, tile_nr_x, tile_nr_y):
+        # the gdal path of the tile, if it is stored locally, otherwise None
+        return None
+
+    def has_gdal_paths(self):
+        # True, if the tiles can have gdal paths (see gdal_path), as a virtual raster needs them
+        return False
+
+    @abstractmethod
+    def check(self):
+        # Checks whether the source works. Returns (ok, message) as probe.probe does.
+        pass
+
+
+class HttpSource(TileSource):
+
+    name = 'Server'
+
+    def fetch(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+        return fm.session_downloader()(tile_nr_x, tile_nr_y)
+
+    def read_zip(self, tile_nr_x, tile_nr_y):
+        # from the tile cache or, if it is not there, from the server, caching it
+        from . import function_module as fm
+        from . import http_client
+
+        run_stats.count('tiles_fetched')
+        cache = tile_cache()
+        path = None if cache is None else cache.get(fm.www_layer_name, tile_nr_x, tile_nr_y)
+        try:
+            if path is not None:
+                with open(path, 'rb') as f:
+                    return f.read()
+            data = http_client.get(fm.tile_url(tile_nr_x, tile_nr_y)).content
+            # this raises, if the server did not send a zip file
+            ZipFile(BytesIO(data)).close()
+        except Exception as e:
+            raise fm.TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+        run_stats.count('bytes_downloaded', len(data))
+        if cache is not None:
+            cache.put(fm.www_layer_name, tile_nr_x, tile_nr_y, data)
+        return data
+
+    def gdal_path(self, tile_nr_x, tile_nr_y):
+        # the cached tile
+        from . import function_module as fm
+        cache = tile_cache()
+        if cache is None:
+            return None
+        path = cache.tile_path(fm.www_layer_name, tile_nr_x, tile_nr_y)
+        if not os.path.isfile(path):
+            return None
+        return '/vsizip/' + path + '/' + fm.tile_member(tile_nr_x, tile_nr_y)
+
+    def has_gdal_paths(self):
+        return tile_cache() is not None
+
+    def check(self):
+        from . import probe
+        return probe.probe_server()
+
+
+class DirectorySource(TileSource):
+
+    def __init__(self, root):
+        self.root = root
+        self.name = root
+
+    def zip_path(self, tile_nr_x, tile_nr_y):
+        return os.path.join(self.root, str(tile_nr_x), str(tile_nr_y) + '.asc.zip')
+
+    def asc_path(self, tile_nr_x, tile_nr_y):
+        return os.path.join(self.root, str(tile_nr_x), str(tile_nr_y) + '.asc')
+
+    def grid(self):
+        # an extracted tile bundle has a manifest with the grid
+        try:
+            with open(os.path.join(self.root, 'manifest.json'), encoding = 'utf-8') as f:
+                return json.load(f)['grid']
+        except (OSError, ValueError, KeyError):
+            return super().grid()
+
+    def fetch(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+
+        run_stats.count('tiles_fetched')
+        path = self.gdal_path(tile_nr_x, tile_nr_y)
+        if path is None:
+            raise fm.TileDownloadError(tile_nr_x, tile_nr_y, 'Die Kachel fehlt in {}.'.format(self.root))
+        with run_stats.timer('decode'):
+            ds = gdal.Open(path)
+            if ds is not None:
+                return ds.GetGeoTransform(), ds.ReadAsArray()
+            # gdal cannot read it, try it without gdal
+            try:
+                if path.startswith('/vsizip/'):
+                    with ZipFile(self.zip_path(tile_nr_x, tile_nr_y)) as zf:
+                        return fm.parse_asc(zf.read(zf.infolist()[0]))
+                with open(path, 'rb') as f:
+                    return fm.parse_asc(f.read())
+            except Exception as e:
+                raise fm.TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+
+    def read_zip(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+
+        run_stats.count('tiles_fetched')
+        try:
+            with open(self.zip_path(tile_nr_x, tile_nr_y), 'rb') as f:
+                return f.read()
+        except OSError:
+            pass
+        # zip the unzipped tile
+        try:
+            buf = BytesIO()
+            with ZipFile(buf, 'w') as zf:
+                zf.write(self.asc_path(tile_nr_x, tile_nr_y), fm.tile_member(tile_nr_x, tile_nr_y))
+            return buf.getvalue()
+        except OSError as e:
+            raise fm.TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+
+    def gdal_path(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+        path = self.zip_path(tile_nr_x, tile_nr_y)
+        if os.path.isfile(path):
+            return '/vsizip/' + path + '/' + fm.tile_member(tile_nr_x, tile_nr_y)
+        path = self.asc_path(tile_nr_x, tile_nr_y)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    def has_gdal_paths(self):
+        return True
+
+    def check(self):
+        if not os.path.isdir(self.root):
+            return False, 'Das Verzeichnis der Kacheln {} wurde nicht gefunden (source/path).'.format(self.root)
+        if not same_grid(self.grid()):
+            return False, 'Die Kacheln in {} passen nicht zum Raster des Datensatzes.'.format(self.root)
+        return True, ''
+
+
+class StoreSource(TileSource):
+
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+        # one connection per thread, as the download threads read concurrently
+        self._local = threading.local()
+
+    def connection(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            uri = 'file:' + os.path.abspath(self.path).replace('\\', '/') + '?mode=ro'
+            con = sqlite3.connect(uri, uri = True, check_same_thread = False)
+            self._local.con = con
+        return con
+
+    def metadata(self):
+        return dict(self.connection().execute('SELECT name, value FROM metadata'))
+
+    def grid(self):
+        try:
+            return json.loads(self.metadata()['grid'])
+        except (sqlite3.Error, KeyError, ValueError):
+            return super().grid()
+
+    def tiles(self):
+        # the (tile_nr_x, tile_nr_y) of the tiles in the store
+        return [tuple(t) for t in self.connection().execute('SELECT tile_column, tile_row FROM tiles ORDER BY 1, 2')]
+
+    def read_zip(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+
+        run_stats.count('tiles_fetched')
+        try:
+            row = self.connection().execute('SELECT tile_data FROM tiles WHERE tile_column = ? AND tile_row = ?',
+                                            (tile_nr_x, tile_nr_y)).fetchone()
+        except sqlite3.Error as e:
+            raise fm.TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+        if row is None:
+            raise fm.TileDownloadError(tile_nr_x, tile_nr_y, 'Die Kachel fehlt in {}.'.format(self.path))
+        return bytes(row[0])
+
+    def fetch(self, tile_nr_x, tile_nr_y):
+        from . import function_module as fm
+
+        data = self.read_zip(tile_nr_x, tile_nr_y)
+        with run_stats.timer('decode'):
+            try:
+                with ZipFile(BytesIO(data)) as zf:
+                    return fm.parse_asc(zf.read(zf.infolist()[0]))
+            except Exception as e:
+                raise fm.TileDownloadError(tile_nr_x, tile_nr_y, str(e))
+
+    def check(self):
+        if not os.path.isfile(self.path):
+            return False, 'Der Kachelspeicher {} wurde nicht gefunden (source/path).'.format(self.path)
+        try:
+            grid = json.loads(self.metadata()['grid'])
+        except (sqlite3.Error, KeyError, ValueError) as e:
+            return False, 'Der Kachelspeicher {} kann nicht gelesen werden: {}'.format(self.path, e)
+        if not same_grid(grid):
+            return False, 'Die Kacheln in {} passen nicht zum Raster des Datensatzes.'.format(self.path)
+        return True, ''
+
+
+class TileStoreWriter:
+    # Writes the zipped tiles into a new sqlite file, to be read by StoreSource.
+
+    def __init__(self, path, metadata):
+        # :param metadata --- dict name : value, the values are stored as json
+        self.con = sqlite3.connect(path)
+        self.con.executescript('''
+            CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE tiles (tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+                                PRIMARY KEY (tile_column, tile_row));''')
+        self.set_metadata(metadata)
+
+    def set_metadata(self, metadata):
+        self.con.executemany('INSERT OR REPLACE INTO metadata VALUES (?, ?)',
+                             [(k, v if isinstance(v, str) else json.dumps(v)) for (k, v) in metadata.items()])
+
+    def put(self, tile_nr_x, tile_nr_y, data):
+        self.con.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?)', (tile_nr_x, tile_nr_y, sqlite3.Binary(data)))
+
+    def close(self):
+        self.con.commit()
+        self.con.close()
+
+
+# the tile source of the running QGIS session and the settings it was created with
+_source = None
+_source_config = None
+_lock = threading.Lock()
+
+def tile_source():
+    # Returns the tile source as configured in the settings (source/type: 'http',
+    # 'directory' or 'store', source/path). Unknown types fall back to the server.
+    global _source, _source_config
+
+    config = (settings.value('source/type'), settings.value('source/path'))
+    with _lock:
+        if _source is None or config != _source_config:
+            source_type, path = config
+            if source_type == 'directory' and path:
+                _source = DirectorySource(path)
+            elif source_type == 'store' and path:
+                _source = StoreSource(path)
+            else:
+                _source = HttpSource()
+            _source_config = config
+        return _source
@@ -0,0 +1,336 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+"""
+This file contains the user interface classes of the dialogs, as pyuic5 generates
+them from the .ui files in the folder ui. Using them instead of uic.loadUiType
+saves parsing the .ui files whenever the plugin is loaded. If a .ui file is
+changed in Qt Designer, the class below has to be updated accordingly, e.g. with
+pyuic5 ui/<name>.ui.
+"""
+# Qt modules
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+# ui/gpsinfo4zemokost_dialog.ui
+class Ui_AustrianMeanElevationDialogBase(object):
+    def setupUi(self, AustrianMeanElevationDialogBase):
+        AustrianMeanElevationDialogBase.setObjectName("AustrianMeanElevationDialogBase")
+        AustrianMeanElevationDialogBase.setWindowModality(QtCore.Qt.NonModal)
+        AustrianMeanElevationDialogBase.resize(545, 356)
+        AustrianMeanElevationDialogBase.setMinimumSize(QtCore.QSize(0, 0))
+        self.verticalLayout_6 = QtWidgets.QVBoxLayout(AustrianMeanElevationDialogBase)
+        self.verticalLayout_6.setSpacing(6)
+        self.verticalLayout_6.setObjectName("verticalLayout_6")
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setSpacing(6)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        self.verticalLayout_5 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_5.setObjectName("verticalLayout_5")
+        self.label_2 = QtWidgets.QLabel(AustrianMeanElevationDialogBase)
+        self.label_2.setAlignment(QtCore.Qt.AlignCenter)
+        self.label_2.setObjectName("label_2")
+        self.verticalLayout_5.addWidget(self.label_2)
+        self.verticalLayout_3.addLayout(self.verticalLayout_5)
+        self.verticalLayout_4 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_4.setObjectName("verticalLayout_4")
+        self.rasterCheck = QtWidgets.QCheckBox(AustrianMeanElevationDialogBase)
+        self.rasterCheck.setCheckable(True)
+        self.rasterCheck.setChecked(False)
+        self.rasterCheck.setAutoRepeat(False)
+        self.rasterCheck.setObjectName("rasterCheck")
+        self.verticalLayout_4.addWidget(self.rasterCheck)
+        self.verticalLayout_3.addLayout(self.verticalLayout_4)
+        self.horizontalLayout.addLayout(self.verticalLayout_3)
+        self.verticalLayout = QtWidgets.QVBoxLayout()
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.selectLayer = QtWidgets.QComboBox(AustrianMeanElevationDialogBase)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.selectLayer.sizePolicy().hasHeightForWidth())
+        self.selectLayer.setSizePolicy(sizePolicy)
+        self.selectLayer.setObjectName("selectLayer")
+        self.horizontalLayout_3.addWidget(self.selectLayer)
+        self.onlySelFeat = QtWidgets.QCheckBox(AustrianMeanElevationDialogBase)
+        self.onlySelFeat.setTristate(False)
+        self.onlySelFeat.setObjectName("onlySelFeat")
+        self.horizontalLayout_3.addWidget(self.onlySelFeat)
+        self.verticalLayout.addLayout(self.horizontalLayout_3)
+        self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_2.setObjectName("horizontalLayout_2")
+        self.rasterFilePath = QtWidgets.QLineEdit(AustrianMeanElevationDialogBase)
+        self.rasterFilePath.setEnabled(False)
+        self.rasterFilePath.setReadOnly(True)
+        self.rasterFilePath.setObjectName("rasterFilePath")
+        self.horizontalLayout_2.addWidget(self.rasterFilePath)
+        self.rasterBrowse = QtWidgets.QToolButton(AustrianMeanElevationDialogBase)
+        self.rasterBrowse.setEnabled(False)
+        self.rasterBrowse.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.rasterBrowse.setObjectName("rasterBrowse")
+        self.horizontalLayout_2.addWidget(self.rasterBrowse)
+        self.verticalLayout.addLayout(self.horizontalLayout_2)
+        self.horizontalLayout.addLayout(self.verticalLayout)
+        self.verticalLayout_6.addLayout(self.horizontalLayout)
+        self.horizontalLayout_4 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_4.setObjectName("horizontalLayout_4")
+        self.run = QtWidgets.QPushButton(AustrianMeanElevationDialogBase)
+        self.run.setObjectName("run")
+        self.horizontalLayout_4.addWidget(self.run)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout_4.addItem(spacerItem)
+        self.verticalLayout_6.addLayout(self.horizontalLayout_4)
+        self.progressBar = QtWidgets.QProgressBar(AustrianMeanElevationDialogBase)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.MinimumExpanding, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.progressBar.sizePolicy().hasHeightForWidth())
+        self.progressBar.setSizePolicy(sizePolicy)
+        self.progressBar.setMinimumSize(QtCore.QSize(0, 0))
+        self.progressBar.setMouseTracking(True)
+        self.progressBar.setAcceptDrops(True)
+        self.progressBar.setProperty("value", 24)
+        self.progressBar.setObjectName("progressBar")
+        self.verticalLayout_6.addWidget(self.progressBar)
+        self.resultTable = QtWidgets.QTableView(AustrianMeanElevationDialogBase)
+        self.resultTable.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.resultTable.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.resultTable.setSortingEnabled(True)
+        self.resultTable.setObjectName("resultTable")
+        self.verticalLayout_6.addWidget(self.resultTable)
+        self.horizontalLayout_5 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_5.setObjectName("horizontalLayout_5")
+        self.aboutButton = QtWidgets.QPushButton(AustrianMeanElevationDialogBase)
+        self.aboutButton.setIcon(QtGui.QIcon.fromTheme("dialog-information"))
+        self.aboutButton.setObjectName("aboutButton")
+        self.horizontalLayout_5.addWidget(self.aboutButton)
+        self.helpButton = QtWidgets.QPushButton(AustrianMeanElevationDialogBase)
+        self.helpButton.setIcon(QtGui.QIcon.fromTheme("help-contents"))
+        self.helpButton.setObjectName("helpButton")
+        self.horizontalLayout_5.addWidget(self.helpButton)
+        spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout_5.addItem(spacerItem1)
+        self.saveButton = QtWidgets.QPushButton(AustrianMeanElevationDialogBase)
+        self.saveButton.setIcon(QtGui.QIcon.fromTheme("document-save-as"))
+        self.saveButton.setObjectName("saveButton")
+        self.horizontalLayout_5.addWidget(self.saveButton)
+        self.closeButton = QtWidgets.QPushButton(AustrianMeanElevationDialogBase)
+        self.closeButton.setIcon(QtGui.QIcon.fromTheme("window-close"))
+        self.closeButton.setObjectName("closeButton")
+        self.horizontalLayout_5.addWidget(self.closeButton)
+        self.verticalLayout_6.addLayout(self.horizontalLayout_5)
+
+        self.retranslateUi(AustrianMeanElevationDialogBase)
+        QtCore.QMetaObject.connectSlotsByName(AustrianMeanElevationDialogBase)
+
+    def retranslateUi(self, AustrianMeanElevationDialogBase):
+        _translate = QtCore.QCoreApplication.translate
+        AustrianMeanElevationDialogBase.setWindowTitle(_translate("AustrianMeanElevationDialogBase", "gpsinfo4zemokost"))
+        self.label_2.setText(_translate("AustrianMeanElevationDialogBase", "Layer in EPSG:31287 auswählen:"))
+        self.rasterCheck.setText(_translate("AustrianMeanElevationDialogBase", "Rasterdaten speichern unter:"))
+        self.onlySelFeat.setText(_translate("AustrianMeanElevationDialogBase", "nur ausgewählte Features"))
+        self.rasterBrowse.setText(_translate("AustrianMeanElevationDialogBase", "..."))
+        self.run.setText(_translate("AustrianMeanElevationDialogBase", "Abfrage starten"))
+        self.aboutButton.setText(_translate("AustrianMeanElevationDialogBase", " About"))
+        self.helpButton.setText(_translate("AustrianMeanElevationDialogBase", " Hilfe"))
+        self.saveButton.setText(_translate("AustrianMeanElevationDialogBase", " Speichern"))
+        self.closeButton.setText(_translate("AustrianMeanElevationDialogBase", "Schließen"))
+
+
+# ui/error_dialog.ui
+class Ui_ErrorDialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(103, 70)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(Dialog.sizePolicy().hasHeightForWidth())
+        Dialog.setSizePolicy(sizePolicy)
+        Dialog.setMinimumSize(QtCore.QSize(0, 0))
+        self.verticalLayout = QtWidgets.QVBoxLayout(Dialog)
+        self.verticalLayout.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.message = QtWidgets.QLabel(Dialog)
+        self.message.setText("")
+        self.message.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.message.setWordWrap(True)
+        self.message.setObjectName("message")
+        self.verticalLayout_2.addWidget(self.message)
+        self.verticalLayout.addLayout(self.verticalLayout_2)
+        self.ok = QtWidgets.QPushButton(Dialog)
+        self.ok.setMaximumSize(QtCore.QSize(592, 16777215))
+        self.ok.setObjectName("ok")
+        self.verticalLayout.addWidget(self.ok, 0, QtCore.Qt.AlignHCenter)
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Fehler"))
+        self.ok.setText(_translate("Dialog", "Ok"))
+
+
+# ui/about_dialog.ui
+class Ui_aboutDialog(object):
+    def setupUi(self, aboutDialog):
+        aboutDialog.setObjectName("aboutDialog")
+        aboutDialog.resize(600, 323)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(aboutDialog.sizePolicy().hasHeightForWidth())
+        aboutDialog.setSizePolicy(sizePolicy)
+        aboutDialog.setMinimumSize(QtCore.QSize(0, 0))
+        aboutDialog.setMaximumSize(QtCore.QSize(100000, 100000))
+        self.verticalLayout = QtWidgets.QVBoxLayout(aboutDialog)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.aboutText = QtWidgets.QLabel(aboutDialog)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.aboutText.sizePolicy().hasHeightForWidth())
+        self.aboutText.setSizePolicy(sizePolicy)
+        self.aboutText.setMinimumSize(QtCore.QSize(0, 0))
+        self.aboutText.setMaximumSize(QtCore.QSize(16777215, 121))
+        self.aboutText.setTextFormat(QtCore.Qt.RichText)
+        self.aboutText.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.aboutText.setWordWrap(True)
+        self.aboutText.setTextInteractionFlags(QtCore.Qt.LinksAccessibleByMouse|QtCore.Qt.TextSelectableByKeyboard|QtCore.Qt.TextSelectableByMouse)
+        self.aboutText.setObjectName("aboutText")
+        self.horizontalLayout.addWidget(self.aboutText)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.imageLabel = QtWidgets.QLabel(aboutDialog)
+        self.imageLabel.setMinimumSize(QtCore.QSize(100, 75))
+        self.imageLabel.setText("")
+        self.imageLabel.setObjectName("imageLabel")
+        self.horizontalLayout.addWidget(self.imageLabel)
+        self.verticalLayout_2.addLayout(self.horizontalLayout)
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.label = QtWidgets.QLabel(aboutDialog)
+        self.label.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.label.setWordWrap(True)
+        self.label.setObjectName("label")
+        self.horizontalLayout_3.addWidget(self.label)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_3)
+        self.verticalLayout.addLayout(self.verticalLayout_2)
+        spacerItem1 = QtWidgets.QSpacerItem(20, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.verticalLayout.addItem(spacerItem1)
+        self.close = QtWidgets.QPushButton(aboutDialog)
+        self.close.setIcon(QtGui.QIcon.fromTheme("window-close"))
+        self.close.setObjectName("close")
+        self.verticalLayout.addWidget(self.close, 0, QtCore.Qt.AlignHCenter)
+
+        self.retranslateUi(aboutDialog)
+        QtCore.QMetaObject.connectSlotsByName(aboutDialog)
+
+    def retranslateUi(self, aboutDialog):
+        _translate = QtCore.QCoreApplication.translate
+        aboutDialog.setWindowTitle(_translate("aboutDialog", "About gpsinfo4zemokost"))
+        self.aboutText.setText(_translate("aboutDialog", "<html><head/><body><p>Gpsinfo4zemokost, Version 20190529.</p><p>Copyright © 2019 <a href=\"https://www.rechenraum.com\"><span style=\" text-decoration: underline; color:#0000ff;\">Rechenraum e.U.</span></a></p><p>Lizensiert unter der <a href=\"https://www.gnu.org/licenses/gpl-3.0.html\"><span style=\" text-decoration: underline; color:#0000ff;\">GNU General Public License</span></a>.</p><p>Dieses Plugin ist Teil des Projekts GPS-Info, unterstützt durch netidee.</p></body></html>"))
+        self.label.setText(_translate("aboutDialog", "<html><head/><body><p>Die Hangneigungsdaten basieren auf dem digitalen 10m Geländemodell der Bundesländerkooperation geoland.at, das unter den Bedingungen der Creative Commons Namensnennung 4.0 International Lizenz frei verfügbar ist.</p></body></html>"))
+        self.close.setText(_translate("aboutDialog", "Schließen"))
+
+
+# ui/warning_dialog.ui
+class Ui_WarningDialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(390, 205)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(Dialog.sizePolicy().hasHeightForWidth())
+        Dialog.setSizePolicy(sizePolicy)
+        self.verticalLayout = QtWidgets.QVBoxLayout(Dialog)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout()
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.warning = QtWidgets.QLabel(Dialog)
+        self.warning.setText("")
+        self.warning.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.warning.setWordWrap(True)
+        self.warning.setObjectName("warning")
+        self.verticalLayout_2.addWidget(self.warning)
+        self.verticalLayout.addLayout(self.verticalLayout_2)
+        self.closeButton = QtWidgets.QPushButton(Dialog)
+        self.closeButton.setMaximumSize(QtCore.QSize(104, 16777215))
+        self.closeButton.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.closeButton.setIcon(QtGui.QIcon.fromTheme("window-close"))
+        self.closeButton.setObjectName("closeButton")
+        self.verticalLayout.addWidget(self.closeButton, 0, QtCore.Qt.AlignHCenter)
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Warnung"))
+        self.closeButton.setText(_translate("Dialog", "Schließen"))
+
+
+# ui/size_warning_dialog.ui
+class Ui_SizeWarningDialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(353, 184)
+        Dialog.setMinimumSize(QtCore.QSize(0, 0))
+        self.verticalLayout = QtWidgets.QVBoxLayout(Dialog)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.warning = QtWidgets.QLabel(Dialog)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.warning.sizePolicy().hasHeightForWidth())
+        self.warning.setSizePolicy(sizePolicy)
+        self.warning.setText("")
+        self.warning.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.warning.setWordWrap(True)
+        self.warning.setObjectName("warning")
+        self.verticalLayout.addWidget(self.warning)
+        self.buttonBox = QtWidgets.QDialogButtonBox(Dialog)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel|QtWidgets.QDialogButtonBox.Ok)
+        self.buttonBox.setCenterButtons(True)
+        self.buttonBox.setObjectName("buttonBox")
+        self.verticalLayout.addWidget(self.buttonBox)
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Warnung"))
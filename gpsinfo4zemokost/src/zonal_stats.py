@@ -0,0 +1,269 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+This file contains the ZonalStats, which accumulate the extended statistics of a
+feature: the standard deviation, minimum and maximum of its data values, percentiles
+and a histogram. The values are added tile by tile and the accumulators of different
+tiles can be merged, so the memory needed per feature does not depend on its size.
+The percentiles are estimated from a fine histogram, see ZonalStats.percentile for
+the error. The slope is dimensionless (height per horizontal distance), so are the
+statistics and the histogram range. The worker processes of parallel.py use this
+file as well, so it must not import qgis or Qt.
+"""
+# standard python modules
+from collections import namedtuple
+import math
+import numpy as np
+
+# the number of bins of the fine histogram the percentiles are estimated from, between
+# hist_min and hist_max. Two more bins count the values below and above the range.
+PERCENTILE_BINS = 1000
+
+# an extra column of the results: its name in the ResultStore (result_store.py), the header
+# in the result table and the CSV, the typecode of its values and the field name in the
+# output of the processing algorithm
+Column = namedtuple('Column', ['name', 'header', 'typecode', 'field'])
+
+
+class ZonalConfig:
+    # What is computed: the percentiles "percentiles" (in %) and a histogram of "hist_bins"
+    # equal bins between "hist_min" and "hist_max". Values outside of the range are counted
+    # in the first or last bin of the histogram. It is passed to the worker processes, so it
+    # must be picklable.
+
+    def __init__(self, percentiles, hist_bins, hist_min, hist_max):
+        self.percentiles = percentiles
+        self.hist_bins = hist_bins
+        self.hist_min = hist_min
+        self.hist_max = hist_max
+
+    def needs_pixels(self):
+        # True, if the statistics cannot be computed from the aggregates of the tile index (tile_index.py)
+        return bool(self.percentiles) or self.hist_bins > 0
+
+    def key(self):
+        # identifies the configuration, e.g. in the result cache (result_cache.py), which
+        # also stores the fine histogram, so its number of bins is part of the key
+        return 'p={};bins={};range={!r}-{!r};fine={}'.format(','.join('{!r}'.format(q) for q in self.percentiles),
+                                                             self.hist_bins, self.hist_min, self.hist_max,
+                                                             PERCENTILE_BINS + 2)
+
+    def hist_edges(self):
+        return np.linspace(self.hist_min, self.hist_max, self.hist_bins + 1)
+
+    def columns(self):
+        # the extra columns, in the order of ZonalStats.values
+        cols = [Column('std', 'Standardabweichung [1]', 'd', 'std_slope'),
+                Column('min', 'Minimum [1]', 'd', 'min_slope'),
+                Column('max', 'Maximum [1]', 'd', 'max_slope')]
+        for q in self.percentiles:
+            name = 'p' + '{:g}'.format(q).replace('.', '_')
+            cols.append(Column(name, '{:g}. Perzentil [1]'.format(q), 'd', name + '_slope'))
+        edges = self.hist_edges()
+        for k in range(self.hist_bins):
+            cols.append(Column('hist{}'.format(k + 1), 'Rasterpunkte {:g}–{:g}'.format(edges[k], edges[k + 1]),
+                               'q', 'pixels_{}'.format(k + 1)))
+        return cols
+
+
+# Returns the ZonalConfig of the settings zonal/..., or None if the extended
+# statistics are switched off (zonal/extended).
+def config():
+    # the settings need Qt, which the worker processes do not have
+    from . import settings
+
+    if not settings.value('zonal/extended'):
+        return None
+
+    # the percentiles are given as text, e.g. '10, 50, 90'. Invalid entries are skipped.
+    percentiles = []
+    for item in settings.value('zonal/percentiles').replace(';', ',').split(','):
+        try:
+            q = float(item)
+        except ValueError:
+            continue
+        if 0 <= q <= 100 and q not in percentiles:
+            percentiles.append(q)
+
+    # the fine histogram of the percentiles needs a range, so an empty one is replaced by the default
+    hist_min, hist_max = settings.value('zonal/hist_min'), settings.value('zonal/hist_max')
+    if not hist_max > hist_min:
+        hist_min, hist_max = settings.DEFAULTS['zonal/hist_min'], settings.DEFAULTS['zonal/hist_max']
+    hist_bins = max(settings.value('zonal/hist_bins'), 0)
+    return ZonalConfig(percentiles, hist_bins, hist_min, hist_max)
+
+# the extra columns of the configuration "zonal_config" (None: no extra columns)
+def columns(zonal_config):
+    return [] if zonal_config is None else zonal_config.columns()
+
+
+class ZonalStats:
+
+    def __init__(self, zonal_config):
+        self.config = zonal_config
+        # number, mean and sum of the squared deviations from the mean of the values
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # the histograms are only kept if they are needed
+        self.fine = np.zeros(PERCENTILE_BINS + 2, dtype = np.int64) if zonal_config.percentiles else None
+        self.hist = np.zeros(zonal_config.hist_bins, dtype = np.int64) if zonal_config.hist_bins else None
+
+    def add(self, values):
+        # adds the data values "values" (array)
+        if values.size == 0:
+            return
+        values = values.astype(np.float64)
+        mean = float(values.mean())
+        self._merge_moments(values.size, mean, float(((values - mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if self.fine is not None:
+            self.fine += np.bincount(self._fine_bins(values), minlength = PERCENTILE_BINS + 2)
+        if self.hist is not None:
+            self.hist += np.bincount(self._bins(values, self.config.hist_bins), minlength = self.config.hist_bins)
+
+    def add_aggregate(self, count, total, sumsq, vmin, vmax):
+        # Adds "count" values given by their sum, sum of squares, minimum and maximum, e.g.
+        # those of a tile of the tile index. Not possible, if the histograms are kept.
+        if count == 0:
+            return
+        mean = total / count
+        self._merge_moments(count, mean, max(sumsq - total * mean, 0.0))
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    def merge(self, other):
+        # adds the values accumulated by "other", a ZonalStats of the same configuration
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.fine is not None:
+            self.fine += other.fine
+        if self.hist is not None:
+            self.hist += other.hist
+
+    def state(self):
+        # the accumulated values as a dict of plain numbers and lists, e.g. for json. The
+        # histograms are stored sparse, as lists of [bin, count].
+        state = {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+        for (name, hist) in (('fine', self.fine), ('hist', self.hist)):
+            if hist is not None:
+                state[name] = [[int(k), int(hist[k])] for k in np.nonzero(hist)[0]]
+        return state
+
+    @classmethod
+    def from_state(cls, zonal_config, state):
+        # the ZonalStats with the accumulated values "state" (see state) of the configuration "zonal_config"
+        zonal = cls(zonal_config)
+        zonal.count, zonal.mean, zonal.m2 = state['count'], state['mean'], state['m2']
+        zonal.min, zonal.max = state['min'], state['max']
+        for (name, hist) in (('fine', zonal.fine), ('hist', zonal.hist)):
+            if hist is not None:
+                for (k, c) in state[name]:
+                    hist[k] = c
+        return zonal
+
+    def _merge_moments(self, count, mean, m2):
+        # combines the moments of two sets of values (Chan et al.), which is stable
+        # even if the mean is large compared to the deviations
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _bins(self, values, bins):
+        # the bin of each of the values, for "bins" equal bins of the histogram range
+        width = (self.config.hist_max - self.config.hist_min) / bins
+        k = np.floor((values - self.config.hist_min) / width)
+        return np.clip(k, 0, bins - 1).astype(np.intp)
+
+    def _fine_bins(self, values):
+        # the bin of each of the values in the fine histogram: 0 below the histogram range,
+        # 1 to PERCENTILE_BINS inside of it and PERCENTILE_BINS + 1 from hist_max on
+        width = (self.config.hist_max - self.config.hist_min) / PERCENTILE_BINS
+        k = np.floor((values - self.config.hist_min) / width) + 1
+        k[values >= self.config.hist_max] = PERCENTILE_BINS + 1
+        return np.clip(k, 0, PERCENTILE_BINS + 1).astype(np.intp)
+
+    def _fine_edges(self, k):
+        # the lower and upper bound of the values in bin k of the fine histogram
+        if k == 0:
+            return min(self.min, self.config.hist_min), self.config.hist_min
+        if k == PERCENTILE_BINS + 1:
+            return self.config.hist_max, max(self.max, self.config.hist_max)
+        width = (self.config.hist_max - self.config.hist_min) / PERCENTILE_BINS
+        return self.config.hist_min + (k - 1) * width, self.config.hist_min + k * width
+
+    def std(self):
+        # the (population) standard deviation
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    def percentile(self, q):
+        # Estimates the q-th percentile, the smallest value with at least q % of the values
+        # less or equal, by interpolating linearly inside the bin of the fine histogram it
+        # falls into. The error is at most the width of that bin: (hist_max - hist_min) /
+        # PERCENTILE_BINS inside the histogram range, hist_min - min below and max - hist_max
+        # above it.
+        if self.count == 0:
+            return math.nan
+        rank = q / 100 * self.count
+        cum = np.cumsum(self.fine)
+        k = min(int(np.searchsorted(cum, rank)), PERCENTILE_BINS + 1)
+        below = cum[k] - self.fine[k]
+        frac = (rank - below) / self.fine[k] if self.fine[k] else 0.0
+        lower, upper = self._fine_edges(k)
+        value = lower + frac * (upper - lower)
+        return min(max(value, self.min), self.max)
+
+    def values(self):
+        # the values of the extra columns, see ZonalConfig.columns
+        vals = [self.std(), self.min, self.max]
+        vals += [self.percentile(q) for q in self.config.percentiles]
+        if self.hist is not None:
+            vals += [int(c) for c in self.hist]
+        return vals
+
+
+# Adds the data values "values" to the ZonalStats of their labels "labels" (both arrays
+# of the same size) in the dict "accumulators" (label : ZonalStats), creating the missing ones.
+def add_by_label(accumulators, labels, values, zonal_config):
+    if labels.size == 0:
+        return
+    order = np.argsort(labels, kind = 'stable')
+    labels, values = labels[order], values[order]
+    # the start of each run of equal labels
+    starts = np.concatenate(([0], np.nonzero(np.diff(labels))[0] + 1, [labels.size]))
+    for (a, b) in zip(starts[:-1], starts[1:]):
+        label = int(labels[a])
+        if label not in accumulators:
+            accumulators[label] = ZonalStats(zonal_config)
+        accumulators[label].add(values[a:b])
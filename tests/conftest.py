@@ -0,0 +1,45 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+The fixtures shared by the tests.
+"""
+# standard python modules
+import pytest
+
+
+@pytest.fixture
+def plugin_settings(monkeypatch, tmp_path):
+    # The settings of the plugin (settings.py) as a dict, which the tests may change.
+    # They start with the defaults and the tile cache in a temporary folder, so the
+    # settings of a QGIS installation are neither read nor changed.
+    pytest.importorskip('PyQt5')
+    from gpsinfo4zemokost.src import settings
+
+    values = dict(settings.DEFAULTS)
+    values['cache/directory'] = str(tmp_path / 'cache')
+    monkeypatch.setattr(settings, 'value', values.__getitem__)
+    monkeypatch.setattr(settings, 'set_value', values.__setitem__)
+    return values
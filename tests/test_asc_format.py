@@ -0,0 +1,83 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of asc_format.py: the header variants of the ESRI ASCII raster files, their
+no data values and the whitespace around the values.
+"""
+# standard python modules
+import warnings
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# custom modules
+from gpsinfo4zemokost.src.asc_format import parse_asc
+
+
+NODATA = -99999
+
+VALUES = b'1 2 3\n4 -9999 6\n'
+
+
+def test_corner_header():
+    data = (b'ncols 3\nnrows 2\nxllcorner 100.0\nyllcorner 200.0\ncellsize 10.0\n'
+            b'NODATA_value -9999\n' + VALUES)
+    geo_trafo, arr = parse_asc(data, NODATA)
+
+    assert geo_trafo == (100.0, 10.0, 0, 220.0, 0, -10.0)
+    assert arr.dtype == np.float32
+    assert arr.tolist() == [[1, 2, 3], [4, NODATA, 6]]
+
+def test_center_header_on_one_line_in_upper_case():
+    # the center of the lower left cell instead of its corner, the items separated by spaces
+    data = b'NCOLS 3 NROWS 2 XLLCENTER 105.0 YLLCENTER 205.0 CELLSIZE 10.0 NODATA_VALUE -9999 ' + VALUES
+    geo_trafo, arr = parse_asc(data, NODATA)
+
+    assert geo_trafo == (100.0, 10.0, 0, 220.0, 0, -10.0)
+    assert arr.tolist() == [[1, 2, 3], [4, NODATA, 6]]
+
+def test_without_nodata_value():
+    data = b'ncols 3\nnrows 2\nxllcorner 0\nyllcorner 0\ncellsize 1\n' + VALUES
+    geo_trafo, arr = parse_asc(data, NODATA)
+    assert arr[1, 1] == -9999
+
+def test_nodata_value_of_the_tiles_is_kept():
+    data = b'ncols 3\nnrows 2\nxllcorner 0\nyllcorner 0\ncellsize 1\nnodata_value -99999\n1 2 3\n4 -99999 6\n'
+    geo_trafo, arr = parse_asc(data, NODATA)
+    assert arr.tolist() == [[1, 2, 3], [4, NODATA, 6]]
+
+def test_whitespace_and_windows_line_breaks():
+    data = (b'  ncols   3\r\nnrows\t2\r\nxllcorner 0\r\nyllcorner 0\r\ncellsize 1\r\n'
+            b'NODATA_value -9999\r\n 1 2 3 \r\n4 -9999 6   \r\n\r\n  ')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        geo_trafo, arr = parse_asc(data, NODATA)
+    assert arr.tolist() == [[1, 2, 3], [4, NODATA, 6]]
+
+def test_wrong_number_of_values():
+    data = b'ncols 3\nnrows 2\nxllcorner 0\nyllcorner 0\ncellsize 1\n1 2 3 4 5\n'
+    with pytest.raises(ValueError):
+        parse_asc(data, NODATA)
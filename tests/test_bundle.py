@@ -0,0 +1,104 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of bundle.py: tiles taken from a tile source into a bundle or tile store and
+imported into the tile cache arrive unchanged, and bundles of another grid are refused.
+"""
+# standard python modules
+import json
+import os
+from zipfile import ZipFile
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('osgeo')
+pytest.importorskip('qgis.core')
+
+# custom modules
+from benchmarks.tiles import write_tiles, tile_path
+from gpsinfo4zemokost.src import bundle
+from gpsinfo4zemokost.src import function_module as fm
+from gpsinfo4zemokost.src.feedback import Feedback
+from gpsinfo4zemokost.src.tile_cache import tile_cache
+
+
+TILES = [(100, 50), (100, 51), (101, 50)]
+
+
+@pytest.fixture
+def mirror(plugin_settings, tmp_path):
+    # a directory mirroring the server as tile source
+    root = str(tmp_path / 'mirror')
+    write_tiles(root, TILES)
+    plugin_settings['source/type'] = 'directory'
+    plugin_settings['source/path'] = root
+    return root
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('name', ['tiles.zip', 'tiles.sqlite'])
+def test_round_trip(mirror, tmp_path, name):
+    path = str(tmp_path / name)
+    # a tile missing in the mirror is left out and listed in the manifest
+    assert bundle.build_bundle(path, TILES + [(101, 51)], Feedback()) == 3
+    assert not os.path.exists(path + '.part')
+
+    assert bundle.import_bundle(path, Feedback()) == 3
+    cache = tile_cache()
+    assert cache.tiles(fm.www_layer_name) == TILES
+    for (x, y) in TILES:
+        assert read(cache.get(fm.www_layer_name, x, y)) == read(tile_path(mirror, x, y))
+
+def test_manifest(mirror, tmp_path):
+    path = str(tmp_path / 'tiles.zip')
+    bundle.build_bundle(path, TILES + [(101, 51)], Feedback())
+    with ZipFile(path) as zf:
+        manifest = json.loads(zf.read(bundle.MANIFEST).decode('utf-8'))
+    assert manifest['tiles'] == [list(t) for t in TILES]
+    assert manifest['missing'] == [[101, 51]]
+    bundle.check_manifest(manifest)
+
+def test_other_grid_is_refused(mirror, tmp_path):
+    path = str(tmp_path / 'tiles.zip')
+    bundle.build_bundle(path, TILES, Feedback())
+    with ZipFile(path) as zf:
+        manifest = json.loads(zf.read(bundle.MANIFEST).decode('utf-8'))
+
+    for grid in (dict(manifest['grid'], CELLSIZE = 5.0), dict(manifest['grid'], EPSG = 'EPSG:4326'), None):
+        with pytest.raises(bundle.BundleError):
+            bundle.check_manifest(dict(manifest, grid = grid))
+
+    other = str(tmp_path / 'other.zip')
+    with ZipFile(other, 'w') as zf:
+        zf.writestr(bundle.MANIFEST, json.dumps(dict(manifest, grid = dict(manifest['grid'], NCOLS = 300))))
+        for (x, y) in TILES:
+            zf.writestr(bundle.bundle_member(x, y), read(tile_path(mirror, x, y)))
+    with pytest.raises(bundle.BundleError):
+        bundle.import_bundle(other, Feedback())
+    assert tile_cache().tiles(fm.www_layer_name) == []
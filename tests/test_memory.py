@@ -0,0 +1,77 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of memory.py: arrays larger than a quarter of the memory budget are backed by
+a temporary file, the others are in memory.
+"""
+# standard python modules
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# custom modules
+from gpsinfo4zemokost.src import memory, run_stats
+
+
+MB = 1024 * 1024
+
+
+def test_without_budget_arrays_are_in_memory(monkeypatch):
+    monkeypatch.setattr(memory, 'budget', lambda: None)
+    arr = memory.array((1000, 1000), np.float64)
+    assert type(arr) is np.ndarray
+    assert not arr.any()
+
+def test_small_arrays_are_in_memory(monkeypatch):
+    monkeypatch.setattr(memory, 'budget', lambda: 4 * MB)
+    # exactly a quarter of the budget
+    arr = memory.array((1024, 128), np.float64)
+    assert type(arr) is np.ndarray
+
+def test_large_arrays_are_backed_by_a_file(monkeypatch):
+    monkeypatch.setattr(memory, 'budget', lambda: 4 * MB)
+    stats = run_stats.begin()
+    try:
+        arr = memory.array((1024, 129), np.float64)
+    finally:
+        run_stats.end(stats)
+
+    assert isinstance(arr, np.memmap)
+    assert arr.shape == (1024, 129) and arr.dtype == np.float64
+    assert not arr.any()
+    assert stats.counters['arrays_on_disk'] == 1
+
+    # it is used like any other array
+    arr[10:20, 5] = 1.5
+    assert arr.sum() == 15.0
+
+def test_max_tiles(monkeypatch):
+    monkeypatch.setattr(memory, 'budget', lambda: None)
+    assert memory.max_tiles(8, MB) == 8
+    monkeypatch.setattr(memory, 'budget', lambda: 16 * MB)
+    assert memory.max_tiles(8, MB) == 4
+    # at least 2
+    assert memory.max_tiles(8, 100 * MB) == 2
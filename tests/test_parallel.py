@@ -0,0 +1,139 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of parallel.py: evaluate_tile gives the sums, counts, no data points and clipped
+data of the features in a tile, in the worker processes of a TilePool as well.
+"""
+# standard python modules
+import sys
+import pytest
+
+np = pytest.importorskip('numpy')
+ogr = pytest.importorskip('osgeo.ogr')
+
+# custom modules
+from gpsinfo4zemokost.src.parallel import TilePool, evaluate_tile, python_executable
+from gpsinfo4zemokost.src.zonal_stats import ZonalConfig
+
+
+NODATA = -99999
+SHAPE = (10, 10)
+GEO_TRAFO = (0.0, 1.0, 0, 10.0, 0, -1.0)
+
+
+# the WKB of the rectangle of the pixels rows[0]:rows[1], cols[0]:cols[1] of GEO_TRAFO
+def rectangle(rows, cols):
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for (x, y) in [(cols[0], rows[0]), (cols[1], rows[0]), (cols[1], rows[1]), (cols[0], rows[1]), (cols[0], rows[0])]:
+        ring.AddPoint(float(x), 10.0 - y)
+    poly = ogr.Geometry(ogr.wkbPolygon)
+    poly.AddGeometry(ring)
+    return bytes(poly.ExportToWkb())
+
+# the features: 1 and 2 do not overlap, 3 overlaps both of them
+FEATURES = {1: ((1, 3), (2, 6)), 2: ((5, 9), (0, 4)), 3: ((2, 6), (3, 8))}
+GROUPS = [[(1, rectangle(*FEATURES[1])), (2, rectangle(*FEATURES[2]))], [(3, rectangle(*FEATURES[3]))]]
+
+def tile():
+    array = np.arange(100, dtype = np.float32).reshape(SHAPE) / 100
+    array[6, 1] = NODATA
+    return array
+
+def expected(array, label):
+    (r0, r1), (c0, c1) = FEATURES[label]
+    vals = array[r0:r1, c0:c1]
+    return vals[vals != NODATA]
+
+def evaluate_in_shared_memory(array, clip, zonal_config = None):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create = True, size = array.size * 4)
+    try:
+        shared = np.ndarray(array.shape, dtype = np.float32, buffer = shm.buf)
+        shared[:] = array
+        result = evaluate_tile(shm.name, array.shape, GEO_TRAFO, GROUPS, NODATA, clip, zonal_config)
+        return result, shared.copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_evaluate_tile():
+    array = tile()
+    (labels, sums, counts, nodata_pts, zonal, clip), clipped = evaluate_in_shared_memory(array, True)
+
+    assert sorted(labels.tolist()) == [1, 2, 3]
+    for (label, s, c) in zip(labels, sums, counts):
+        assert s == pytest.approx(expected(array, label).sum(dtype = np.float64))
+        assert c == expected(array, label).size
+    # the no data point is in feature 2 only, at the center of its pixel
+    assert list(nodata_pts) == [2]
+    assert nodata_pts[2] == pytest.approx([1.5, 3.5])
+    assert zonal == dict()
+
+    # the data inside any of the features is kept
+    inside = np.zeros(SHAPE, dtype = bool)
+    for ((r0, r1), (c0, c1)) in FEATURES.values():
+        inside[r0:r1, c0:c1] = True
+    assert clip
+    assert (clipped[inside] == array[inside]).all()
+    assert (clipped[~inside] == NODATA).all()
+
+def test_evaluate_tile_with_extended_statistics():
+    array = tile()
+    zonal_config = ZonalConfig([50], 4, 0.0, 1.0)
+    (labels, sums, counts, nodata_pts, zonal, clip), clipped = evaluate_in_shared_memory(array, False, zonal_config)
+
+    assert not clip
+    assert (clipped == array).all()
+    for label in (1, 2, 3):
+        vals = expected(array, label)
+        assert zonal[label].count == vals.size
+        assert zonal[label].std() == pytest.approx(vals.astype(np.float64).std())
+
+def test_python_executable():
+    assert python_executable('/opt/python') == '/opt/python'
+    assert 'python' in python_executable().lower() or python_executable() == sys.executable
+
+def test_pool_gives_the_results_of_evaluate_tile():
+    tiles = {(k, 0): tile() * (k + 1) for k in range(4)}
+    results = dict()
+    with TilePool(2, max_pending = 2) as pool:
+        for t in sorted(tiles):
+            pool.submit(t, GEO_TRAFO, tiles[t], GROUPS, NODATA, True)
+            for (done, result, clipped) in pool.finished(block = pool.busy()):
+                results[done] = (result, clipped)
+        for (done, result, clipped) in pool.finished(wait_all = True):
+            results[done] = (result, clipped)
+
+    assert sorted(results) == sorted(tiles)
+    for t in tiles:
+        (labels, sums, counts, nodata_pts, zonal), clipped = results[t]
+        (e_labels, e_sums, e_counts, e_nodata_pts, e_zonal, e_clip), e_clipped = \
+            evaluate_in_shared_memory(tiles[t], True)
+        assert labels.tolist() == e_labels.tolist()
+        assert sums == pytest.approx(e_sums)
+        assert counts.tolist() == e_counts.tolist()
+        assert (clipped == e_clipped).all()
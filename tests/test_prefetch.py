@@ -0,0 +1,127 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of prefetch.py: the order in which the TilePrefetcher hands out the tiles, the
+bound on the tiles downloaded ahead and the cancellation of the pending downloads.
+"""
+# standard python modules
+import threading
+import time
+import pytest
+
+# custom modules
+from gpsinfo4zemokost.src import run_stats
+from gpsinfo4zemokost.src.prefetch import TilePrefetcher
+
+
+TILES = [(x, y) for x in range(3) for y in range(4)]
+
+
+class Fetcher:
+    # a fetch function recording the tiles it was called for, waiting "delay" seconds per tile
+
+    def __init__(self, delay = 0.0, fail = ()):
+        self.delay = delay
+        self.fail = fail
+        self.fetched = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, tile_nr_x, tile_nr_y):
+        with self._lock:
+            self.fetched.append((tile_nr_x, tile_nr_y))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        if (tile_nr_x, tile_nr_y) in self.fail:
+            raise ValueError('tile {} failed'.format((tile_nr_x, tile_nr_y)))
+        return 10 * tile_nr_x + tile_nr_y
+
+
+def test_get_in_order():
+    fetch = Fetcher()
+    with TilePrefetcher(fetch, TILES, 3) as prefetcher:
+        assert [prefetcher.get(*t) for t in TILES] == [10 * x + y for (x, y) in TILES]
+    assert sorted(fetch.fetched) == TILES
+
+def test_skipped_tiles_are_not_waited_for():
+    fetch = Fetcher()
+    with TilePrefetcher(fetch, TILES, 2) as prefetcher:
+        assert prefetcher.get(*TILES[5]) == 10 * TILES[5][0] + TILES[5][1]
+        assert prefetcher.get(*TILES[-1]) == 10 * TILES[-1][0] + TILES[-1][1]
+
+def test_tile_not_announced_is_fetched_right_away():
+    fetch = Fetcher()
+    with TilePrefetcher(fetch, TILES[:2], 2) as prefetcher:
+        assert prefetcher.get(7, 7) == 77
+    assert (7, 7) in fetch.fetched
+
+def test_iteration_yields_every_tile_once():
+    fetch = Fetcher(delay = 0.001, fail = [TILES[3]])
+    results = dict()
+    with TilePrefetcher(fetch, TILES, 4) as prefetcher:
+        for tile, future in prefetcher:
+            try:
+                results[tile] = future.result()
+            except ValueError:
+                results[tile] = None
+    assert sorted(results) == TILES
+    assert results[TILES[3]] is None
+    assert results[TILES[4]] == 10 * TILES[4][0] + TILES[4][1]
+
+def test_tiles_ahead_are_bounded():
+    fetch = Fetcher(delay = 0.01)
+    with TilePrefetcher(fetch, TILES, 4, max_ahead = 2) as prefetcher:
+        prefetcher.get(*TILES[0])
+        time.sleep(0.05)
+        # the consumed first tile and the two tiles ahead of it, no more
+        assert sorted(fetch.fetched) == TILES[:3]
+        assert fetch.max_running <= 3
+
+def test_close_cancels_the_pending_downloads():
+    fetch = Fetcher(delay = 0.02)
+    prefetcher = TilePrefetcher(fetch, TILES, 1, max_ahead = 4)
+    prefetcher.close()
+    # at most the download running when closing was done
+    assert len(fetch.fetched) <= 1
+
+def test_downloads_report_to_the_run_statistics():
+    def fetch(tile_nr_x, tile_nr_y):
+        run_stats.count('tiles_fetched')
+        return None
+
+    stats = run_stats.begin()
+    try:
+        with TilePrefetcher(fetch, TILES, 3) as prefetcher:
+            for tile, future in prefetcher:
+                future.result()
+    finally:
+        run_stats.end(stats)
+    assert stats.counters['tiles_fetched'] == len(TILES)
+    assert 'wait' in stats.seconds
@@ -0,0 +1,129 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of raster_export.py: the RasterWriter and the VrtWriter write the data inside
+the features and leave no intermediate files behind, also when they are discarded.
+"""
+# standard python modules
+import os
+import pytest
+
+np = pytest.importorskip('numpy')
+gdal = pytest.importorskip('osgeo.gdal')
+
+# custom modules
+from gpsinfo4zemokost.src.raster_export import RasterWriter, VrtWriter, RasterExportError, format_from_path
+
+
+NODATA = -99999
+# a region of 2 x 1 tiles of 4 x 4 pixels
+GEO_TRAFO = (1000.0, 10.0, 0, 2000.0, 0, -10.0)
+
+
+def tile_geo_transform(k):
+    return (GEO_TRAFO[0] + 40.0 * k, 10.0, 0, GEO_TRAFO[3], 0, -10.0)
+
+def read(path):
+    ds = gdal.Open(path)
+    return ds.GetRasterBand(1).ReadAsArray()
+
+
+def test_format_from_path():
+    assert format_from_path('a/b.ASC') == 'AAIGrid'
+    assert format_from_path('b.vrt') == 'VRT'
+    assert format_from_path('b.tif') == 'GTiff'
+
+@pytest.mark.parametrize('raster_format', ['GTiff', 'AAIGrid'])
+def test_written_pixels_only(tmp_path, raster_format):
+    path = str(tmp_path / ('out.tif' if raster_format == 'GTiff' else 'out.asc'))
+    writer = RasterWriter(path, raster_format, GEO_TRAFO, 8, 4, NODATA)
+    values = np.arange(16, dtype = np.float32).reshape((4, 4))
+    sel = values % 2 == 0
+    writer.write(tile_geo_transform(1), values, sel)
+    writer.finish()
+
+    arr = read(path)
+    assert (arr[:, :4] == NODATA).all()
+    assert (arr[:, 4:][sel] == values[sel]).all()
+    assert (arr[:, 4:][~sel] == NODATA).all()
+    assert not os.path.exists(path + '.part.tif')
+
+def test_discard_removes_the_intermediate_file(tmp_path):
+    path = str(tmp_path / 'out.tif')
+    writer = RasterWriter(path, None, GEO_TRAFO, 8, 4, NODATA)
+    writer.write(tile_geo_transform(0), np.ones((4, 4), dtype = np.float32), np.ones((4, 4), dtype = bool))
+    writer.discard()
+    assert os.listdir(str(tmp_path)) == []
+
+def test_virtual_raster_refers_to_the_tiles(tmp_path):
+    # the stored tile of the right half of the region
+    tile_path = str(tmp_path / 'tile.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(tile_path, 4, 4, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform(tile_geo_transform(1))
+    values = np.arange(16, dtype = np.float32).reshape((4, 4))
+    ds.GetRasterBand(1).WriteArray(values)
+    ds = None
+
+    path = str(tmp_path / 'out.vrt')
+    writer = VrtWriter(path, lambda geo_trafo: tile_path if geo_trafo == tile_geo_transform(1) else None,
+                       GEO_TRAFO, 8, 4, NODATA)
+    sel = values > 5
+    writer.write(tile_geo_transform(1), values, sel)
+    writer.finish()
+
+    ds = gdal.Open(path)
+    band = ds.GetRasterBand(1)
+    assert (band.ReadAsArray()[:, 4:] == values).all()
+    assert (band.GetMaskBand().ReadAsArray()[:, 4:] == np.where(sel, 255, 0)).all()
+    assert sorted(os.listdir(str(tmp_path))) == ['out.mask.tif', 'out.vrt', 'tile.tif']
+
+def test_virtual_raster_without_stored_tile(tmp_path):
+    path = str(tmp_path / 'out.vrt')
+    writer = VrtWriter(path, lambda geo_trafo: None, GEO_TRAFO, 8, 4, NODATA)
+    writer.write(tile_geo_transform(0), np.ones((4, 4), dtype = np.float32), np.ones((4, 4), dtype = bool))
+    with pytest.raises(RasterExportError):
+        writer.finish()
+    assert not os.path.exists(path)
+
+def test_virtual_raster_with_tile_removed_before_finish(tmp_path):
+    # e.g. evicted from the tile cache while the computation was running
+    tile_path = str(tmp_path / 'tile.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(tile_path, 4, 4, 1, gdal.GDT_Float32)
+    ds = None
+
+    path = str(tmp_path / 'out.vrt')
+    writer = VrtWriter(path, lambda geo_trafo: tile_path, GEO_TRAFO, 8, 4, NODATA)
+    writer.write(tile_geo_transform(0), np.ones((4, 4), dtype = np.float32), np.ones((4, 4), dtype = bool))
+    os.remove(tile_path)
+    with pytest.raises(RasterExportError):
+        writer.finish()
+    assert not os.path.exists(path)
+
+def test_virtual_raster_discard(tmp_path):
+    path = str(tmp_path / 'out.vrt')
+    writer = VrtWriter(path, lambda geo_trafo: None, GEO_TRAFO, 8, 4, NODATA)
+    writer.discard()
+    assert os.listdir(str(tmp_path)) == []
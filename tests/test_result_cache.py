@@ -0,0 +1,122 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of result_cache.py: the keys of the results, which change with the geometry,
+the dataset and the extended statistics, and the removal of results not used anymore.
+"""
+# standard python modules
+import sqlite3
+import time
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# custom modules
+from gpsinfo4zemokost.src.result_cache import ResultCache
+from gpsinfo4zemokost.src.zonal_stats import ZonalConfig, ZonalStats
+
+
+CONTEXT = 'AT_OGD_DHM_LAMB_10M_SLOPE|Server'
+
+
+class Geometry:
+    # stands in for an ogr geometry, the cache only needs its WKB
+    def __init__(self, wkb):
+        self.wkb = wkb
+
+    def ExportToWkb(self):
+        return self.wkb
+
+def zonal_config(percentiles = (50,)):
+    return ZonalConfig(list(percentiles), 4, 0.0, 1.0)
+
+
+def test_keys(plugin_settings, tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path, CONTEXT, None)
+    key = cache.key(Geometry(b'polygon a'))
+
+    assert cache.key(Geometry(b'polygon a')) == key
+    assert cache.key(Geometry(b'polygon b')) != key
+    # another dataset or tile source, other extended statistics
+    assert ResultCache(path, CONTEXT + '2', None).key(Geometry(b'polygon a')) != key
+    assert ResultCache(path, CONTEXT, zonal_config()).key(Geometry(b'polygon a')) != key
+    assert ResultCache(path, CONTEXT, zonal_config()).key(Geometry(b'polygon a')) != \
+        ResultCache(path, CONTEXT, zonal_config((10, 90))).key(Geometry(b'polygon a'))
+
+def test_results_are_kept_across_runs(plugin_settings, tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    config = zonal_config()
+    zonal = ZonalStats(config)
+    zonal.add(np.array([0.1, 0.2, 0.7]))
+
+    cache = ResultCache(path, CONTEXT, config)
+    key = cache.key(Geometry(b'polygon a'))
+    assert cache.get(key) is None
+    cache.put(key, np.float64(1.0), np.int64(3), [], zonal)
+    cache.put(cache.key(Geometry(b'polygon b')), 0.0, 0, [10.5, 20.5])
+    cache.close()
+
+    cache = ResultCache(path, CONTEXT, config)
+    try:
+        vals_sum, vals_count, nodata_pt, restored = cache.get(key)
+        assert (vals_sum, vals_count, nodata_pt) == (1.0, 3, [])
+        assert restored.values() == zonal.values()
+        assert cache.get(cache.key(Geometry(b'polygon b')))[2] == [10.5, 20.5]
+    finally:
+        cache.close()
+
+def test_unreadable_result_is_computed_again(plugin_settings, tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path, CONTEXT, None)
+    key = cache.key(Geometry(b'polygon a'))
+    cache.con.execute('INSERT INTO results VALUES (?, ?, ?)', (key, '{"sum": 1.0', time.time()))
+    assert cache.get(key) is None
+    cache.close()
+
+def test_results_not_used_for_max_age_days_are_removed(plugin_settings, tmp_path):
+    plugin_settings['results/max_age_days'] = 30
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path, CONTEXT, None)
+    keys = [cache.key(Geometry(wkb)) for wkb in (b'old', b'old but used', b'new')]
+    for key in keys:
+        cache.put(key, 1.0, 1, [])
+    old = time.time() - 40 * 24 * 3600
+    cache.close()
+    con = sqlite3.connect(path)
+    con.executemany('UPDATE results SET used = ? WHERE key = ?', [(old, keys[0]), (old, keys[1])])
+    con.commit()
+    con.close()
+
+    cache = ResultCache(path, CONTEXT, None)
+    # using a result keeps it
+    assert cache.get(keys[1]) is not None
+    cache.close()
+
+    con = sqlite3.connect(path)
+    remaining = [row[0] for row in con.execute('SELECT key FROM results')]
+    con.close()
+    assert sorted(remaining) == sorted(keys[1:])
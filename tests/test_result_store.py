@@ -0,0 +1,84 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of result_store.py: the columns of the CSV, with and without extra columns,
+and the exact numbers in it.
+"""
+# standard python modules
+import csv
+import io
+
+# custom modules
+from gpsinfo4zemokost.src.result_store import ResultStore
+
+
+COLUMNS = [('ID', 'ids'), ('Flaeche [km2]', 'area'), ('Hangneigung [1]', 'mean'), ('Rasterpunkte', 'count')]
+
+
+def store():
+    results = ResultStore(extra = [('std', 'd'), ('hist1', 'q')])
+    results.extend([('a', 1.0, 2.0, 0.1, 0.25, 10, 0.01, 4),
+                    ('b', 3.0, 4.0, 0.2, 1 / 3, 20, 0.02, 5),
+                    ('c', 5.0, 6.0, 0.3, 0.5, 30, 0.03, 6)])
+    return results
+
+def read_csv(text, sep = ';'):
+    return list(csv.reader(io.StringIO(text), delimiter = sep))
+
+
+def test_columns_in_the_given_order():
+    f = io.StringIO()
+    store().write_csv(f, COLUMNS + [('Standardabweichung [1]', 'std'), ('Rasterpunkte 0–0.1', 'hist1')])
+    rows = read_csv(f.getvalue())
+
+    assert rows[0] == ['ID', 'Flaeche [km2]', 'Hangneigung [1]', 'Rasterpunkte', 'Standardabweichung [1]',
+                       'Rasterpunkte 0–0.1']
+    assert rows[1] == ['a', '0.1', '0.25', '10', '0.01', '4']
+    assert len(rows) == 4
+
+def test_floats_are_written_exactly():
+    f = io.StringIO()
+    store().write_csv(f, [('Hangneigung [1]', 'mean')])
+    assert float(read_csv(f.getvalue())[2][0]) == 1 / 3
+
+def test_selected_rows_and_separator():
+    f = io.StringIO()
+    store().write_csv(f, [('ID', 'ids'), ('x', 'x'), ('y', 'y')], rows = [2, 0], sep = ',')
+    assert f.getvalue() == 'ID,x,y\nc,5.0,6.0\na,1.0,2.0\n'
+
+def test_permute_keeps_the_rows_together():
+    results = store()
+    results.permute([2, 0, 1])
+    f = io.StringIO()
+    results.write_csv(f, [('ID', 'ids'), ('Rasterpunkte', 'count'), ('Rasterpunkte 0–0.1', 'hist1')])
+    assert read_csv(f.getvalue())[1:] == [['c', '30', '6'], ['a', '10', '4'], ['b', '20', '5']]
+
+def test_without_extra_columns():
+    results = ResultStore()
+    results.append('a', 1.0, 2.0, 0.1, 0.25, 10)
+    f = io.StringIO()
+    results.write_csv(f, COLUMNS)
+    assert read_csv(f.getvalue()) == [[h for (h, name) in COLUMNS], ['a', '0.1', '0.25', '10']]
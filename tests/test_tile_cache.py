@@ -0,0 +1,135 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of tile_cache.py: the eviction of the least recently used tiles and the
+modification times, which keep their order across sessions.
+"""
+# standard python modules
+import os
+
+# custom modules
+from gpsinfo4zemokost.src.tile_cache import TileCache
+
+
+LAYER = 'LAYER'
+
+
+def tile_paths(directory):
+    # the cached files below "directory", relative to it
+    return sorted(os.path.relpath(os.path.join(root, name), directory)
+                  for root, dirs, files in os.walk(directory) for name in files)
+
+
+def test_put_and_get(tmp_path):
+    cache = TileCache(str(tmp_path), 1000)
+    path = cache.put(LAYER, 3, 4, b'x' * 10)
+
+    assert path == os.path.join(str(tmp_path), LAYER, '3', '4.asc.zip')
+    assert cache.get(LAYER, 3, 4) == path
+    assert cache.get(LAYER, 4, 3) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.size() == 10
+    assert cache.tiles(LAYER) == [(3, 4)]
+    with open(path, 'rb') as f:
+        assert f.read() == b'x' * 10
+
+def test_least_recently_used_tiles_are_evicted(tmp_path):
+    cache = TileCache(str(tmp_path), 30)
+    for x in range(3):
+        cache.put(LAYER, x, 0, b'x' * 10)
+    # tile 0 becomes the most recently used, so tile 1 goes first
+    cache.get(LAYER, 0, 0)
+    cache.put(LAYER, 3, 0, b'x' * 10)
+
+    assert cache.tiles(LAYER) == [(0, 0), (2, 0), (3, 0)]
+    assert cache.size() == 30
+    assert tile_paths(str(tmp_path)) == [os.path.join(LAYER, str(x), '0.asc.zip') for x in (0, 2, 3)]
+
+def test_replacing_a_tile_counts_its_new_size(tmp_path):
+    cache = TileCache(str(tmp_path), 100)
+    cache.put(LAYER, 0, 0, b'x' * 10)
+    cache.put(LAYER, 0, 0, b'x' * 25)
+    assert cache.size() == 25
+
+def test_most_recent_tile_is_kept_even_if_too_large(tmp_path):
+    cache = TileCache(str(tmp_path), 10)
+    cache.put(LAYER, 0, 0, b'x' * 5)
+    cache.put(LAYER, 1, 0, b'x' * 50)
+    assert cache.tiles(LAYER) == [(1, 0)]
+
+def test_order_of_last_use_is_read_from_the_modification_times(tmp_path):
+    cache = TileCache(str(tmp_path), 1000)
+    paths = [cache.put(LAYER, x, 0, b'x' * 10) for x in range(3)]
+    # the tiles were used in the order 2, 0, 1 in an earlier session
+    for (path, mtime) in zip(paths, (2000000000, 3000000000, 1000000000)):
+        os.utime(path, (mtime, mtime))
+
+    cache = TileCache(str(tmp_path), 20)
+    # the scan evicts the tile used longest ago
+    assert cache.tiles(LAYER) == [(0, 0), (1, 0)]
+    assert not os.path.exists(paths[2])
+
+def test_get_updates_the_modification_time(tmp_path):
+    cache = TileCache(str(tmp_path), 1000)
+    path = cache.put(LAYER, 0, 0, b'x' * 10)
+    os.utime(path, (1000000000, 1000000000))
+    cache.get(LAYER, 0, 0)
+    assert os.stat(path).st_mtime > 1000000000
+
+def test_scan_removes_incomplete_files(tmp_path):
+    folder = tmp_path / LAYER / '0'
+    folder.mkdir(parents = True)
+    (folder / '0.asc.zip').write_bytes(b'x' * 10)
+    (folder / 'abc.part').write_bytes(b'x' * 5)
+
+    cache = TileCache(str(tmp_path), 1000)
+    assert cache.size() == 10
+    assert tile_paths(str(tmp_path)) == [os.path.join(LAYER, '0', '0.asc.zip')]
+
+def test_discard_and_clear(tmp_path):
+    cache = TileCache(str(tmp_path), 1000)
+    for x in range(3):
+        cache.put(LAYER, x, 0, b'x' * 10)
+    cache.discard(LAYER, 1, 0)
+    assert cache.tiles(LAYER) == [(0, 0), (2, 0)]
+    assert cache.size() == 20
+
+    cache.clear()
+    assert cache.tiles(LAYER) == []
+    assert cache.size() == 0
+    assert tile_paths(str(tmp_path)) == []
+
+def test_other_files_in_the_directory_are_left_alone(tmp_path):
+    # e.g. the result cache and the tile index, see result_cache.py and tile_index.py
+    for name in ('results/project.sqlite', 'results/project.sqlite.part', 'index/LAYER.sqlite', 'notes.part'):
+        (tmp_path / name).parent.mkdir(parents = True, exist_ok = True)
+        (tmp_path / name).write_bytes(b'x' * 100)
+
+    cache = TileCache(str(tmp_path), 50)
+    cache.put(LAYER, 0, 0, b'x' * 10)
+    assert cache.size() == 10
+    assert tile_paths(str(tmp_path)) == sorted([os.path.join(LAYER, '0', '0.asc.zip'), 'notes.part',
+        os.path.join('index', 'LAYER.sqlite'), os.path.join('results', 'project.sqlite'), os.path.join('results', 'project.sqlite.part')])
@@ -0,0 +1,113 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of tile_index.py: the aggregates of the tiles compared with the sums over their
+pixels, and the checks of the dataset and the tile source when an index is opened.
+"""
+# standard python modules
+import json
+import sqlite3
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('osgeo')
+pytest.importorskip('qgis.core')
+
+# custom modules
+from gpsinfo4zemokost.src import function_module as fm
+from gpsinfo4zemokost.src.tile_index import TileIndex, TileIndexError, aggregate, tile_index
+
+
+NODATA = fm.TD['NODATA']
+
+
+def tile(seed, nodata = 0.0):
+    rng = np.random.RandomState(seed)
+    array = rng.uniform(0, 1, (fm.TD['NROWS'], fm.TD['NCOLS'])).astype(np.float32)
+    array[rng.uniform(size = array.shape) < nodata] = NODATA
+    return array
+
+
+def test_aggregate_equals_the_sums_over_the_pixels():
+    array = tile(1, nodata = 0.1)
+    vals = array[array != NODATA].astype(np.float64)
+    agg = aggregate(array, NODATA)
+
+    assert agg.sum == pytest.approx(vals.sum())
+    assert agg.sumsq == pytest.approx((vals ** 2).sum())
+    assert agg.count == vals.size
+    assert agg.nodata == array.size - vals.size
+    assert (agg.min, agg.max) == (vals.min(), vals.max())
+
+def test_aggregate_of_a_tile_without_data():
+    agg = aggregate(np.full((3, 3), NODATA, dtype = np.float32), NODATA)
+    assert agg == (0.0, 0.0, 0, 9, None, None)
+
+def test_recorded_tiles_are_kept(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    index = TileIndex(path, 'Server')
+    index.record(3, 4, tile(2))
+    # a tile in the index is not recorded again
+    index.record(3, 4, tile(3))
+    index.close()
+
+    index = TileIndex(path, 'Server')
+    try:
+        assert index.size() == 1
+        assert index.get(3, 4) == aggregate(tile(2), NODATA)
+        assert index.get(4, 3) is None
+    finally:
+        index.close()
+
+def test_index_of_another_source_is_rejected(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    TileIndex(path, 'Server').close()
+    with pytest.raises(TileIndexError):
+        TileIndex(path, '/data/mirror')
+
+def test_index_of_another_grid_is_rejected(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    TileIndex(path, 'Server').close()
+    con = sqlite3.connect(path)
+    grid = dict(fm.TD, CELLSIZE = 5.0)
+    con.execute("UPDATE metadata SET value = ? WHERE name = 'grid'", (json.dumps(grid),))
+    con.commit()
+    con.close()
+    with pytest.raises(TileIndexError):
+        TileIndex(path, 'Server')
+
+def test_each_source_has_its_own_default_index(plugin_settings, tmp_path):
+    index = tile_index()
+    index.record(0, 0, tile(4))
+    index.close()
+
+    plugin_settings['source/type'] = 'directory'
+    plugin_settings['source/path'] = str(tmp_path / 'mirror')
+    index = tile_index()
+    try:
+        assert index.size() == 0
+    finally:
+        index.close()
@@ -0,0 +1,125 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of tile_source.py: the interface of the tile sources, and the tiles read from a
+directory and from a tile store.
+"""
+# standard python modules
+import os
+from io import BytesIO
+from zipfile import ZipFile
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('osgeo')
+pytest.importorskip('qgis.core')
+
+# custom modules
+from benchmarks.tiles import write_tiles, tile_path, tile_values
+from gpsinfo4zemokost.src import function_module as fm
+from gpsinfo4zemokost.src.tile_source import (TileSource, DirectorySource, StoreSource, TileStoreWriter,
+                                              same_grid, tile_source)
+
+
+TILE = (100, 50)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_incomplete_source_cannot_be_created():
+    class Incomplete(TileSource):
+        def fetch(self, tile_nr_x, tile_nr_y):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_same_grid():
+    assert same_grid(dict(fm.TD))
+    assert not same_grid(dict(fm.TD, CELLSIZE = 5.0))
+    assert not same_grid(dict(fm.TD, EPSG = 'EPSG:4326'))
+    assert not same_grid({})
+
+def test_directory_source(tmp_path):
+    root = str(tmp_path)
+    write_tiles(root, [TILE])
+    source = DirectorySource(root)
+
+    assert source.check() == (True, '')
+    geo_trafo, array = source.fetch(*TILE)
+    assert geo_trafo == pytest.approx(fm.tile_geo_transform(*TILE))
+    assert array == pytest.approx(tile_values(*TILE), abs = 1e-5)
+    assert source.read_zip(*TILE) == read(tile_path(root, *TILE))
+    with pytest.raises(fm.TileDownloadError):
+        source.fetch(TILE[0] + 1, TILE[1])
+
+def test_directory_source_with_unzipped_tiles(tmp_path):
+    root = str(tmp_path)
+    write_tiles(root, [TILE])
+    with ZipFile(tile_path(root, *TILE)) as zf:
+        asc = zf.read(zf.infolist()[0])
+    os.remove(tile_path(root, *TILE))
+    with open(os.path.join(root, str(TILE[0]), str(TILE[1]) + '.asc'), 'wb') as f:
+        f.write(asc)
+
+    source = DirectorySource(root)
+    geo_trafo, array = source.fetch(*TILE)
+    assert array == pytest.approx(tile_values(*TILE), abs = 1e-5)
+    with ZipFile(BytesIO(source.read_zip(*TILE))) as zf:
+        assert zf.read(zf.infolist()[0]) == asc
+
+def test_store_source(tmp_path):
+    write_tiles(str(tmp_path / 'mirror'), [TILE])
+    data = read(tile_path(str(tmp_path / 'mirror'), *TILE))
+    path = str(tmp_path / 'tiles.sqlite')
+    writer = TileStoreWriter(path, {'grid': dict(fm.TD)})
+    writer.put(TILE[0], TILE[1], data)
+    writer.close()
+
+    source = StoreSource(path)
+    assert source.check() == (True, '')
+    assert source.tiles() == [TILE]
+    assert source.read_zip(*TILE) == data
+    geo_trafo, array = source.fetch(*TILE)
+    assert array == pytest.approx(tile_values(*TILE), abs = 1e-5)
+    with pytest.raises(fm.TileDownloadError):
+        source.read_zip(TILE[0] + 1, TILE[1])
+
+def test_store_of_another_grid_fails_the_check(tmp_path):
+    path = str(tmp_path / 'tiles.sqlite')
+    TileStoreWriter(path, {'grid': dict(fm.TD, NCOLS = 300)}).close()
+    ok, message = StoreSource(path).check()
+    assert not ok
+
+def test_source_of_the_settings(plugin_settings, tmp_path):
+    assert tile_source().name == 'Server'
+    plugin_settings.update({'source/type': 'directory', 'source/path': str(tmp_path)})
+    assert isinstance(tile_source(), DirectorySource)
+    plugin_settings.update({'source/type': 'store', 'source/path': str(tmp_path / 'tiles.sqlite')})
+    assert isinstance(tile_source(), StoreSource)
@@ -0,0 +1,125 @@
+"""
+
+ (c) 2019 Rechenraum e.U. (office@rechenraum.com)
+
+ This file is part of gpsinfo (www.gpsinfo.org).
+
+ gpsinfo is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ gpsinfo is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with gpsinfo. If not, see <http://www.gnu.org/licenses/>.
+
+ Author(s): Andreas Fuchs (andreas.fuchs@rechenraum.com)
+
+"""
+
+
+
+"""
+Tests of zonal_stats.py: merging and restoring the ZonalStats and the error of the
+percentiles estimated from the fine histogram.
+"""
+# standard python modules
+import math
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# custom modules
+from gpsinfo4zemokost.src.zonal_stats import ZonalConfig, ZonalStats, PERCENTILE_BINS
+
+
+def config(hist_min = 0.0, hist_max = 1.0):
+    return ZonalConfig([0, 10, 50, 90, 100], 10, hist_min, hist_max)
+
+# the q-th percentile as documented in ZonalStats.percentile: the smallest value with
+# at least q % of the values less or equal
+def exact_percentile(values, q):
+    ordered = np.sort(values)
+    return float(ordered[max(int(math.ceil(q / 100 * len(ordered))) - 1, 0)])
+
+def accumulate(zonal_config, values):
+    zonal = ZonalStats(zonal_config)
+    zonal.add(values)
+    return zonal
+
+
+def test_merge_equals_adding_all_values():
+    rng = np.random.RandomState(1)
+    values = rng.uniform(0, 1.2, 5000)
+    zonal_config = config()
+    whole = accumulate(zonal_config, values)
+    merged = ZonalStats(zonal_config)
+    for part in np.array_split(values, 7):
+        merged.merge(accumulate(zonal_config, part))
+    # merging an empty accumulator changes nothing
+    merged.merge(ZonalStats(zonal_config))
+
+    assert merged.count == whole.count == values.size
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.std() == pytest.approx(values.std())
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    assert (merged.fine == whole.fine).all()
+    assert (merged.hist == whole.hist).all()
+
+def test_state_round_trip():
+    rng = np.random.RandomState(2)
+    zonal_config = config()
+    zonal = accumulate(zonal_config, rng.uniform(-0.1, 1.3, 1000))
+    restored = ZonalStats.from_state(zonal_config, zonal.state())
+
+    assert restored.values() == zonal.values()
+    assert (restored.fine == zonal.fine).all()
+
+def test_histogram_counts_values_outside_in_the_end_bins():
+    zonal = accumulate(config(), np.array([-0.5, 0.05, 0.15, 0.95, 1.0, 3.0]))
+    assert list(zonal.hist) == [2, 1, 0, 0, 0, 0, 0, 0, 0, 3]
+
+def test_empty():
+    zonal = ZonalStats(config())
+    assert math.isnan(zonal.std())
+    assert math.isnan(zonal.percentile(50))
+
+@pytest.mark.parametrize('low, high', [(0.0, 1.0), (0.2, 0.7), (-0.5, 0.1), (1.5, 2.5)])
+def test_percentile_error_within_bound(low, high):
+    # values inside, partly outside and completely outside of the histogram range 0 to 1
+    rng = np.random.RandomState(3)
+    values = np.concatenate((rng.uniform(low, high, 20000), rng.normal((low + high) / 2, 0.05, 3000)))
+    zonal_config = config()
+    zonal = accumulate(zonal_config, values)
+    width = (zonal_config.hist_max - zonal_config.hist_min) / PERCENTILE_BINS
+
+    for q in zonal_config.percentiles:
+        exact = exact_percentile(values, q)
+        # the bound documented in ZonalStats.percentile
+        if exact < zonal_config.hist_min:
+            bound = zonal_config.hist_min - values.min()
+        elif exact >= zonal_config.hist_max:
+            bound = values.max() - zonal_config.hist_max
+        else:
+            bound = width
+        assert abs(zonal.percentile(q) - exact) <= bound + 1e-9
+
+def test_percentile_of_constant_values():
+    zonal = accumulate(config(), np.full(100, 0.3))
+    for q in (0, 10, 50, 100):
+        assert zonal.percentile(q) == pytest.approx(0.3)
+
+@pytest.mark.parametrize('hist_min, hist_max', [(0.5, 0.5), (1.0, 0.0)])
+def test_empty_range_falls_back_to_the_default(plugin_settings, hist_min, hist_max):
+    from gpsinfo4zemokost.src import zonal_stats
+    plugin_settings.update({'zonal/extended': True, 'zonal/hist_min': hist_min, 'zonal/hist_max': hist_max})
+    zonal_config = zonal_stats.config()
+
+    assert (zonal_config.hist_min, zonal_config.hist_max) == (0.0, 1.0)
+    assert zonal_config.percentiles == [10, 50, 90]
+    zonal = accumulate(zonal_config, np.array([0.2, 0.4, 0.6]))
+    assert zonal.percentile(50) == pytest.approx(0.4, abs = 1e-3)